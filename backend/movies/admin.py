@@ -1,9 +1,328 @@
-from django.contrib import admin
-from .models import Movie, Person, MovieCast, MovieCrew, Video
+from django import forms
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Max, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .curation import invalidate_rails
+from .fuzzy import index_movies, index_people
+from .jobs import COMMAND_JOBS, enqueue
+from .models import Collection, CollectionEntry, Job, Movie, Person, MovieCast, MovieCrew, Video
 
 # Register your models here.
-admin.site.register(Movie)
-admin.site.register(Person)
-admin.site.register(MovieCast)
-admin.site.register(MovieCrew)
-admin.site.register(Video)
+
+# Tables at least this large are counted from planner statistics
+ESTIMATE_COUNTS_ABOVE = 10000
+# Filtered changelists count at most this many rows
+MAX_EXACT_COUNT = 10000
+
+
+def estimated_row_count(model, using='default'):
+    """
+    The planner's row estimate for a model's table, or its highest primary
+    key where there are no statistics. Either is an index or catalog lookup,
+    unlike COUNT(*).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                if row and row[0] >= 0:
+                    return row[0]
+            elif connection.vendor == 'sqlite':
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    except DatabaseError:
+        # No statistics table until ANALYZE has run
+        pass
+    return model._default_manager.using(using).aggregate(highest=Max('pk'))['highest'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator that never runs a full COUNT(*) on a large table:
+    unfiltered lists use estimated_row_count(), filtered ones count at most
+    MAX_EXACT_COUNT rows.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate >= ESTIMATE_COUNTS_ABOVE:
+                return estimate
+            return queryset.count()
+        return queryset[:MAX_EXACT_COUNT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Admin for catalog tables with hundreds of thousands of rows: estimated
+    counts, no second COUNT(*) for the "N total" link, and searches that
+    use an index. Subclasses define indexed_search().
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def indexed_search(self, queryset, term):
+        return queryset.none()
+
+    def get_search_results(self, request, queryset, search_term):
+        # The default search is an unindexable icontains on every search field
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return self.indexed_search(queryset, term), False
+
+
+def title_prefix(queryset, field, term):
+    """Rows whose field starts with term (as typed or capitalized), as index range scans."""
+    condition = Q()
+    for prefix in {term, term[:1].upper() + term[1:]}:
+        condition |= Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + '\uffff'})
+    return queryset.filter(condition)
+
+
+def search_movies(queryset, term, path=''):
+    """Rows for a movie TMDB id or title prefix; path leads from the queryset's model to Movie."""
+    if term.isdigit():
+        return queryset.filter(**{f'{path}tmdb_id': int(term)})
+    return title_prefix(queryset, f'{path}title', term)
+
+
+@admin.register(Person)
+class PersonAdmin(LargeTableAdmin):
+    list_display = ['name', 'tmdb_id', 'credit_count']
+    # Only ordered by indexed columns
+    ordering = ['-credit_count']
+    sortable_by = ['credit_count']
+    search_fields = ['name']
+    search_help_text = 'Name prefix or TMDB id'
+    readonly_fields = ['search_name', 'credit_count', 'known_for']
+
+    def indexed_search(self, queryset, term):
+        if term.isdigit():
+            return queryset.filter(tmdb_id=int(term))
+        return queryset & Person.search(term)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Keep typo-tolerant search in step with renames
+        if 'name' in form.changed_data:
+            index_people([obj])
+
+
+class CreditAdmin(LargeTableAdmin):
+    autocomplete_fields = ['movie', 'person']
+    list_select_related = ['movie', 'person']
+    search_help_text = 'Movie title prefix or TMDB id'
+    sortable_by = []
+
+    def indexed_search(self, queryset, term):
+        return search_movies(queryset, term, 'movie__')
+
+
+@admin.register(MovieCast)
+class MovieCastAdmin(CreditAdmin):
+    list_display = ['movie', 'person', 'character', 'order']
+    search_fields = ['movie__title']
+
+
+@admin.register(MovieCrew)
+class MovieCrewAdmin(CreditAdmin):
+    list_display = ['movie', 'person', 'job', 'department']
+    search_fields = ['movie__title']
+
+
+@admin.register(Video)
+class VideoAdmin(LargeTableAdmin):
+    list_display = ['name', 'movie', 'type', 'site']
+    list_select_related = ['movie']
+    autocomplete_fields = ['movie']
+    search_fields = ['movie__title']
+    search_help_text = 'Movie title prefix or TMDB id'
+    sortable_by = []
+
+    def indexed_search(self, queryset, term):
+        return search_movies(queryset, term, 'movie__')
+
+
+def queued_message(modeladmin, request, job):
+    url = reverse('admin:movies_job_change', args=[job.pk])
+    modeladmin.message_user(request, format_html('Queued <a href="{}">{}</a>.', url, job), messages.SUCCESS)
+
+
+class MovieCastInline(admin.TabularInline):
+    model = MovieCast
+    autocomplete_fields = ['person']
+    fields = ['person', 'character', 'order']
+    ordering = ['order']
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('person')
+
+
+class MovieCrewInline(admin.TabularInline):
+    model = MovieCrew
+    autocomplete_fields = ['person']
+    fields = ['person', 'job', 'department']
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('person')
+
+
+@admin.register(Movie)
+class MovieAdmin(LargeTableAdmin):
+    list_display = ['title', 'tmdb_id', 'industry', 'release_date', 'popularity', 'rating']
+    list_select_related = ['industry']
+    list_filter = ['industry']
+    # Only ordered by indexed columns
+    ordering = ['-popularity']
+    sortable_by = ['release_date', 'popularity']
+    search_fields = ['title']
+    search_help_text = 'Title prefix or TMDB id'
+    # The user rating aggregates are maintained by users/ratings.py
+    readonly_fields = ['credits'] + Movie.USER_RATING_FIELDS
+    actions = ['reimport_movies', 'refresh_movies']
+
+    def indexed_search(self, queryset, term):
+        return search_movies(queryset, term)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Keep typo-tolerant search in step with retitles
+        if 'title' in form.changed_data:
+            index_movies([obj])
+
+    def editing_credits(self, request):
+        return request.GET.get('credits') == '1'
+
+    def get_inlines(self, request, obj):
+        # Cast and crew forms are only built on request, not on every visit
+        if obj is not None and self.editing_credits(request):
+            return [MovieCastInline, MovieCrewInline]
+        return []
+
+    def get_fields(self, request, obj=None):
+        fields = super().get_fields(request, obj)
+        if obj is None or self.editing_credits(request):
+            return [field for field in fields if field != 'credits']
+        return fields
+
+    @admin.display(description='Cast and crew')
+    def credits(self, obj):
+        return format_html(
+            '{} cast, {} crew &middot; <a href="?credits=1">Edit cast and crew</a>',
+            obj.cast.count(), obj.crew.count(),
+        )
+
+    @admin.action(description='Re-import selected movies from TMDB')
+    def reimport_movies(self, request, queryset):
+        tmdb_ids = list(queryset.values_list('tmdb_id', flat=True))
+        queued_message(self, request, enqueue('reimport_movies', {'tmdb_ids': tmdb_ids}, priority=10))
+
+    @admin.action(description='Rebuild credit summaries and search index of selected movies')
+    def refresh_movies(self, request, queryset):
+        movie_ids = list(queryset.values_list('id', flat=True))
+        queued_message(self, request, enqueue('refresh_movies', {'movie_ids': movie_ids}, priority=10))
+
+
+class CollectionEntryInline(admin.TabularInline):
+    model = CollectionEntry
+    raw_id_fields = ['movie']
+    extra = 0
+
+
+@admin.register(Collection)
+class CollectionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'updated_at']
+    prepopulated_fields = {'slug': ['name']}
+    inlines = [CollectionEntryInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Rails are cached per catalog version, which admin edits don't bump
+        invalidate_rails([form.instance.slug, form.initial.get('slug')])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_rails([obj.slug])
+
+    def delete_queryset(self, request, queryset):
+        slugs = list(queryset.values_list('slug', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_rails(slugs)
+
+
+class JobForm(forms.ModelForm):
+    kind = forms.ChoiceField(choices=[(name, name) for name in sorted(COMMAND_JOBS)])
+
+    class Meta:
+        model = Job
+        fields = ['kind', 'params', 'priority']
+        help_texts = {
+            'params': 'Command arguments and options, e.g. {"args": [], "options": {"batch_size": 100}}',
+        }
+
+    def clean_params(self):
+        params = self.cleaned_data['params'] or {}
+        if not isinstance(params, dict) or set(params) - {'args', 'options'}:
+            raise forms.ValidationError('Enter an object with "args" and "options".')
+        if not isinstance(params.get('args', []), list) or not isinstance(params.get('options', {}), dict):
+            raise forms.ValidationError('"args" must be a list and "options" an object.')
+        return params
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'priority', 'progress_percent', 'message', 'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['kind', 'message']
+    actions = ['cancel_jobs', 'retry_jobs']
+    readonly_fields = [
+        'status', 'progress', 'message', 'error', 'attempts', 'cancel_requested', 'worker',
+        'created_at', 'started_at', 'heartbeat_at', 'finished_at',
+    ]
+
+    def get_form(self, request, obj=None, **kwargs):
+        # New jobs pick a maintenance command; existing ones are read-only records
+        if obj is None:
+            kwargs['form'] = JobForm
+        return super().get_form(request, obj, **kwargs)
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return []
+        return ['kind', 'params', 'priority'] + self.readonly_fields
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ['kind', 'params', 'priority']
+        return super().get_fields(request, obj)
+
+    @admin.display(description='Progress')
+    def progress_percent(self, obj):
+        return '' if obj.progress is None else f'{obj.progress:.0%}'
+
+    @admin.action(description='Cancel selected jobs')
+    def cancel_jobs(self, request, queryset):
+        cancelled = queryset.filter(status=Job.QUEUED).update(status=Job.CANCELLED, finished_at=timezone.now())
+        stopping = queryset.filter(status=Job.RUNNING).update(cancel_requested=True)
+        self.message_user(request, f'Cancelled {cancelled} queued jobs; asked {stopping} running jobs to stop.')
+
+    @admin.action(description='Run selected jobs again')
+    def retry_jobs(self, request, queryset):
+        for job in queryset.filter(status__in=Job.FINISHED):
+            queued_message(self, request, enqueue(job.kind, job.params, priority=job.priority))
@@ -0,0 +1,111 @@
+"""
+In-process typeahead index over movie titles and person names.
+
+Every word-start suffix of a title or name is stored in one sorted list, so
+a prefix query is two bisects plus a scan of the matching range. The best
+suggestions for every one- and two-character prefix are precomputed, since
+those ranges are the only ones large enough to be slow to scan.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+import heapq
+
+from django.db.models import Max
+
+from .catalog import register_snapshot
+from .models import Movie, Person, MovieCast, MovieCrew, normalize_search_text
+
+MAX_SUGGESTIONS = 20
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+
+class AutocompleteIndex:
+
+    def __init__(self, entries):
+        """
+        entries is an iterable of (text, weight, suggestion) where suggestion
+        is the dict returned to clients.
+        """
+        suggestions = []
+        keys = []
+        for text, weight, suggestion in entries:
+            ref = len(suggestions)
+            suggestions.append((weight, suggestion))
+            words = normalize_search_text(text).split(' ')
+            for i in range(len(words)):
+                keys.append((' '.join(words[i:]), -weight, ref))
+        keys.sort()
+
+        self.suggestions = suggestions
+        self.keys = [key for key, _, _ in keys]
+        self.refs = [ref for _, _, ref in keys]
+        self.top_by_prefix = self._precompute_short_prefixes()
+
+    def _precompute_short_prefixes(self):
+        candidates = defaultdict(set)
+        for key, ref in zip(self.keys, self.refs):
+            for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+                if len(key) >= length:
+                    candidates[key[:length]].add(ref)
+        return {
+            prefix: self._best(refs, MAX_SUGGESTIONS)
+            for prefix, refs in candidates.items()
+        }
+
+    def _best(self, refs, limit):
+        return heapq.nlargest(limit, refs, key=lambda ref: self.suggestions[ref][0])
+
+    def __len__(self):
+        return len(self.suggestions)
+
+    def search(self, query, limit=10):
+        prefix = normalize_search_text(query)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            refs = self.top_by_prefix.get(prefix, [])[:limit]
+        else:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_right(self.keys, prefix + '\uffff', lo=start)
+            refs = self._best(set(self.refs[start:end]), limit)
+
+        return [self.suggestions[ref][1] for ref in refs]
+
+
+def build_autocomplete_index():
+    entries = []
+    for tmdb_id, title, popularity, release_date, poster_path in Movie.objects.values_list(
+        'tmdb_id', 'title', 'popularity', 'release_date', 'poster_path'
+    ).iterator():
+        entries.append((title, popularity, {
+            'type': 'movie',
+            'tmdb_id': tmdb_id,
+            'title': title,
+            'year': release_date.year if release_date else None,
+            'poster_path': poster_path,
+        }))
+
+    # A person ranks with the popularity of their best-known movie
+    person_popularity = defaultdict(float)
+    for credit_model in (MovieCast, MovieCrew):
+        for person_id, popularity in credit_model.objects.values('person_id').annotate(
+            popularity=Max('movie__popularity')
+        ).values_list('person_id', 'popularity'):
+            person_popularity[person_id] = max(person_popularity[person_id], popularity or 0)
+
+    for person_id, tmdb_id, name, profile_path in Person.objects.values_list(
+        'id', 'tmdb_id', 'name', 'profile_path'
+    ).iterator():
+        entries.append((name, person_popularity[person_id], {
+            'type': 'person',
+            'tmdb_id': tmdb_id,
+            'name': name,
+            'profile_path': profile_path,
+        }))
+
+    return AutocompleteIndex(entries)
+
+
+autocomplete_index = register_snapshot('autocomplete', build_autocomplete_index)
@@ -0,0 +1,184 @@
+"""
+Catalog versioning and in-process snapshots.
+
+Every command that changes the catalog calls bump_catalog_version() when it
+finishes. Structures built from the database and kept in worker memory
+(search indexes and the like) are registered as CatalogSnapshot objects and
+rebuilt when the version changes, so request handlers never query the
+database to use them.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+
+from . import snapshot_files
+from .models import CatalogState
+
+logger = logging.getLogger(__name__)
+
+_snapshots = []
+_watcher = None
+_version_lock = threading.Lock()
+_known_version = None
+_checked_at = 0.0
+
+
+def poll_interval():
+    return getattr(settings, 'CATALOG_VERSION_POLL_SECONDS', 5)
+
+
+def read_catalog_version():
+    """
+    Read the current catalog version from the database, or from the
+    published snapshot file when reads are served from snapshots.
+    """
+    if snapshot_files.snapshot_reads_enabled():
+        return snapshot_files.sync_snapshot() or 0
+    return read_database_catalog_version()
+
+
+def read_database_catalog_version(using='default'):
+    """Read the catalog version stored in one database."""
+    return CatalogState.objects.using(using).filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def get_catalog_version():
+    """
+    Return the catalog version, reading it from the database at most once
+    per poll interval per process.
+    """
+    global _known_version, _checked_at
+    if _known_version is None or time.monotonic() - _checked_at >= poll_interval():
+        with _version_lock:
+            if _known_version is None or time.monotonic() - _checked_at >= poll_interval():
+                _known_version = read_catalog_version()
+                _checked_at = time.monotonic()
+    return _known_version
+
+
+def bump_catalog_version():
+    """
+    Mark the catalog as changed. Returns the new version.
+    With CATALOG_WARMING on, the response cache is filled for the new
+    version before it is published (see movies/warming.py). The warmers
+    read through their own connections, so inside a transaction the bump
+    waits for the commit and returns None.
+    """
+    from .warming import warming_enabled
+
+    if warming_enabled() and connection.in_atomic_block:
+        transaction.on_commit(_bump_catalog_version)
+        return None
+    return _bump_catalog_version()
+
+
+def _bump_catalog_version():
+    global _known_version, _checked_at
+    CatalogState.objects.get_or_create(pk=1)
+    from .warming import warm_version, warming_enabled
+
+    if warming_enabled():
+        warm_version(read_database_catalog_version() + 1)
+    CatalogState.objects.filter(pk=1).update(version=F('version') + 1)
+    with _version_lock:
+        _known_version = read_catalog_version()
+        _checked_at = time.monotonic()
+    return _known_version
+
+
+class CatalogSnapshot:
+    """
+    A value built from the database and cached in process memory until the
+    catalog version changes.
+
+    While the background watcher runs, rebuilds happen on the watcher thread
+    and get() only reads the current value. Without the watcher (management
+    commands, the shell) get() checks the version itself.
+    """
+
+    def __init__(self, name, build, enabled=None):
+        self.name = name
+        self.build = build
+        self.is_enabled = enabled or (lambda: True)
+        self.version = None
+        self.value = None
+        self.lock = threading.Lock()
+
+    def refresh(self, version=None):
+        if version is None:
+            version = get_catalog_version()
+        with self.lock:
+            if self.version == version and self.value is not None:
+                return self.value
+            started = time.monotonic()
+            with snapshot_files.serve_from_snapshot():
+                value = self.build()
+            # Swap in one assignment so readers see either the old or the new value
+            self.value, self.version = value, version
+            logger.info(
+                'Built %s snapshot for catalog version %s in %.0f ms',
+                self.name, version, (time.monotonic() - started) * 1000
+            )
+            return value
+
+    def get(self):
+        if self.value is None or not watcher_running():
+            return self.refresh()
+        return self.value
+
+
+def register_snapshot(name, build, enabled=None):
+    """
+    Create a CatalogSnapshot that warm_snapshots() and the watcher keep current.
+    enabled is an optional callable; disabled snapshots are never built ahead of use.
+    """
+    snapshot = CatalogSnapshot(name, build, enabled)
+    _snapshots.append(snapshot)
+    return snapshot
+
+
+def watcher_running():
+    return _watcher is not None and _watcher.is_alive()
+
+
+def _watch():
+    while True:
+        time.sleep(poll_interval())
+        try:
+            version = get_catalog_version()
+            for snapshot in _snapshots:
+                if snapshot.is_enabled() and snapshot.version != version:
+                    snapshot.refresh(version)
+        except DatabaseError:
+            logger.exception('Could not refresh catalog snapshots')
+        finally:
+            close_old_connections()
+
+
+def warm_snapshots(watch=True):
+    """
+    Build every registered snapshot and start the background watcher.
+    Called once per worker process from the WSGI/ASGI entry points.
+    """
+    global _watcher
+    # Modules that register snapshots
+    from . import autocomplete, columnar, filters  # noqa: F401
+
+    try:
+        version = get_catalog_version()
+        for snapshot in _snapshots:
+            if snapshot.is_enabled():
+                snapshot.refresh(version)
+    except DatabaseError:
+        # Unmigrated database; snapshots will be built on first use
+        logger.warning('Skipping catalog snapshot warm-up: database not ready')
+    finally:
+        close_old_connections()
+
+    if watch and not watcher_running():
+        _watcher = threading.Thread(target=_watch, name='catalog-watcher', daemon=True)
+        _watcher.start()
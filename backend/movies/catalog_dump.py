@@ -0,0 +1,258 @@
+"""
+Compressed dumps of the catalog, for seeding a database without TMDB.
+
+A dump is a gzipped NDJSON file: a header object, then for each table an
+object naming the model and its columns, followed by one JSON array per row.
+load_dump() streams it back in batches inside one transaction, with foreign
+key checks and the secondary indexes of the bulk tables deferred until
+every row is in. On Postgres the rows go through COPY.
+
+Curated collections are included. Search trigrams are not dumped; they are
+rebuilt after loading.
+
+Replacing a catalog keeps the tables that reference movies from outside the
+dump (watchlists, watch progress, ratings, view counts): their rows are
+moved to the new movie with the same TMDB id, or deleted when the dump
+doesn't have it, and catalog_replaced is sent with the mapping for data
+that holds movie ids without a foreign key.
+"""
+import datetime
+import gzip
+import io
+import json
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, F, When
+from django.dispatch import Signal
+
+from .models import Collection, CollectionEntry, Industry, Movie, MovieCast, MovieCrew, Person, SearchTrigram, Video
+
+DUMP_FORMAT = 'thrillbinge-catalog'
+DUMP_FORMAT_VERSION = 1
+
+# In foreign key order
+DUMP_MODELS = [Industry, Person, Movie, MovieCast, MovieCrew, Video, Collection, CollectionEntry]
+BATCH_SIZE = 5000
+
+# Column types whose JSON values need converting before an INSERT; the rest
+# (text, numbers, booleans, ids) bind as they are
+PREPARED_TYPES = {'DateField', 'DateTimeField', 'DecimalField', 'JSONField', 'TimeField', 'UUIDField'}
+
+# Sent by load_dump(replace=True) inside its transaction, once the rows with
+# a foreign key to Movie have been moved, with movie_ids: {old movie id: new
+# movie id, or None when the new catalog doesn't have that movie}
+catalog_replaced = Signal()
+
+
+class DumpError(Exception):
+    pass
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, without cutting datetimes and times to milliseconds."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def dump_catalog(path, batch_size=BATCH_SIZE):
+    """Write every catalog table to path. Returns {model_name: rows}."""
+    from .catalog import read_database_catalog_version
+
+    counts = {}
+    encoder = DumpEncoder(separators=(',', ':'))
+    with transaction.atomic(), gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        f.write(encoder.encode({
+            'format': DUMP_FORMAT,
+            'format_version': DUMP_FORMAT_VERSION,
+            'catalog_version': read_database_catalog_version(),
+            'created_at': datetime.datetime.now(datetime.timezone.utc),
+        }) + '\n')
+        for model in DUMP_MODELS:
+            columns = [field.attname for field in model._meta.concrete_fields]
+            f.write(encoder.encode({'model': model._meta.model_name, 'columns': columns}) + '\n')
+            count = 0
+            for row in model.objects.order_by('pk').values_list(*columns).iterator(chunk_size=batch_size):
+                f.write(encoder.encode(row) + '\n')
+                count += 1
+            counts[model._meta.model_name] = count
+    return counts
+
+
+def read_dump(path):
+    """
+    Yield (model, fields, rows) per table, where rows is an iterator over
+    that table's rows that must be consumed before the next table.
+    """
+    models = {model._meta.model_name: model for model in DUMP_MODELS}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('format') != DUMP_FORMAT or header.get('format_version') != DUMP_FORMAT_VERSION:
+            raise DumpError(f'{path} is not a version {DUMP_FORMAT_VERSION} catalog dump')
+
+        line = f.readline()
+        while line:
+            table = json.loads(line)
+            model = models.get(table.get('model'))
+            if model is None:
+                raise DumpError(f"Unknown table {table.get('model')!r} in dump")
+            by_attname = {field.attname: field for field in model._meta.concrete_fields}
+            try:
+                fields = [by_attname[column] for column in table['columns']]
+            except KeyError as e:
+                raise DumpError(f'{model.__name__} has no column {e} from the dump')
+            # Columns added since the dump was written get their defaults
+            added = [field for field in model._meta.concrete_fields if field.attname not in table['columns']]
+            fields += added
+            defaults = [field.get_default() for field in added]
+
+            def rows():
+                nonlocal line
+                for line in f:
+                    if line.startswith('{'):
+                        return
+                    yield json.loads(line) + defaults
+                line = ''
+
+            yield model, fields, rows()
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _copy_value(value):
+    """Format one value for COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def insert_rows(model, fields, rows, using=DEFAULT_DB_ALIAS, batch_size=BATCH_SIZE):
+    """Insert rows of raw column values into model's table. Returns the row count."""
+    conn = connections[using]
+    ops = conn.ops
+    table = ops.quote_name(model._meta.db_table)
+    columns = ', '.join(ops.quote_name(field.column) for field in fields)
+
+    count = 0
+    with conn.cursor() as cursor:
+        for batch in _batches(rows, batch_size):
+            if conn.vendor == 'postgresql':
+                buffer = io.StringIO()
+                for row in batch:
+                    buffer.write('\t'.join(_copy_value(value) for value in row) + '\n')
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+            else:
+                for i, field in enumerate(fields):
+                    if field.get_internal_type() in PREPARED_TYPES:
+                        for row in batch:
+                            row[i] = field.get_db_prep_save(row[i], conn)
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', batch)
+            count += len(batch)
+    return count
+
+
+def movie_references():
+    """(model, field) of the foreign keys to Movie from tables outside the dump."""
+    dumped = set(DUMP_MODELS) | {SearchTrigram}
+    return [
+        (model, field)
+        for model in apps.get_models() if model not in dumped
+        for field in model._meta.concrete_fields if field.is_relation and field.related_model is Movie
+    ]
+
+
+def remap_movie_references(movie_ids, batch_size=BATCH_SIZE):
+    """
+    Point every reference to Movie outside the dump from its old movie id to
+    movie_ids[old], deleting the rows whose movie is gone (or was missing
+    already).
+    """
+    for model, field in movie_references():
+        column = field.attname
+        rows = model._base_manager.all()
+        # Park every reference on the negated id first, so that moving one
+        # onto an id another still holds can't break a unique constraint
+        rows.update(**{column: -F(column)})
+        old_ids = {-parked for parked in rows.values_list(column, flat=True).distinct()}
+        rows.filter(**{f'{column}__in': [-old for old in old_ids if not movie_ids.get(old)]}).delete()
+        moved = sorted(old for old in old_ids if movie_ids.get(old))
+        for start in range(0, len(moved), batch_size):
+            batch = moved[start:start + batch_size]
+            rows.filter(**{f'{column}__in': [-old for old in batch]}).update(**{column: Case(
+                *[When(**{column: -old}, then=movie_ids[old]) for old in batch]
+            )})
+
+
+def load_dump(path, replace=False, batch_size=BATCH_SIZE, progress=None):
+    """
+    Load a dump into an empty catalog, or over the current one with
+    replace=True. Returns {model_name: rows}.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'sqlite' and connection.in_atomic_block:
+        # SQLite ignores PRAGMA foreign_keys inside a transaction, so the
+        # checks this defers would stay on and the schema editor would refuse
+        raise DumpError('Load the dump outside of a transaction on SQLite')
+    if not replace and any(model.objects.exists() for model in DUMP_MODELS):
+        raise DumpError('The catalog is not empty; pass replace=True to overwrite it')
+
+    counts = {}
+    deferred = [(model, index) for model in DUMP_MODELS for index in model._meta.indexes]
+    tmdb_ids = dict(Movie.objects.values_list('pk', 'tmdb_id')) if replace else {}
+    with connection.constraint_checks_disabled(), transaction.atomic():
+        # Building the indexes once at the end beats updating them per row.
+        # SQLite's schema editor checks every foreign key when it's done, so
+        # its blocks run while no reference to a movie dangles.
+        with connection.schema_editor(atomic=False) as editor:
+            for model, index in deferred:
+                editor.remove_index(model, index)
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            if replace:
+                for model in [SearchTrigram] + DUMP_MODELS[::-1]:
+                    cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+        for model, fields, rows in read_dump(path):
+            counts[model._meta.model_name] = insert_rows(model, fields, rows, batch_size=batch_size)
+            if progress:
+                progress(model, counts[model._meta.model_name])
+
+        if replace:
+            new_ids = dict(Movie.objects.values_list('tmdb_id', 'pk'))
+            movie_ids = {old: new_ids.get(tmdb_id) for old, tmdb_id in tmdb_ids.items()}
+            remap_movie_references(movie_ids, batch_size=batch_size)
+            catalog_replaced.send(sender=Movie, movie_ids=movie_ids)
+
+        with connection.schema_editor(atomic=False) as editor:
+            for model, index in deferred:
+                editor.add_index(model, index)
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), DUMP_MODELS):
+                cursor.execute(sql)
+        connection.check_constraints(table_names=[
+            model._meta.db_table for model in DUMP_MODELS + [model for model, _ in movie_references()]
+        ])
+    return counts
@@ -0,0 +1,131 @@
+"""
+Columnar in-memory snapshot of the movie catalog.
+
+When COLUMNAR_CATALOG_INDEX is on and NumPy is installed, each worker keeps
+the columns /api/movies/ filters and sorts on as NumPy arrays. Filters
+become vectorized boolean masks and the top of the sort order is found with
+a partial partition instead of a full sort, so only the ids of the requested
+page go to the database for hydration. The snapshot is rebuilt when the catalog version changes.
+"""
+import datetime
+
+from django.conf import settings
+
+from .catalog import register_snapshot
+from .filters import industry_id_for, page_bounds
+from .models import Movie
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# Sorts the columnar index can answer, as (column, descending) keys
+SORT_KEYS = {
+    'popularity': [('popularity', True)],
+    'rating': [('rating', True)],
+    'release_date': [('release_ordinal', True)],
+    'title': [('title_rank', False)],
+    'top_rated': [('rating', True), ('popularity', True), ('release_ordinal', True)],
+}
+
+# Stands in for a missing release date or industry
+MISSING = -1
+
+
+def columnar_enabled():
+    return np is not None and getattr(settings, 'COLUMNAR_CATALOG_INDEX', False)
+
+
+class CatalogColumns:
+
+    def __init__(self, rows):
+        """rows are (id, title, popularity, rating, release_date, industry_id) tuples."""
+        count = len(rows)
+        self.id = np.empty(count, dtype=np.int64)
+        self.popularity = np.empty(count, dtype=np.float64)
+        self.rating = np.empty(count, dtype=np.float64)
+        self.release_ordinal = np.empty(count, dtype=np.int32)
+        self.industry = np.empty(count, dtype=np.int32)
+
+        # Titles are kept as one string plus an offset table
+        titles = []
+        self.title_offsets = np.empty(count + 1, dtype=np.int64)
+        offset = 0
+        for i, (pk, title, popularity, rating, release_date, industry_id) in enumerate(rows):
+            self.id[i] = pk
+            self.popularity[i] = popularity
+            self.rating[i] = rating
+            self.release_ordinal[i] = release_date.toordinal() if release_date else MISSING
+            self.industry[i] = industry_id if industry_id is not None else MISSING
+            self.title_offsets[i] = offset
+            titles.append(title)
+            offset += len(title)
+        self.title_offsets[count] = offset
+        self.titles = ''.join(titles)
+
+        # Position of each title in sorted order, so title sorts are integer sorts
+        self.title_rank = np.empty(count, dtype=np.int32)
+        self.title_rank[sorted(range(count), key=titles.__getitem__)] = np.arange(count, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.id)
+
+    def title(self, i):
+        return self.titles[self.title_offsets[i]:self.title_offsets[i + 1]]
+
+    def sort_key(self, column, descending, positions):
+        values = getattr(self, column)[positions]
+        return -values if descending else values
+
+    def query(self, params):
+        """
+        Return the movie ids matching the validated /api/movies/ parameters,
+        in sort order and cut to the requested page. Search is not supported here.
+        """
+        mask = np.ones(len(self), dtype=bool)
+
+        industry = params.get('industry')
+        if industry:
+            industry_id = industry_id_for(industry)
+            if industry_id is None:
+                return []
+            mask &= self.industry == industry_id
+
+        year = params.get('year')
+        if year:
+            start, end = year
+            start_ordinal = datetime.date(start, 1, 1).toordinal()
+            end_ordinal = datetime.date(end, 12, 31).toordinal()
+            mask &= (self.release_ordinal >= start_ordinal) & (self.release_ordinal <= end_ordinal)
+
+        min_rating = params.get('min_rating')
+        if min_rating is not None:
+            mask &= self.rating >= min_rating
+
+        positions = np.flatnonzero(mask)
+        keys = SORT_KEYS[params.get('sort', 'popularity')]
+        start, end = page_bounds(params)
+
+        if end < len(positions):
+            # Partition on the first key, keeping every row tied with the
+            # value at the end of the page so the full sort below stays exact
+            primary = self.sort_key(*keys[0], positions)
+            kth = np.partition(primary, end - 1)[end - 1]
+            positions = positions[primary <= kth]
+
+        # np.lexsort sorts by its last key first; the id keeps ties stable
+        sort_keys = [self.id[positions]]
+        sort_keys += [self.sort_key(column, descending, positions) for column, descending in reversed(keys)]
+        positions = positions[np.lexsort(sort_keys)][start:end]
+        return self.id[positions].tolist()
+
+
+def build_catalog_columns():
+    rows = list(Movie.objects.order_by('id').values_list(
+        'id', 'title', 'popularity', 'rating', 'release_date', 'industry_id'
+    ))
+    return CatalogColumns(rows)
+
+
+catalog_columns = register_snapshot('columnar', build_catalog_columns, enabled=columnar_enabled)
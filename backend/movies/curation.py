@@ -0,0 +1,151 @@
+"""
+Curated collections: definitions, TMDB id resolution and cached rails.
+
+Definitions live in JSON files under movies/curated/. Each entry names a
+title and, once resolved, the TMDB id it is pinned to. Titles without an id
+are searched on TMDB only when the database doesn't already hold an id for
+them from an earlier load of the same collection. Optional language and
+year hints on the collection or entry keep same-named films apart
+("Drishyam" in Hindi and in Malayalam). load_collections --write-ids
+records resolved ids in the definition file, for committing; loads never
+write into the package otherwise.
+
+A collection's rail is served from the cache, keyed by catalog version and
+built with one query on a miss. Edits that don't bump the version, from
+the admin or a load, drop the collection's cached rail instead.
+"""
+import json
+from pathlib import Path
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .catalog import get_catalog_version
+from .models import Collection, CollectionEntry, Industry
+from .serializers import CollectionSerializer
+from .tmdb_service import search_movies
+
+CURATED_DIR = Path(__file__).resolve().parent / 'curated'
+RAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def definition_files():
+    return sorted(CURATED_DIR.glob('*.json'))
+
+
+def read_definitions(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_definitions(path, definitions):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(definitions, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def resolve_title(entry, languages=None):
+    """
+    Search TMDB for an entry's title and return the id of the best match
+    within the language and year hints, or None.
+    """
+    languages = [entry['language']] if entry.get('language') else (languages or [])
+    year = str(entry['year']) if entry.get('year') else None
+    title = entry['title'].casefold()
+
+    candidates = [
+        result for result in search_movies(entry['title']).get('results', [])
+        if (not languages or result.get('original_language') in languages)
+        and (not year or (result.get('release_date') or '').startswith(year))
+    ]
+    if not candidates:
+        return None
+    # Prefer an exact title match over TMDB's relevance order
+    for result in candidates:
+        if title in ((result.get('title') or '').casefold(), (result.get('original_title') or '').casefold()):
+            return result['id']
+    return candidates[0]['id']
+
+
+def stored_ids(definition):
+    """{title: tmdb_id} of the collection's entries saved by an earlier load."""
+    return dict(
+        CollectionEntry.objects.filter(collection__slug=definition['slug']).values_list('title', 'tmdb_id')
+    )
+
+
+def resolve_definitions(definitions, on_unresolved=None):
+    """Fill in missing tmdb_ids in place. Returns the number of titles searched."""
+    searched = 0
+    for definition in definitions:
+        stored = stored_ids(definition)
+        for entry in definition['entries']:
+            if not entry.get('tmdb_id'):
+                entry['tmdb_id'] = stored.get(entry['title'])
+            if entry.get('tmdb_id'):
+                continue
+            searched += 1
+            entry['tmdb_id'] = resolve_title(entry, definition.get('languages'))
+            if entry['tmdb_id'] is None and on_unresolved:
+                on_unresolved(definition, entry)
+    return searched
+
+
+@transaction.atomic
+def save_collection(definition):
+    """Create or replace a collection and its entries from a resolved definition."""
+    collection, _ = Collection.objects.update_or_create(
+        slug=definition['slug'],
+        defaults={'name': definition['name'], 'description': definition.get('description', '')},
+    )
+    collection.entries.all().delete()
+    CollectionEntry.objects.bulk_create([
+        CollectionEntry(collection=collection, position=position, tmdb_id=entry['tmdb_id'], title=entry['title'])
+        for position, entry in enumerate(definition['entries'], 1)
+        if entry.get('tmdb_id')
+    ])
+    CollectionEntry.link_movies(entry['tmdb_id'] for entry in definition['entries'] if entry.get('tmdb_id'))
+    invalidate_rails([collection.slug])
+    return collection
+
+
+def industry_for_definition(definition):
+    if not definition.get('industry'):
+        return None
+    industry, _ = Industry.objects.get_or_create(name=definition['industry'])
+    return industry
+
+
+def rail_cache_key(slug):
+    return f'collection-rail:{get_catalog_version()}:{slug}'
+
+
+def invalidate_rails(slugs):
+    """Drop the cached rails of edited collections once the edit commits."""
+    keys = [rail_cache_key(slug) for slug in slugs if slug]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def build_rail(slug):
+    collection = Collection.objects.filter(slug=slug).first()
+    if collection is None:
+        return None
+    return CollectionSerializer(collection).data
+
+
+def cached_rail(slug):
+    """The serialized collection with its movies, or None if there is no such collection."""
+    key = rail_cache_key(slug)
+    data = cache.get(key)
+    if data is None:
+        data = build_rail(slug)
+        if data is not None:
+            cache.set(key, data, RAIL_CACHE_TIMEOUT)
+    return data
+
+
+def warm_rails():
+    """Precompute every collection's rail for the current catalog version."""
+    slugs = list(Collection.objects.values_list('slug', flat=True))
+    cache.set_many({rail_cache_key(slug): build_rail(slug) for slug in slugs}, RAIL_CACHE_TIMEOUT)
+    return len(slugs)
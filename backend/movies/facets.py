@@ -0,0 +1,88 @@
+"""
+Facet counts for the movies browse page.
+
+All counts come from one grouped query: the filtered movies are grouped by
+(industry, release year, whole rating). Each facet is then summed from those
+cells in Python, applying every active facet filter except its own, so a
+sidebar shows how many movies each option would give with the rest of the
+current selection.
+"""
+from collections import Counter
+
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.functions import Cast, ExtractYear
+
+from .models import Industry
+
+RATING_THRESHOLDS = range(9, 0, -1)
+
+
+def compute_facets(queryset, industry_id=None, year_range=None, min_rating=None):
+    """
+    Count movies in queryset per industry, decade, year and rating threshold.
+    The filters take the values validated by MovieListParamsSerializer.
+    """
+    keys = {
+        'year': ExtractYear('release_date'),
+        'rating_bucket': Cast('rating', IntegerField()),
+    }
+    if min_rating is not None:
+        # Exact min_rating check, since a whole-number bucket can't answer 7.5
+        keys['rating_ok'] = Case(When(rating__gte=min_rating, then=Value(1)), default=Value(0))
+    cells = queryset.order_by().values('industry_id', **keys).annotate(count=Count('id'))
+
+    industries = {i.id: i for i in Industry.objects.all()}
+
+    def passes(cell, skip):
+        if skip != 'industry' and industry_id is not None and cell['industry_id'] != industry_id:
+            return False
+        if skip != 'year' and year_range is not None:
+            if cell['year'] is None or not year_range[0] <= cell['year'] <= year_range[1]:
+                return False
+        if skip != 'rating' and min_rating is not None and not cell['rating_ok']:
+            return False
+        return True
+
+    total = 0
+    by_industry, by_year, by_rating = Counter(), Counter(), Counter()
+    for cell in cells:
+        count = cell['count']
+        if passes(cell, skip=None):
+            total += count
+        if cell['industry_id'] is not None and passes(cell, skip='industry'):
+            by_industry[cell['industry_id']] += count
+        if cell['year'] is not None and passes(cell, skip='year'):
+            by_year[cell['year']] += count
+        if passes(cell, skip='rating'):
+            by_rating[cell['rating_bucket']] += count
+
+    by_decade = Counter()
+    for year, count in by_year.items():
+        by_decade[year - year % 10] += count
+
+    return {
+        'total': total,
+        'facets': {
+            'industry': [
+                {'value': industries[pk].name.lower(), 'name': industries[pk].name, 'count': count}
+                for pk, count in sorted(by_industry.items(), key=lambda item: -item[1])
+            ],
+            'decade': [
+                {'value': f'{decade}-{decade + 9}', 'count': count}
+                for decade, count in sorted(by_decade.items(), reverse=True)
+            ],
+            'year': [
+                {'value': str(year), 'count': count}
+                for year, count in sorted(by_year.items(), reverse=True)
+            ],
+            # Cumulative, matching the min_rating filter
+            'rating': [
+                {
+                    'value': str(threshold),
+                    'label': f'{threshold}+',
+                    'count': sum(c for bucket, c in by_rating.items() if bucket >= threshold),
+                }
+                for threshold in RATING_THRESHOLDS
+            ],
+        },
+    }
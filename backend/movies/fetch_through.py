@@ -0,0 +1,129 @@
+"""
+Fetch-through for movie detail misses.
+
+With settings.TMDB_FETCH_THROUGH on, a request for a tmdb_id that isn't in
+the catalog imports it from TMDB instead of answering 404. The import runs
+on a small background pool:
+
+- Single flight: concurrent requests for the same id in a process share one
+  in-flight import, and a lock in the shared cache keeps other processes
+  from fetching it again while it runs.
+- Negative caching: ids TMDB answers 404 for are remembered for
+  TMDB_FETCH_THROUGH_MISSING_SECONDS, so repeated misses cost no request.
+- Latency budget: callers wait at most TMDB_FETCH_THROUGH_BUDGET_SECONDS.
+  After that the import keeps running and the caller reports PENDING.
+
+Imported movies are written to the primary database. The catalog version
+is not bumped, so cached lists pick them up with the next import.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .industries import IndustryClassifier
+from .ingest import save_movie_batch
+from .models import Movie
+from .replicas import primary_reads
+from .tmdb_service import get_movie_details
+
+logger = logging.getLogger(__name__)
+
+FOUND = 'found'
+MISSING = 'missing'
+PENDING = 'pending'
+UNAVAILABLE = 'unavailable'
+
+# Longest a process may hold the cross-process lock for one id
+LOCK_TIMEOUT = 30
+POLL_INTERVAL = 0.1
+WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='fetch-through')
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def fetch_through_enabled():
+    return settings.TMDB_FETCH_THROUGH
+
+
+def missing_key(tmdb_id):
+    return f'tmdb-missing:{tmdb_id}'
+
+
+def lock_key(tmdb_id):
+    return f'tmdb-fetch-lock:{tmdb_id}'
+
+
+def _wait_for_other_process(tmdb_id):
+    """Wait for another process's import of tmdb_id to finish and report its outcome."""
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while cache.get(lock_key(tmdb_id)) and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+    if Movie.objects.filter(tmdb_id=tmdb_id).exists():
+        return FOUND
+    return MISSING if cache.get(missing_key(tmdb_id)) else UNAVAILABLE
+
+
+def _import(tmdb_id):
+    if not cache.add(lock_key(tmdb_id), 1, LOCK_TIMEOUT):
+        return _wait_for_other_process(tmdb_id)
+    try:
+        # An earlier import may have finished while this one was queued
+        if Movie.objects.filter(tmdb_id=tmdb_id).exists():
+            return FOUND
+        try:
+            details = get_movie_details(tmdb_id)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            cache.set(missing_key(tmdb_id), True, settings.TMDB_FETCH_THROUGH_MISSING_SECONDS)
+            return MISSING
+        save_movie_batch([details], IndustryClassifier())
+        return FOUND
+    finally:
+        cache.delete(lock_key(tmdb_id))
+
+
+def _run(tmdb_id):
+    try:
+        with primary_reads():
+            return _import(tmdb_id)
+    except requests.RequestException as e:
+        logger.warning('Fetch-through of movie %s failed: %s', tmdb_id, e)
+        return UNAVAILABLE
+    except Exception:
+        # A payload ingest can't handle or a failed write: answer 503, not 500
+        logger.exception('Fetch-through of movie %s failed', tmdb_id)
+        return UNAVAILABLE
+    finally:
+        connections.close_all()
+        with _inflight_lock:
+            del _inflight[tmdb_id]
+
+
+def fetch_through(tmdb_id, budget=None):
+    """
+    Import a movie missing from the catalog, waiting at most budget seconds
+    (default TMDB_FETCH_THROUGH_BUDGET_SECONDS). Returns FOUND, MISSING,
+    UNAVAILABLE, or PENDING if the import is still running.
+    """
+    if cache.get(missing_key(tmdb_id)):
+        return MISSING
+    with _inflight_lock:
+        # Submitted under the lock, so _run can't remove the entry before it exists
+        future = _inflight.get(tmdb_id)
+        if future is None:
+            future = _inflight[tmdb_id] = _executor.submit(_run, tmdb_id)
+    if budget is None:
+        budget = settings.TMDB_FETCH_THROUGH_BUDGET_SECONDS
+    try:
+        return future.result(timeout=budget)
+    except FutureTimeout:
+        return PENDING
@@ -0,0 +1,126 @@
+"""
+Validation and compilation of the /api/movies/ query parameters.
+
+Parameters are validated by MovieListParamsSerializer, so bad input is a 400
+instead of a 500, and then compiled into predicates the indexes from
+migration 0008 can serve: years become release_date ranges and industry
+names or slugs become industry_id lookups through a cached map, so the list
+query never joins movies_industry or wraps a column in a function.
+"""
+import datetime
+
+from django.core.exceptions import EmptyResultSet
+from rest_framework import serializers
+
+from .catalog import register_snapshot
+from .models import Industry
+
+# Upper bound for the limit parameter
+MAX_LIMIT = 100
+
+# Every order ends in id, so ties come back in the same order on every
+# request and from the columnar index (movies/columnar.py) alike
+SORT_ORDERS = {
+    'popularity': ('-popularity', 'id'),
+    'rating': ('-rating', 'id'),
+    'release_date': ('-release_date', 'id'),
+    'title': ('title', 'id'),
+    'top_rated': ('-rating', '-popularity', '-release_date', 'id'),  # Sort by rating, then popularity, then newest
+    'user_rating': ('-user_rating', '-popularity', 'id'),  # Our users' Bayesian average rating
+}
+
+
+def build_industry_map():
+    """Map lower-cased industry names and slugs to industry ids."""
+    industry_map = {}
+    for pk, name, slug in Industry.objects.values_list('id', 'name', 'slug'):
+        industry_map[name.lower()] = pk
+        industry_map[slug.lower()] = pk
+    return industry_map
+
+
+industry_map = register_snapshot('industries', build_industry_map)
+
+
+def industry_id_for(value):
+    """Industry id for a name or slug, matched case-insensitively, or None."""
+    return industry_map.get().get(value.strip().lower())
+
+
+class MovieListParamsSerializer(serializers.Serializer):
+    search = serializers.CharField(required=False, allow_blank=True, max_length=200)
+    fuzzy = serializers.BooleanField(required=False, default=False)
+    summary = serializers.BooleanField(required=False, default=False)
+    industry = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    year = serializers.CharField(required=False, allow_blank=True, max_length=9)
+    min_rating = serializers.FloatField(required=False, min_value=0, max_value=10)
+    min_user_rating = serializers.FloatField(required=False, min_value=0, max_value=10)
+    # trending is served from the ranking in movies/trending.py, not an ORDER BY
+    sort = serializers.ChoiceField(choices=[*SORT_ORDERS, 'trending'], required=False)
+    # Lists are cut to pages of limit movies, MAX_LIMIT unless asked for fewer
+    limit = serializers.IntegerField(required=False, min_value=1, default=MAX_LIMIT)
+    page = serializers.IntegerField(required=False, min_value=1, default=1)
+
+    def validate_year(self, value):
+        """Turn '2015' or '2010-2019' into an inclusive (start, end) tuple."""
+        if not value:
+            return None
+        try:
+            if '-' in value:
+                start, end = (int(part) for part in value.split('-', 1))
+            else:
+                start = end = int(value)
+        except ValueError:
+            raise serializers.ValidationError("Use a year like 2015 or a range like 2010-2019.")
+        if not 1800 <= start <= end <= 9999:
+            raise serializers.ValidationError("Year range is out of bounds.")
+        return start, end
+
+    def validate_limit(self, value):
+        return min(value, MAX_LIMIT)
+
+
+def page_bounds(params):
+    """(start, end) of the requested page in the sorted results."""
+    end = params['limit'] * params['page']
+    return end - params['limit'], end
+
+
+def filter_movies(queryset, params):
+    """Apply the validated industry, year and rating filters as index-friendly predicates."""
+    industry = params.get('industry')
+    if industry:
+        industry_id = industry_id_for(industry)
+        if industry_id is None:
+            return queryset.none()
+        queryset = queryset.filter(industry_id=industry_id)
+
+    year = params.get('year')
+    if year:
+        start, end = year
+        queryset = queryset.filter(
+            release_date__gte=datetime.date(start, 1, 1),
+            release_date__lte=datetime.date(end, 12, 31),
+        )
+
+    min_rating = params.get('min_rating')
+    if min_rating is not None:
+        queryset = queryset.filter(rating__gte=min_rating)
+
+    min_user_rating = params.get('min_user_rating')
+    if min_user_rating is not None:
+        queryset = queryset.filter(user_rating__gte=min_user_rating)
+
+    return queryset
+
+
+def sort_movies(queryset, sort):
+    return queryset.order_by(*SORT_ORDERS[sort])
+
+
+def compiled_sql(queryset):
+    """The SQL a queryset will run, on one line, for the X-Compiled-SQL header."""
+    try:
+        return ' '.join(str(queryset.query).split())
+    except EmptyResultSet:
+        return ''
@@ -0,0 +1,176 @@
+"""
+Typo-tolerant search over movie titles and person names.
+
+On Postgres, candidates come from the pg_trgm `%` operator backed by the GIN
+indexes created in migration 0012. Other databases use the SearchTrigram
+table, which holds the same trigrams pg_trgm would extract and is kept
+current by the import paths and admin edits through index_movies() and
+index_people().
+Either way the index produces a short candidate list ranked by trigram
+similarity, so no per-row edit-distance scan ever runs.
+"""
+import re
+
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, FloatField, Max, Value, When
+from django.db.models.functions import Cast
+
+from .catalog_dump import insert_rows
+from .models import Movie, MovieCast, MovieCrew, Person, SearchTrigram
+
+# Same default as pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+MAX_CANDIDATES = 100
+
+_word_re = re.compile(r'[^\W_]+')
+
+
+def use_pg_trgm(using=None):
+    # Reads may be routed to a SQLite catalog snapshot (see snapshot_files.py),
+    # so code that writes the index passes write_alias()
+    return connections[using or Movie.objects.db].vendor == 'postgresql'
+
+
+def write_alias():
+    """Database the trigram postings are written to."""
+    return router.db_for_write(SearchTrigram)
+
+
+def trigrams(text):
+    """Trigram set of text, extracted the way pg_trgm does it."""
+    result = set()
+    for word in _word_re.findall((text or '').lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def _postings(field, objects, text_of):
+    rows = []
+    for obj in objects:
+        grams = trigrams(text_of(obj))
+        rows.extend(SearchTrigram(trigram=gram, total=len(grams), **{field: obj}) for gram in grams)
+    return rows
+
+
+def index_movies(movies):
+    """Refresh the trigram postings for the given movie titles."""
+    if use_pg_trgm(write_alias()):
+        return
+    movies = list(movies)
+    SearchTrigram.objects.filter(movie__in=movies).delete()
+    SearchTrigram.objects.bulk_create(_postings('movie', movies, lambda m: m.title), batch_size=1000)
+
+
+def index_people(people):
+    """Refresh the trigram postings for the given person names."""
+    if use_pg_trgm(write_alias()):
+        return
+    people = list(people)
+    SearchTrigram.objects.filter(person__in=people).delete()
+    SearchTrigram.objects.bulk_create(_postings('person', people, lambda p: p.name), batch_size=1000)
+
+
+def rebuild_trigram_index(batch_size=1000):
+    """Rebuild every posting from scratch, in one transaction. Returns the number of rows written."""
+    using = write_alias()
+    if use_pg_trgm(using):
+        return 0
+    fields = [SearchTrigram._meta.get_field(name) for name in ('trigram', 'movie', 'person', 'total')]
+
+    def postings():
+        for model, text_field in ((Movie, 'title'), (Person, 'name')):
+            rows = model.objects.using(using).order_by('id').values_list('id', text_field)
+            last_id = 0
+            while True:
+                batch = list(rows.filter(id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                for pk, text in batch:
+                    grams = trigrams(text)
+                    movie_id, person_id = (pk, None) if model is Movie else (None, pk)
+                    for gram in grams:
+                        yield [gram, movie_id, person_id, len(grams)]
+                last_id = batch[-1][0]
+
+    # Raw batched inserts, with the indexes built once at the end
+    connection = connections[using]
+    with connection.constraint_checks_disabled(), transaction.atomic(using=connection.alias):
+        SearchTrigram.objects.using(using).all().delete()
+        with connection.schema_editor(atomic=False) as editor:
+            for index in SearchTrigram._meta.indexes:
+                editor.remove_index(SearchTrigram, index)
+        written = insert_rows(SearchTrigram, fields, postings(), using=using, batch_size=batch_size)
+        with connection.schema_editor(atomic=False) as editor:
+            for index in SearchTrigram._meta.indexes:
+                editor.add_index(SearchTrigram, index)
+    return written
+
+
+def _similar_ids(model, field, text_field, query, limit):
+    """Return {id: similarity} for the closest matches, best first."""
+    if use_pg_trgm():
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        matches = model.objects.filter(
+            TrigramSimilar(F(text_field), Value(query))
+        ).annotate(
+            similarity=TrigramSimilarity(text_field, query)
+        ).order_by('-similarity').values_list('id', 'similarity')[:limit]
+        return dict(matches)
+
+    grams = trigrams(query)
+    if not grams:
+        return {}
+    # Jaccard similarity, the same measure pg_trgm's similarity() uses
+    hits = Cast(Count('id'), FloatField())
+    matches = SearchTrigram.objects.filter(
+        trigram__in=grams, **{f'{field}__isnull': False}
+    ).values(field).annotate(
+        similarity=hits / (Value(float(len(grams))) + Max('total') - hits)
+    ).filter(
+        similarity__gte=SIMILARITY_THRESHOLD
+    ).order_by('-similarity').values_list(field, 'similarity')[:limit]
+    return dict(matches)
+
+
+def similar_movie_ids(query, limit=MAX_CANDIDATES):
+    """
+    Movies whose title, or one of whose credited people, is similar to query.
+    Returns {movie_id: similarity}.
+    """
+    scores = _similar_ids(Movie, 'movie', 'title', query, limit)
+
+    people = _similar_ids(Person, 'person', 'name', query, limit)
+    if people:
+        for credit_model in (MovieCast, MovieCrew):
+            credits = credit_model.objects.filter(person_id__in=people).values_list('movie_id', 'person_id')
+            for movie_id, person_id in credits:
+                scores[movie_id] = max(scores.get(movie_id, 0), people[person_id])
+    return scores
+
+
+def _rank(queryset, scores):
+    similarity = Case(
+        *[When(id=pk, then=Value(score)) for pk, score in scores.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return queryset.filter(id__in=list(scores)).annotate(similarity=similarity)
+
+
+def fuzzy_search_movies(queryset, query):
+    """Narrow a Movie queryset to fuzzy matches, ordered by similarity then popularity."""
+    scores = similar_movie_ids(query)
+    if not scores:
+        return queryset.none()
+    return _rank(queryset, scores).order_by('-similarity', '-popularity')
+
+
+def fuzzy_search_people(queryset, query):
+    """Narrow a Person queryset to fuzzy name matches, ordered by similarity then credit count."""
+    scores = _similar_ids(Person, 'person', 'name', query, MAX_CANDIDATES)
+    if not scores:
+        return queryset.none()
+    return _rank(queryset, scores).order_by('-similarity', '-credit_count')
@@ -0,0 +1,94 @@
+"""
+Industry classification from TMDB's original_language and production_countries.
+
+The rules are ordered and the first match wins; a movie with a known
+language that matches none of them, a French or Korean title say, is filed
+under Other rather than guessed into one of the catalog's industries.
+The same rules compile to Q objects, so reclassify_industries fixes stored
+rows with one UPDATE per industry instead of visiting each movie.
+"""
+from django.db.models import Q
+
+from .models import Industry, Movie
+
+OTHER_INDUSTRY = 'Other'
+
+# (industry, original languages, production country required or None)
+INDUSTRY_RULES = [
+    ('Bollywood', ('hi',), None),
+    ('South Indian', ('ta', 'te', 'ml', 'kn'), None),
+    # Indian productions in English or Urdu come out of the Hindi industry
+    ('Bollywood', ('en', 'ur'), 'IN'),
+    ('Hollywood', ('en',), None),
+]
+
+
+def production_countries(details):
+    """ISO 3166-1 codes of a TMDB details payload, joined as stored on Movie."""
+    codes = [c.get('iso_3166_1') for c in details.get('production_countries') or []]
+    return ','.join(code for code in codes if code)
+
+
+def classify(original_language, countries=''):
+    """
+    Industry name for a movie, or None when its language is unknown.
+    countries is the comma-joined code string stored on Movie.
+    """
+    if not original_language:
+        return None
+    country_codes = countries.split(',') if countries else []
+    for name, languages, country in INDUSTRY_RULES:
+        if original_language in languages and (country is None or country in country_codes):
+            return name
+    return OTHER_INDUSTRY
+
+
+def industry_filters():
+    """{industry name: Q} selecting the movies classify() assigns to it."""
+    filters, matched = {}, Q()
+    for name, languages, country in INDUSTRY_RULES:
+        rule = Q(original_language__in=languages)
+        if country:
+            # Codes are two letters between commas, so a substring match is exact
+            rule &= Q(production_countries__contains=country)
+        filters[name] = filters.get(name, Q()) | (rule & ~matched)
+        matched |= rule
+    filters[OTHER_INDUSTRY] = ~Q(original_language='') & ~matched
+    return filters
+
+
+class IndustryClassifier:
+    """
+    Maps TMDB details payloads to Industry rows, for save_movie_batch's
+    industry_for. Industries are loaded once and missing ones created on
+    first use, so a batch costs no per-movie lookups. Payloads without an
+    original_language get default; save_movie_batch keeps the stored
+    industry of an existing movie rather than writing None over it.
+    """
+
+    def __init__(self, default=None):
+        self.default = default
+        self.industries = {industry.name: industry for industry in Industry.objects.all()}
+
+    def industry(self, name):
+        if name not in self.industries:
+            self.industries[name], _ = Industry.objects.get_or_create(name=name)
+        return self.industries[name]
+
+    def __call__(self, details):
+        name = classify(details.get('original_language'), production_countries(details))
+        return self.industry(name) if name else self.default
+
+
+def reclassify(dry_run=False):
+    """
+    Move stored movies to the industry their language and countries imply,
+    one UPDATE per industry. Returns {industry name: movies changed}.
+    """
+    classifier = IndustryClassifier()
+    changed = {}
+    for name, condition in industry_filters().items():
+        industry = classifier.industry(name)
+        wrong = Movie.objects.filter(condition).exclude(industry=industry)
+        changed[name] = wrong.count() if dry_run else wrong.update(industry=industry)
+    return changed
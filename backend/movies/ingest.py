@@ -0,0 +1,145 @@
+"""
+Batched writes of TMDB movie details into the catalog.
+
+save_movie_batch() takes the payloads of /movie/{id}?append_to_response=
+credits,videos for many movies and writes them with a fixed number of
+queries per batch, instead of a get_or_create per movie, person and credit.
+It keeps the same rules as import_thriller_movies: the top 10 billed cast,
+directors and writers from the crew, and every video. The denormalized
+summaries, person stats and search trigrams are refreshed for the batch.
+"""
+from django.db import transaction
+
+from .fuzzy import index_movies, index_people
+from .industries import production_countries
+from .models import CollectionEntry, Movie, MovieCast, MovieCrew, Person, Video, normalize_search_text
+
+# Credits kept per movie, as in import_thriller_movies
+CAST_LIMIT = 10
+CREW_JOBS = ('Director', 'Screenplay', 'Writer')
+
+
+def movie_fields(details, industry):
+    """Movie column values from a TMDB details payload."""
+    return {
+        'title': details.get('title') or details.get('original_title') or '',
+        'overview': details.get('overview') or '',
+        'poster_path': details.get('poster_path') or '',
+        'backdrop_path': details.get('backdrop_path') or '',
+        'release_date': details.get('release_date') or None,
+        'popularity': float(details.get('popularity') or 0),
+        'rating': float(details.get('vote_average') or 0),
+        'original_language': details.get('original_language') or '',
+        'production_countries': production_countries(details),
+        'industry': industry,
+    }
+
+
+def _credits(details):
+    credits = details.get('credits') or {}
+    cast = sorted(credits.get('cast', []), key=lambda c: c.get('order', 0))[:CAST_LIMIT]
+    crew = [c for c in credits.get('crew', []) if c.get('job') in CREW_JOBS]
+    return cast, crew
+
+
+def _save_people(entries):
+    """Return {tmdb_id: Person} for the credited people, creating the missing ones in bulk."""
+    names = {}
+    for entry in entries:
+        names.setdefault(entry['id'], (entry.get('name') or '', entry.get('profile_path') or ''))
+
+    people = {p.tmdb_id: p for p in Person.objects.filter(tmdb_id__in=names)}
+    missing = [
+        # bulk_create skips Person.save(), so fill search_name here
+        Person(tmdb_id=tmdb_id, name=name, profile_path=profile_path, search_name=normalize_search_text(name))
+        for tmdb_id, (name, profile_path) in names.items() if tmdb_id not in people
+    ]
+    if missing:
+        Person.objects.bulk_create(missing, ignore_conflicts=True)
+        people.update((p.tmdb_id, p) for p in Person.objects.filter(tmdb_id__in=[p.tmdb_id for p in missing]))
+    return people
+
+
+@transaction.atomic
+def save_movie_batch(details_list, industry_for):
+    """
+    Write a batch of TMDB details payloads. industry_for(details) returns the
+    Industry for each movie, usually an IndustryClassifier. Returns
+    (created, updated) counts.
+    """
+    details_list = list({d['id']: d for d in details_list}.values())
+    if not details_list:
+        return 0, 0
+
+    existing = {m.tmdb_id: m for m in Movie.objects.filter(tmdb_id__in=[d['id'] for d in details_list])}
+    movies, new_movies = [], []
+    for details in details_list:
+        fields = movie_fields(details, industry_for(details))
+        movie = existing.get(details['id'])
+        if movie is None:
+            movie = Movie(tmdb_id=details['id'], **fields)
+            new_movies.append(movie)
+        else:
+            if fields['industry'] is None:
+                # No language to classify by; don't unset the stored industry
+                fields['industry'] = movie.industry
+            for key, value in fields.items():
+                setattr(movie, key, value)
+        movies.append(movie)
+    Movie.objects.bulk_create(new_movies)
+    if new_movies and new_movies[0].pk is None:
+        # Backends that don't return ids from bulk inserts
+        ids = dict(Movie.objects.filter(tmdb_id__in=[m.tmdb_id for m in new_movies]).values_list('tmdb_id', 'id'))
+        for movie in new_movies:
+            movie.pk = ids[movie.tmdb_id]
+    if existing:
+        Movie.objects.bulk_update(list(existing.values()), list(movie_fields({}, None)))
+
+    credits = {details['id']: _credits(details) for details in details_list}
+    people = _save_people(entry for cast, crew in credits.values() for entry in cast + crew)
+
+    # Replace the related rows, as the single-movie importers do. People
+    # dropped from a movie need their stats refreshed too.
+    uncredited = set()
+    if existing:
+        for credit_model in (MovieCast, MovieCrew):
+            uncredited.update(credit_model.objects.filter(movie__in=movies).values_list('person_id', flat=True))
+    MovieCast.objects.filter(movie__in=movies).delete()
+    MovieCrew.objects.filter(movie__in=movies).delete()
+    Video.objects.filter(movie__in=movies).delete()
+
+    all_cast, all_crew, all_videos = [], [], []
+    for movie, details in zip(movies, details_list):
+        cast_entries, crew_entries = credits[movie.tmdb_id]
+        cast = [
+            MovieCast(movie=movie, person=people[c['id']], character=c.get('character') or '', order=c.get('order', 0))
+            for c in cast_entries
+        ]
+        crew = [
+            MovieCrew(movie=movie, person=people[c['id']], job=c['job'], department=c.get('department') or '')
+            for c in crew_entries
+        ]
+        videos = [
+            Video(
+                movie=movie, key=v['key'], name=v.get('name') or '', site=v.get('site') or '',
+                type=v.get('type') or '',
+            )
+            for v in (details.get('videos') or {}).get('results', [])
+        ]
+        movie.set_credit_summary(cast, crew, videos)
+        all_cast += cast
+        all_crew += crew
+        all_videos += videos
+
+    MovieCast.objects.bulk_create(all_cast)
+    MovieCrew.objects.bulk_create(all_crew)
+    Video.objects.bulk_create(all_videos)
+    Movie.objects.bulk_update(movies, Movie.SUMMARY_FIELDS)
+    if new_movies:
+        CollectionEntry.link_movies(m.tmdb_id for m in new_movies)
+
+    credited = {p.id: p for p in people.values()}
+    Person.refresh_credit_stats(credited.keys() | uncredited)
+    index_movies(movies)
+    index_people(credited.values())
+    return len(new_movies), len(existing)
@@ -0,0 +1,310 @@
+"""
+DB-backed background jobs for imports, syncs and rebuilds.
+
+Work is queued as Job rows (from the admin or `manage.py enqueue_job`) and
+run by `manage.py run_jobs`, so nothing heavy runs inside a web request or
+before the server starts. Each job type is a function registered with
+@job_type and given a JobContext to report progress through; report()
+also raises JobCancelled once a cancel is requested.
+
+The worker claims the highest priority, oldest queued job whose type is
+below its concurrency limit. The claim is a conditional UPDATE, re-checked
+against the limit afterwards, so several workers can share one queue. A
+running job's heartbeat is refreshed while it runs; jobs whose worker
+stopped checking in are requeued, up to MAX_ATTEMPTS.
+"""
+import io
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+import requests
+from django.core.management import call_command
+from django.db import connections
+from django.db.models import Count, Prefetch
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .industries import IndustryClassifier
+from .fuzzy import index_movies, index_people
+from .ingest import save_movie_batch
+from .models import Job, Movie, MovieCast, MovieCrew, Person
+from .tmdb_service import get_movie_details
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 10
+# A running job whose heartbeat is older than this lost its worker
+STALE_SECONDS = 300
+MAX_ATTEMPTS = 3
+# Minimum seconds between progress writes
+REPORT_INTERVAL = 1.0
+
+# Management commands that can run as jobs, with how many may run at once
+COMMAND_JOBS = {
+    'import_tmdb_export': 1,
+    'import_tmdb_movies': 1,
+    'import_thriller_movies': 1,
+    'load_collections': 1,
+    'load_catalog': 1,
+    'setup_industries': 1,
+    'reclassify_industries': 1,
+    'refresh_credit_summaries': 1,
+    'rebuild_search_trigrams': 1,
+    'remove_duplicate_movies': 1,
+    'export_catalog_snapshot': 1,
+    'warm_catalog_cache': 1,
+    'rebuild_trending': 1,
+    'compute_recommendations': 1,
+    'reconcile_user_ratings': 1,
+}
+REIMPORT_BATCH_SIZE = 50
+REIMPORT_WORKERS = 8
+REFRESH_BATCH_SIZE = 500
+
+
+class JobCancelled(Exception):
+    pass
+
+
+@dataclass
+class JobType:
+    name: str
+    run: Callable
+    concurrency: int = 1
+
+
+JOB_TYPES = {}
+
+
+def job_type(name, concurrency=1):
+    """Register func(context, **params) as a job type."""
+    def register(func):
+        JOB_TYPES[name] = JobType(name, func, concurrency)
+        return func
+    return register
+
+
+def enqueue(kind, params=None, priority=0, unique=False):
+    """
+    Queue a job and return it. With unique, an identical job that is already
+    queued or running is returned instead.
+    """
+    if kind not in JOB_TYPES:
+        raise ValueError(f'Unknown job type {kind!r}')
+    params = params or {}
+    if not isinstance(params, dict):
+        # The worker passes them to the job type as keyword arguments
+        raise ValueError('Job parameters must be a JSON object')
+    if unique:
+        existing = Job.objects.filter(kind=kind, params=params, status__in=[Job.QUEUED, Job.RUNNING]).first()
+        if existing:
+            return existing
+    return Job.objects.create(kind=kind, params=params, priority=priority)
+
+
+class JobContext:
+    def __init__(self, job):
+        self.job = job
+        self._reported = 0
+
+    def report(self, progress=None, message=None, force=False):
+        """
+        Record progress (0-1) and a status message, at most once per
+        REPORT_INTERVAL unless forced. Raises JobCancelled if the job was
+        cancelled.
+        """
+        now = time.monotonic()
+        if not force and now - self._reported < REPORT_INTERVAL:
+            return
+        self._reported = now
+        fields = {'heartbeat_at': timezone.now()}
+        if progress is not None:
+            fields['progress'] = max(0.0, min(1.0, progress))
+        if message is not None:
+            fields['message'] = message[:255]
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+        if Job.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+class _ReportingStream(io.TextIOBase):
+    """A command's stdout that reports its latest line as the job message."""
+
+    def __init__(self, context):
+        self.context = context
+        self.last_line = None
+
+    def write(self, text):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        if lines:
+            self.last_line = lines[-1]
+            self.context.report(message=self.last_line)
+        return len(text)
+
+
+def _run_command(name):
+    def run(context, args=(), options=None):
+        stream = _ReportingStream(context)
+        call_command(name, *args, stdout=stream, stderr=stream, **(options or {}))
+        # Throttling may have skipped the command's summary line
+        context.report(message=stream.last_line, force=True)
+    return run
+
+
+for _name, _concurrency in COMMAND_JOBS.items():
+    job_type(_name, _concurrency)(_run_command(_name))
+
+
+@job_type('reimport_movies', concurrency=2)
+def reimport_movies(context, tmdb_ids):
+    """Fetch the given movies from TMDB again and write them in batches."""
+    classifier = IndustryClassifier()
+    done = failed = 0
+
+    def fetch(tmdb_id):
+        try:
+            return get_movie_details(tmdb_id)
+        except requests.RequestException as e:
+            logger.warning('Could not fetch movie %s: %s', tmdb_id, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=REIMPORT_WORKERS) as executor:
+        for start in range(0, len(tmdb_ids), REIMPORT_BATCH_SIZE):
+            batch = tmdb_ids[start:start + REIMPORT_BATCH_SIZE]
+            details = [d for d in executor.map(fetch, batch) if d is not None]
+            save_movie_batch(details, classifier)
+            done += len(batch)
+            failed += len(batch) - len(details)
+            context.report(done / len(tmdb_ids), f'Re-imported {done - failed} of {len(tmdb_ids)} movies')
+    bump_catalog_version()
+    context.report(1, f'Re-imported {done - failed} of {len(tmdb_ids)} movies ({failed} failed)', force=True)
+
+
+@job_type('refresh_movies', concurrency=2)
+def refresh_movies(context, movie_ids):
+    """Rebuild the credit summaries, person stats and search trigrams of the given movies."""
+    movies = Movie.objects.order_by('id').prefetch_related(
+        Prefetch('cast', queryset=MovieCast.objects.select_related('person').order_by('order')),
+        Prefetch('crew', queryset=MovieCrew.objects.select_related('person')),
+        'videos',
+    )
+    for start in range(0, len(movie_ids), REFRESH_BATCH_SIZE):
+        batch = list(movies.filter(id__in=movie_ids[start:start + REFRESH_BATCH_SIZE]))
+        people = {}
+        for movie in batch:
+            cast, crew = list(movie.cast.all()), list(movie.crew.all())
+            movie.set_credit_summary(cast, crew, list(movie.videos.all()))
+            people.update((credit.person_id, credit.person) for credit in cast + crew)
+        Movie.objects.bulk_update(batch, Movie.SUMMARY_FIELDS)
+        Person.refresh_credit_stats(list(people))
+        index_movies(batch)
+        index_people(people.values())
+        done = min(start + REFRESH_BATCH_SIZE, len(movie_ids))
+        context.report(done / len(movie_ids), f'Refreshed {done} of {len(movie_ids)} movies')
+    bump_catalog_version()
+
+
+def requeue_stale():
+    """Requeue running jobs whose worker stopped sending heartbeats. Returns how many."""
+    cutoff = timezone.now() - timedelta(seconds=STALE_SECONDS)
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=Job.FAILED, error='The worker running this job stopped.', finished_at=timezone.now()
+    )
+    return failed + stale.update(status=Job.QUEUED, worker='')
+
+
+def claim(worker, kinds=None):
+    """Mark the next runnable queued job as running for worker and return it, or None."""
+    running = dict(
+        Job.objects.filter(status=Job.RUNNING).values_list('kind').annotate(count=Count('id')).order_by()
+    )
+    full = [name for name, job in JOB_TYPES.items() if running.get(name, 0) >= job.concurrency]
+    candidates = Job.objects.filter(status=Job.QUEUED, kind__in=kinds or list(JOB_TYPES)).exclude(kind__in=full)
+    for job in candidates.order_by('-priority', 'created_at')[:10]:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+            attempts=job.attempts + 1, progress=None, error='',
+        )
+        if not claimed:
+            continue
+        # Another worker may have claimed a job of the same type meanwhile
+        if Job.objects.filter(status=Job.RUNNING, kind=job.kind).count() > JOB_TYPES[job.kind].concurrency:
+            Job.objects.filter(pk=job.pk).update(status=Job.QUEUED, worker='', attempts=job.attempts)
+            continue
+        job.refresh_from_db()
+        return job
+    return None
+
+
+def run_job(job):
+    """Run a claimed job to completion and record the outcome."""
+    context = JobContext(job)
+    try:
+        JOB_TYPES[job.kind].run(context, **job.params)
+    except JobCancelled:
+        status, error = Job.CANCELLED, ''
+    except Exception:
+        logger.exception('Job %s failed', job)
+        status, error = Job.FAILED, traceback.format_exc()
+    else:
+        status, error = Job.SUCCEEDED, ''
+    fields = {'status': status, 'error': error, 'finished_at': timezone.now()}
+    if status == Job.SUCCEEDED:
+        fields['progress'] = 1
+    Job.objects.filter(pk=job.pk).update(**fields)
+    connections.close_all()
+    return status
+
+
+class Worker:
+    """
+    Runs up to `slots` jobs at a time in threads, polling the queue every
+    poll_seconds and refreshing the heartbeat of the jobs it runs.
+    """
+
+    def __init__(self, slots=2, poll_seconds=2, kinds=None):
+        self.slots = slots
+        self.poll_seconds = poll_seconds
+        self.kinds = kinds
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.running = {}
+        self.stopping = threading.Event()
+
+    def start_job(self, job):
+        thread = threading.Thread(target=run_job, args=(job,), name=f'job-{job.pk}', daemon=True)
+        self.running[job.pk] = thread
+        thread.start()
+
+    def run(self, once=False):
+        """Process jobs until stop() (or, with once, until the queue is empty)."""
+        last_heartbeat = 0
+        while not self.stopping.is_set():
+            self.running = {pk: thread for pk, thread in self.running.items() if thread.is_alive()}
+            requeue_stale()
+            while len(self.running) < self.slots:
+                job = claim(self.name, self.kinds)
+                if job is None:
+                    break
+                logger.info('Starting job %s', job)
+                self.start_job(job)
+            if self.running and time.monotonic() - last_heartbeat >= HEARTBEAT_SECONDS:
+                Job.objects.filter(pk__in=list(self.running), status=Job.RUNNING).update(heartbeat_at=timezone.now())
+                last_heartbeat = time.monotonic()
+            if once and not self.running:
+                break
+            self.stopping.wait(self.poll_seconds)
+        for thread in self.running.values():
+            thread.join()
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from movies.columnar import build_catalog_columns, np
+from movies.filters import MovieListParamsSerializer, filter_movies, page_bounds, sort_movies
+from movies.models import Movie
+
+# Request mix from the home page rails and the browse page
+BENCHMARK_QUERIES = [
+    {'sort': 'popularity', 'min_rating': '7', 'limit': '15'},
+    {'sort': 'top_rated', 'min_rating': '8.5', 'limit': '15'},
+    {'industry': 'hollywood', 'limit': '20'},
+    {'industry': 'bollywood', 'limit': '20'},
+    {'industry': 'south indian', 'limit': '20'},
+    {'year': '2010-2019', 'sort': 'rating', 'limit': '20'},
+    {'year': '2023', 'sort': 'release_date', 'limit': '20'},
+    {'sort': 'title', 'limit': '50'},
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare the columnar catalog index against the ORM for /api/movies/ filter and sort requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Runs per query and path')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('NumPy is not installed; the columnar index is unavailable.')
+
+        iterations = options['iterations']
+        started = time.perf_counter()
+        columns = build_catalog_columns()
+        self.stdout.write(
+            f'Built columnar index over {len(columns)} movies in '
+            f'{(time.perf_counter() - started) * 1000:.1f} ms\n'
+        )
+
+        self.stdout.write(f'{"query":<50} {"orm p50":>9} {"orm p95":>9} {"col p50":>9} {"col p95":>9} {"speedup":>8}')
+        for query in BENCHMARK_QUERIES:
+            serializer = MovieListParamsSerializer(data=query)
+            serializer.is_valid(raise_exception=True)
+            params = serializer.validated_data
+
+            def orm_ids():
+                queryset = sort_movies(filter_movies(Movie.objects.all(), params), params.get('sort', 'popularity'))
+                start, end = page_bounds(params)
+                return list(queryset.values_list('id', flat=True)[start:end])
+
+            def columnar_ids():
+                return columns.query(params)
+
+            if orm_ids() != columnar_ids():
+                self.stdout.write(self.style.WARNING(f'Result mismatch for {query}'))
+
+            orm = self.measure(orm_ids, iterations)
+            col = self.measure(columnar_ids, iterations)
+            label = '&'.join(f'{key}={value}' for key, value in query.items())
+            self.stdout.write(
+                f'{label:<50} {orm[0]:>8.3f}ms {orm[1]:>8.3f}ms {col[0]:>8.3f}ms {col[1]:>8.3f}ms '
+                f'{orm[0] / col[0]:>7.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS('\nBenchmark complete (id selection only; both paths hydrate the same page)'))
+
+    def measure(self, func, iterations):
+        """Return (p50, p95) in milliseconds."""
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
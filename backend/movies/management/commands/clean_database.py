@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from movies.models import Movie, Person, MovieCast, MovieCrew, Video
+from movies.catalog import bump_catalog_version
 
 class Command(BaseCommand):
     help = 'Clean the database by removing all movies and related data'
@@ -21,4 +22,6 @@ class Command(BaseCommand):
         self.stdout.write('Deleting all persons...')
         Person.objects.all().delete()
         
+        bump_catalog_version()
+
         self.stdout.write(self.style.SUCCESS('Successfully cleaned the database!')) 
\ No newline at end of file
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from movies.catalog_dump import BATCH_SIZE, dump_catalog
+
+
+class Command(BaseCommand):
+    help = 'Write the catalog to a compressed NDJSON dump that load_catalog can seed a database from'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file, e.g. catalog.ndjson.gz')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows fetched per query')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = dump_catalog(options['path'], batch_size=options['batch_size'])
+        for table, count in counts.items():
+            self.stdout.write(f'  {table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully dumped {sum(counts.values())} rows to {options['path']} "
+            f'in {time.monotonic() - started:.1f}s'
+        ))
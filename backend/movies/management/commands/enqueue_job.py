@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from movies.jobs import COMMAND_JOBS, JOB_TYPES, enqueue
+
+
+class Command(BaseCommand):
+    help = 'Queue a background job for the run_jobs worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', help=f"Job type: {', '.join(sorted(JOB_TYPES))}")
+        parser.add_argument('args', nargs='*', help='Positional arguments of a command job')
+        parser.add_argument(
+            '--params', default='{}',
+            help='JSON job parameters; for command jobs the options, e.g. \'{"if_empty": true}\''
+        )
+        parser.add_argument('--priority', type=int, default=0, help='Higher runs first')
+        parser.add_argument('--unique', action='store_true', help='Skip if the same job is queued or running')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        if kind not in JOB_TYPES:
+            raise CommandError(f'Unknown job type {kind!r}')
+        try:
+            params = json.loads(options['params'])
+        except ValueError:
+            params = None
+        if not isinstance(params, dict):
+            raise CommandError('--params must be a JSON object.')
+        if kind in COMMAND_JOBS:
+            params = {'args': list(args), 'options': params}
+        elif args:
+            raise CommandError(f'{kind} takes --params, not positional arguments.')
+
+        job = enqueue(kind, params, priority=options['priority'], unique=options['unique'])
+        self.stdout.write(self.style.SUCCESS(f'Queued {job}'))
@@ -0,0 +1,209 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.sql.where import AND
+from django.test import RequestFactory
+from movies.models import Movie, MovieCast, MovieCrew, Video
+from movies.views import MovieListAPIView, IndustryMoviesAPIView
+
+# Filter combinations the frontend and API clients send to /api/movies/
+LIST_FILTERS = [
+    {},
+    {'search': 'drishyam'},
+    {'industry': 'hollywood'},
+    {'year': '2015'},
+    {'year': '2010-2019'},
+    {'min_rating': '7'},
+    {'industry': 'bollywood', 'min_rating': '7'},
+    {'min_user_rating': '7'},
+]
+
+LIST_SORTS = ['popularity', 'rating', 'release_date', 'title', 'top_rated', 'user_rating']
+
+EQUALITY_LOOKUPS = {'exact', 'in', 'isnull'}
+RANGE_LOOKUPS = {'gt', 'gte', 'lt', 'lte', 'range'}
+
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN for every API query shape, flag full scans and temporary sorts, and propose indexes for them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Print the full plan for every query, not just flagged ones'
+        )
+        parser.add_argument(
+            '--fail-on-issues',
+            action='store_true',
+            help='Exit with a non-zero status if any query shape is flagged'
+        )
+
+    def handle(self, *args, **options):
+        self.factory = RequestFactory()
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'postgresql'):
+            self.stderr.write(self.style.ERROR(f'Unsupported database backend: {vendor}'))
+            return
+
+        self.stdout.write(f'Explaining API query shapes on {vendor}...\n')
+
+        flagged = 0
+        proposals = set()
+        for name, queryset in self.get_query_shapes():
+            if queryset.query.is_empty():
+                # Known to match nothing (e.g. an unknown industry), so no SQL runs
+                self.stdout.write(f'[no query] {name}')
+                continue
+            plan = queryset.explain()
+            issues = self.find_issues(plan, vendor)
+
+            if issues:
+                flagged += 1
+                labels = ', '.join(dict.fromkeys(issue for issue, _ in issues))
+                self.stdout.write(self.style.WARNING(f'[{labels}] {name}'))
+                proposal = self.propose_index(queryset, issues)
+                if proposal:
+                    proposals.add(proposal)
+                    self.stdout.write(f'    proposed: {proposal}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'[ok] {name}'))
+
+            if issues or options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    | {line}')
+
+        self.stdout.write('')
+        if proposals:
+            self.stdout.write(self.style.WARNING('Proposed indexes:'))
+            for proposal in sorted(proposals):
+                self.stdout.write(f'  {proposal}')
+        if vendor == 'postgresql':
+            self.stdout.write(
+                'Note: Postgres prefers sequential scans on small tables; '
+                'run ANALYZE on a production-sized catalog before acting on these results.'
+            )
+
+        summary = f'{flagged} query shape(s) flagged'
+        if flagged:
+            self.stdout.write(self.style.WARNING(summary))
+            if options['fail_on_issues']:
+                raise SystemExit(1)
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    def find_issues(self, plan, vendor):
+        """
+        Return the problems found in a query plan, as (issue, table) pairs;
+        the table is None for sorts, which the plan doesn't attribute.
+        """
+        issues = []
+        for line in plan.splitlines():
+            if vendor == 'sqlite':
+                words = line.split()
+                if 'SCAN' in words and 'USING' not in line and 'CONSTANT ROW' not in line:
+                    issues.append(('full scan', words[words.index('SCAN') + 1]))
+                if 'USE TEMP B-TREE' in line:
+                    issues.append(('temp b-tree sort', None))
+            else:
+                if 'Seq Scan on' in line:
+                    issues.append(('full scan', line.split('Seq Scan on', 1)[1].split()[0]))
+                if line.strip().startswith('Sort ') or '->  Sort ' in line:
+                    issues.append(('sort', None))
+        # Keep the order, drop repeats
+        return list(dict.fromkeys(issues))
+
+    def filter_columns(self, where):
+        """(lookup name, field name) of the AND-ed conditions on the queried table."""
+        for child in where.children:
+            if hasattr(child, 'children'):
+                if child.connector == AND and not child.negated:
+                    yield from self.filter_columns(child)
+                continue
+            target = getattr(getattr(child, 'lhs', None), 'target', None)
+            if target is not None:
+                yield child.lookup_name, target
+
+    def is_column(self, model, name):
+        """Whether an ORDER BY term is a column of model, not an annotation or expression."""
+        try:
+            return isinstance(name, str) and model._meta.get_field(name.lstrip('-')).concrete
+        except FieldDoesNotExist:
+            return False
+
+    def propose_index(self, queryset, issues):
+        """
+        Derive an index from a flagged plan: the columns the query compares
+        for equality, then its ORDER BY when the plan sorts, or else the
+        first range condition when the plan scans the queried table.
+        Returns None when no B-tree index would help (e.g. substring search)
+        or the index already exists.
+        """
+        model = queryset.model
+        table = model._meta.db_table
+        sorts = any(scanned is None for _, scanned in issues)
+        scans = any(scanned == table for _, scanned in issues)
+        if not (sorts or scans):
+            return None
+
+        columns = {lookup: [] for lookup in ('equality', 'range')}
+        for lookup, field in self.filter_columns(queryset.query.where):
+            if field.model is not model or field.primary_key:
+                # Lookups by primary key are already indexed
+                continue
+            if lookup in EQUALITY_LOOKUPS:
+                columns['equality'].append(field.name)
+            elif lookup in RANGE_LOOKUPS:
+                columns['range'].append(field.name)
+        fields = list(dict.fromkeys(columns['equality']))
+        order_by = list(queryset.query.order_by)
+        if sorts and order_by and all(self.is_column(model, field) for field in order_by):
+            fields += [field for field in order_by if field.lstrip('-') not in fields]
+        elif columns['range']:
+            fields.append(columns['range'][0])
+        if not fields or fields == ['id']:
+            return None
+
+        for index in model._meta.indexes:
+            if list(index.fields[:len(fields)]) == fields:
+                return None
+        return f'{model.__name__}: models.Index(fields={fields!r})'
+
+    def list_queryset(self, view_class, params=None, **kwargs):
+        view = view_class()
+        view.request = view.initialize_request(self.factory.get('/api/movies/', params or {}))
+        view.kwargs = kwargs
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def get_query_shapes(self):
+        """Yield (name, queryset) for every query the API issues."""
+        for filters in LIST_FILTERS:
+            for sort in LIST_SORTS:
+                params = dict(filters, sort=sort)
+                query_string = '&'.join(f'{key}={value}' for key, value in params.items())
+                yield f'GET /api/movies/?{query_string}', self.list_queryset(MovieListAPIView, params)
+
+        # Both search paths, whichever one the sample query takes on this catalog
+        yield 'search: title/overview/credit_names contain', \
+            MovieListAPIView.match_search(Movie.objects.all(), 'drishyam')
+        yield 'GET /api/movies/?search=drishyam&fuzzy=1', \
+            self.list_queryset(MovieListAPIView, {'search': 'drishyam', 'fuzzy': '1'})
+
+        yield 'GET /api/movies/?sort=popularity&min_rating=7&limit=15', \
+            self.list_queryset(MovieListAPIView, {'sort': 'popularity', 'min_rating': '7', 'limit': '15'})
+
+        yield 'GET /api/movies/industry/hollywood/', \
+            self.list_queryset(IndustryMoviesAPIView, industry_name='hollywood')
+
+        yield 'GET /api/movies/<tmdb_id>/', Movie.objects.filter(tmdb_id=1)
+
+        # Prefetches issued for every page of movies
+        movie_ids = list(Movie.objects.values_list('id', flat=True)[:20]) or [1]
+        yield 'prefetch cast', MovieCast.objects.filter(movie_id__in=movie_ids)
+        yield 'prefetch crew', MovieCrew.objects.filter(movie_id__in=movie_ids)
+        yield 'prefetch videos', Video.objects.filter(movie_id__in=movie_ids)
+
+        # Lookups made by the import commands
+        yield 'import: video update_or_create', Video.objects.filter(movie_id=1, key='abc')
+        yield 'import: movie get_or_create', Movie.objects.filter(tmdb_id=1)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from movies.snapshot_files import COPY_BATCH_SIZE, export_snapshot, snapshot_dir
+
+
+class Command(BaseCommand):
+    help = 'Write the catalog to an immutable SQLite snapshot file for read-only API replicas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help='Snapshot directory (defaults to CATALOG_SNAPSHOT_DIR)')
+        parser.add_argument('--keep', type=int, default=3, help='Number of snapshot files to keep')
+        parser.add_argument('--batch-size', type=int, default=COPY_BATCH_SIZE, help='Rows copied per batch')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or snapshot_dir()
+        self.stdout.write(f'Exporting catalog snapshot to {directory}...')
+        manifest = export_snapshot(directory, keep=max(1, options['keep']), batch_size=options['batch_size'])
+
+        for table, count in manifest['counts'].items():
+            self.stdout.write(f'  {table}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Published catalog version {manifest['version']} as {manifest['file']} "
+            f"({manifest['size'] / 1024 / 1024:.1f} MB, sha256 {manifest['sha256'][:12]})"
+        ))
@@ -1,6 +1,8 @@
 from django.core.management.base import BaseCommand
 from movies.tmdb_service import import_movie_by_name
 from movies.models import Movie, Person, MovieCast, MovieCrew, Video, Industry
+from movies.catalog import bump_catalog_version
+from movies.industries import IndustryClassifier, production_countries
 from django.db import transaction
 
 class Command(BaseCommand):
@@ -8,7 +10,7 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('movie_name', type=str, help='Name of the movie to import')
-        parser.add_argument('--industry', type=str, choices=['Hollywood', 'Bollywood', 'South Indian'],
+        parser.add_argument('--industry', type=str, choices=['Hollywood', 'Bollywood', 'South Indian', 'Other'],
                           help='Specify the movie industry')
 
     @transaction.atomic
@@ -23,20 +25,20 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f"❌ No movie found with name: {movie_name}"))
             return
 
-        # Get or create industry if specified
-        industry = None
+        # Use the industry if specified, otherwise classify by language and country
         if industry_name:
             try:
                 industry = Industry.objects.get(name=industry_name)
             except Industry.DoesNotExist:
                 self.stdout.write(self.style.ERROR(f"❌ Industry not found: {industry_name}"))
                 return
+        else:
+            industry = IndustryClassifier()(movie_data)
         
         self.stdout.write(f"📝 Creating/updating movie: {movie_data['title']}")
         
         # Create or update the movie using the new method
-        movie, created = Movie.create_or_update(
-            tmdb_id=movie_data['id'],
+        data = dict(
             title=movie_data['title'],
             overview=movie_data.get('overview', ''),
             poster_path=movie_data.get('poster_path', ''),
@@ -44,8 +46,13 @@ class Command(BaseCommand):
             release_date=movie_data.get('release_date'),
             popularity=float(movie_data.get('popularity', 0)),
             rating=float(movie_data.get('vote_average', 0)),
-            industry=industry
+            original_language=movie_data.get('original_language') or '',
+            production_countries=production_countries(movie_data),
         )
+        if industry is not None:
+            # Without a language to classify by, keep the stored industry
+            data['industry'] = industry
+        movie, created = Movie.create_or_update(tmdb_id=movie_data['id'], **data)
 
         # Remove genre code
         self.stdout.write("📋 Skipping genres processing (not in model)...")
@@ -95,6 +102,9 @@ class Command(BaseCommand):
                 type=video['type']
             )
 
+        movie.refresh_credit_summary()
+        bump_catalog_version()
+
         status = 'created' if created else 'updated'
         self.stdout.write(
             self.style.SUCCESS(f"✅ Successfully {status} movie: {movie.title}")
@@ -0,0 +1,101 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from movies.catalog import bump_catalog_version
+from movies.industries import IndustryClassifier
+from movies.ingest import save_movie_batch
+from movies.models import Industry, Movie
+from movies.tmdb_service import daily_export_url, get_movie_details, iter_daily_export
+
+
+class Command(BaseCommand):
+    help = 'Import movies listed in a TMDB daily id export, streamed line by line and fetched in batches'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument('--file', help='Local movie_ids_MM_DD_YYYY.json.gz export')
+        source.add_argument('--date', help='Export date (YYYY-MM-DD) to download; defaults to yesterday')
+        parser.add_argument('--min-popularity', type=float, default=1.0, help='Skip less popular ids')
+        parser.add_argument('--include-adult', action='store_true', help='Keep ids flagged as adult')
+        parser.add_argument('--include-video', action='store_true', help='Keep ids flagged as video releases')
+        parser.add_argument('--update-existing', action='store_true', help='Refetch movies already imported')
+        parser.add_argument('--limit', type=int, help='Stop after this many ids pass the filters')
+        parser.add_argument('--batch-size', type=int, default=50, help='Movies fetched and written per batch')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent detail requests')
+        parser.add_argument(
+            '--industry', help='Assign this industry instead of classifying by original language and country'
+        )
+
+    def handle(self, *args, **options):
+        if options['file']:
+            source = options['file']
+        else:
+            try:
+                date = (
+                    datetime.date.fromisoformat(options['date']) if options['date']
+                    else datetime.date.today() - datetime.timedelta(days=1)
+                )
+            except ValueError:
+                raise CommandError('Use --date YYYY-MM-DD.')
+            source = daily_export_url(date)
+
+        if options['industry']:
+            try:
+                industry = Industry.objects.get(name__iexact=options['industry'])
+            except Industry.DoesNotExist:
+                raise CommandError(f"Unknown industry {options['industry']!r}; run setup_industries first.")
+            industry_for = lambda _: industry
+        else:
+            industry_for = IndustryClassifier()
+
+        self.stdout.write(f'Streaming {source}...')
+        ids = islice(self.filtered_ids(source, options), options['limit'])
+        batch_size = max(1, options['batch_size'])
+
+        stats = {'created': 0, 'updated': 0, 'skipped': 0, 'failed': 0}
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            while True:
+                # Only one batch of ids and payloads is in memory at a time
+                batch = list(islice(ids, batch_size))
+                if not batch:
+                    break
+                if not options['update_existing']:
+                    known = set(Movie.objects.filter(tmdb_id__in=batch).values_list('tmdb_id', flat=True))
+                    stats['skipped'] += len(known)
+                    batch = [tmdb_id for tmdb_id in batch if tmdb_id not in known]
+
+                details = [d for d in executor.map(self.fetch_details, batch) if d is not None]
+                stats['failed'] += len(batch) - len(details)
+                created, updated = save_movie_batch(details, industry_for)
+                stats['created'] += created
+                stats['updated'] += updated
+                self.stdout.write(
+                    f"Imported {stats['created'] + stats['updated']} movies "
+                    f"({stats['skipped']} already present, {stats['failed']} failed)..."
+                )
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully imported {stats['created']} new and {stats['updated']} updated movies "
+            f"({stats['skipped']} skipped, {stats['failed']} failed)"
+        ))
+
+    def filtered_ids(self, source, options):
+        for entry in iter_daily_export(source):
+            if entry.get('adult') and not options['include_adult']:
+                continue
+            if entry.get('video') and not options['include_video']:
+                continue
+            if (entry.get('popularity') or 0) < options['min_popularity']:
+                continue
+            yield entry['id']
+
+    def fetch_details(self, tmdb_id):
+        try:
+            return get_movie_details(tmdb_id)
+        except requests.RequestException as e:
+            self.stderr.write(self.style.ERROR(f'Could not fetch movie {tmdb_id}: {e}'))
+            return None
@@ -1,9 +1,11 @@
 from django.core.management.base import BaseCommand
 from movies.tmdb_service import (
-    get_popular_movies, get_movie_details, get_movie_credits, get_movie_videos,
+    get_popular_movies, get_movie_details,
     get_movies_by_genre, search_movies, get_now_playing_movies, get_upcoming_movies, get_top_rated_movies
 )
 from movies.models import Movie, Industry, Person, MovieCast, MovieCrew, Video
+from movies.catalog import bump_catalog_version
+from movies.industries import IndustryClassifier, production_countries
 
 class Command(BaseCommand):
     help = 'Import movies from TMDB by popularity, genre, search, or other endpoints'
@@ -20,7 +22,8 @@ class Command(BaseCommand):
         industries = {
             'Hollywood': 'American film industry',
             'Bollywood': 'Indian Hindi-language film industry',
-            'South Indian': 'South Indian film industry'
+            'South Indian': 'South Indian film industry',
+            'Other': 'Films from outside the industries above',
         }
         for name, description in industries.items():
             Industry.objects.get_or_create(
@@ -61,31 +64,37 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR('Unknown import method.'))
             return
 
+        # Loads the industries once
+        classifier = IndustryClassifier()
+
         for page in range(1, pages + 1):
             fetch_args['page'] = page
             data = fetch_func(**fetch_args)
             movies = data.get('results', [])
             for idx, m in enumerate(movies):
                 print(f"Processing movie: {m['title']}")
-                # Determine industry based on movie data
-                industry = Industry.objects.get(name='Hollywood')  # Default to Hollywood
-                
-                movie, created = Movie.objects.update_or_create(
-                    tmdb_id=m['id'],
-                    defaults={
-                        'title': m['title'],
-                        'overview': m.get('overview', ''),
-                        'poster_path': m.get('poster_path', ''),
-                        'backdrop_path': m.get('backdrop_path', ''),
-                        'release_date': m.get('release_date') or None,
-                        'popularity': m.get('popularity', 0),
-                        'rating': m.get('vote_average', 0),
-                        'industry': industry
-                    }
-                )
+                # List results lack production_countries, which the details
+                # carry along with the credits and videos in one request
+                details = get_movie_details(m['id'])
+                defaults = {
+                    'title': m['title'],
+                    'overview': m.get('overview', ''),
+                    'poster_path': m.get('poster_path', ''),
+                    'backdrop_path': m.get('backdrop_path', ''),
+                    'release_date': m.get('release_date') or None,
+                    'popularity': m.get('popularity', 0),
+                    'rating': m.get('vote_average', 0),
+                    'original_language': details.get('original_language') or '',
+                    'production_countries': production_countries(details),
+                }
+                industry = classifier(details)
+                if industry is not None:
+                    defaults['industry'] = industry
+
+                movie, created = Movie.objects.update_or_create(tmdb_id=m['id'], defaults=defaults)
 
-                # Fetch and add credits
-                credits = get_movie_credits(m['id'])
+                # Add credits
+                credits = details.get('credits') or {}
                 for cast in credits.get('cast', [])[:10]:
                     person, _ = Person.objects.get_or_create(
                         tmdb_id=cast['id'],
@@ -105,8 +114,8 @@ class Command(BaseCommand):
                         defaults={'job': crew.get('job', ''), 'department': crew.get('department', '')}
                     )
 
-                # Fetch and add videos
-                videos = get_movie_videos(m['id'])
+                # Add videos
+                videos = details.get('videos') or {}
                 for v in videos.get('results', []):
                     Video.objects.update_or_create(
                         movie=movie,
@@ -118,6 +127,10 @@ class Command(BaseCommand):
                         }
                     )
 
+                movie.refresh_credit_summary()
+
                 print(f"Finished movie: {m['title']}")
 
+        bump_catalog_version()
+
         self.stdout.write(self.style.SUCCESS('Successfully imported movies from TMDB!'))
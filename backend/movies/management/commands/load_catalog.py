@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from movies.catalog import bump_catalog_version
+from movies.catalog_dump import BATCH_SIZE, DumpError, load_dump
+from movies.fuzzy import rebuild_trigram_index
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Seed the catalog from a dump written by dump_catalog, without calling TMDB'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dump file, e.g. catalog.ndjson.gz')
+        parser.add_argument('--replace', action='store_true', help='Delete the current catalog first')
+        parser.add_argument('--if-empty', action='store_true', help='Do nothing if the catalog already has movies')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows inserted per batch')
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and Movie.objects.exists():
+            self.stdout.write('The catalog already has movies; skipping the load.')
+            return
+
+        started = time.monotonic()
+
+        def progress(model, count):
+            self.stdout.write(f'  {model._meta.model_name}: {count}')
+
+        try:
+            counts = load_dump(
+                options['path'], replace=options['replace'], batch_size=options['batch_size'], progress=progress
+            )
+        except (DumpError, OSError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('Rebuilding search trigrams...')
+        rebuild_trigram_index()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully loaded {counts.get('movie', 0)} movies ({sum(counts.values())} rows) "
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from movies.catalog import bump_catalog_version
+from movies.curation import (
+    definition_files, industry_for_definition, read_definitions, resolve_definitions, save_collection,
+    warm_rails, write_definitions
+)
+from movies.industries import IndustryClassifier
+from movies.ingest import save_movie_batch
+from movies.models import Movie
+from movies.tmdb_service import get_movie_details
+
+
+class Command(BaseCommand):
+    help = 'Load curated collections, resolving titles to TMDB ids once and importing missing movies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Definition files (defaults to movies/curated/*.json)')
+        parser.add_argument('--no-import', action='store_true', help="Don't fetch movies missing from the catalog")
+        parser.add_argument(
+            '--write-ids', action='store_true',
+            help='Record resolved ids in the definition files, to commit them'
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent detail requests')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or definition_files()
+        for path in paths:
+            definitions = read_definitions(path)
+
+            searched = resolve_definitions(definitions, on_unresolved=self.report_unresolved)
+            if searched:
+                self.stdout.write(f'Searched TMDB for {searched} unpinned titles in {path}')
+            if options['write_ids']:
+                write_definitions(path, definitions)
+
+            for definition in definitions:
+                if not options['no_import']:
+                    self.import_missing(definition, options['workers'])
+                collection = save_collection(definition)
+                linked = collection.entries.filter(movie__isnull=False).count()
+                self.stdout.write(self.style.SUCCESS(
+                    f'Loaded {collection.name}: {linked} of {collection.entries.count()} entries in the catalog'
+                ))
+
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Precomputed {warm_rails()} collection rails'))
+
+    def report_unresolved(self, definition, entry):
+        self.stdout.write(self.style.WARNING(f"No TMDB match for {entry['title']!r} in {definition['slug']}"))
+
+    def import_missing(self, definition, workers):
+        """Fetch the movies this collection pins that aren't in the catalog, in one batch."""
+        ids = [entry['tmdb_id'] for entry in definition['entries'] if entry.get('tmdb_id')]
+        known = set(Movie.objects.filter(tmdb_id__in=ids).values_list('tmdb_id', flat=True))
+        missing = [tmdb_id for tmdb_id in ids if tmdb_id not in known]
+        if not missing:
+            return
+
+        def fetch(tmdb_id):
+            try:
+                return get_movie_details(tmdb_id)
+            except requests.RequestException as e:
+                self.stderr.write(self.style.ERROR(f'Could not fetch movie {tmdb_id}: {e}'))
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            details = [d for d in executor.map(fetch, missing) if d is not None]
+        # The collection's industry only stands in for payloads without a language
+        classifier = IndustryClassifier(default=industry_for_definition(definition))
+        created, _ = save_movie_batch(details, classifier)
+        self.stdout.write(f"Imported {created} movies for {definition['slug']}")
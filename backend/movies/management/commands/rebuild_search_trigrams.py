@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from movies.fuzzy import rebuild_trigram_index, use_pg_trgm, write_alias
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram table used for typo-tolerant search on databases without pg_trgm'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Titles or names indexed per batch')
+
+    def handle(self, *args, **options):
+        if use_pg_trgm(write_alias()):
+            self.stdout.write(self.style.WARNING('Postgres uses pg_trgm GIN indexes; nothing to rebuild.'))
+            return
+
+        self.stdout.write('Rebuilding search trigrams for movie titles and person names...')
+        written = rebuild_trigram_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {written} search trigrams'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from movies.trending import rebuild_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores from the hourly view buckets and prune old buckets'
+
+    def handle(self, *args, **options):
+        movies, deleted = rebuild_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt trending scores for {movies} movies; deleted {deleted} old view buckets'
+        ))
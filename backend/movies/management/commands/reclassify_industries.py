@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand
+from movies.catalog import bump_catalog_version
+from movies.industries import production_countries, reclassify
+from movies.models import Movie
+from movies.tmdb_service import get_movie_details
+
+
+class Command(BaseCommand):
+    help = 'Move movies to the industry their original language and production countries imply'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many movies would move')
+        parser.add_argument(
+            '--fetch-missing', action='store_true',
+            help='First fetch the language and countries of movies imported before they were stored'
+        )
+        parser.add_argument('--batch-size', type=int, default=200, help='Movies fetched and written per batch')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent detail requests')
+
+    def handle(self, *args, **options):
+        if options['fetch_missing']:
+            self.fetch_missing(max(1, options['batch_size']), max(1, options['workers']))
+
+        changed = reclassify(dry_run=options['dry_run'])
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        for name, count in changed.items():
+            self.stdout.write(f'{verb} {count} movies to {name}')
+
+        if not options['dry_run'] and any(changed.values()):
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'{verb} {sum(changed.values())} movies in total'))
+
+    def fetch_missing(self, batch_size, workers):
+        missing = Movie.objects.filter(original_language='').order_by('id')
+        total, last_id = 0, 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                movies = list(missing.filter(id__gt=last_id).only('id', 'tmdb_id')[:batch_size])
+                if not movies:
+                    break
+                last_id = movies[-1].id
+                for movie, details in zip(movies, executor.map(self.fetch_details, movies)):
+                    if details:
+                        movie.original_language = details.get('original_language') or ''
+                        movie.production_countries = production_countries(details)
+                Movie.objects.bulk_update(movies, ['original_language', 'production_countries'])
+                total += len(movies)
+                self.stdout.write(f'Fetched languages for {total} movies...')
+
+    def fetch_details(self, movie):
+        try:
+            return get_movie_details(movie.tmdb_id)
+        except requests.RequestException as e:
+            self.stderr.write(self.style.ERROR(f'Could not fetch movie {movie.tmdb_id}: {e}'))
+            return None
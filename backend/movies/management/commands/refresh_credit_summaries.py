@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from movies.models import Movie, MovieCast, MovieCrew, Person
+from movies.catalog import bump_catalog_version
+
+
+class Command(BaseCommand):
+    help = 'Backfill the denormalized credit summaries on Movie and the credit stats on Person'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Movies updated per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        movies = Movie.objects.order_by('id').prefetch_related(
+            Prefetch('cast', queryset=MovieCast.objects.select_related('person').order_by('order')),
+            Prefetch('crew', queryset=MovieCrew.objects.select_related('person')),
+            'videos',
+        )
+
+        total = 0
+        last_id = 0
+        while True:
+            # Keyset pagination keeps each batch an indexed range read
+            batch = list(movies.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for movie in batch:
+                movie.set_credit_summary(list(movie.cast.all()), list(movie.crew.all()), list(movie.videos.all()))
+            Movie.objects.bulk_update(batch, Movie.SUMMARY_FIELDS)
+
+            total += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'Refreshed {total} movies...')
+
+        self.stdout.write('Refreshing person credit counts and known-for titles...')
+        Person.refresh_credit_stats(batch_size=batch_size)
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully refreshed credit summaries for {total} movies'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Count, Q
 from movies.models import Movie
+from movies.catalog import bump_catalog_version
 from django.db import transaction
 
 class Command(BaseCommand):
@@ -146,6 +147,9 @@ class Command(BaseCommand):
                         movie.delete()
                         total_removed += 1
 
+        if total_removed:
+            bump_catalog_version()
+
         if dry_run:
             self.stdout.write(
                 self.style.SUCCESS(
@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from movies.jobs import JOB_TYPES, Worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (imports, syncs and rebuilds) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=2, help='Jobs run at the same time by this worker')
+        parser.add_argument('--poll-seconds', type=float, default=2, help='Seconds between queue checks')
+        parser.add_argument('--kind', action='append', help='Only run jobs of this type (repeatable)')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        unknown = set(options['kind'] or []) - set(JOB_TYPES)
+        if unknown:
+            raise CommandError(f"Unknown job types: {', '.join(sorted(unknown))}")
+
+        worker = Worker(slots=max(1, options['slots']), poll_seconds=options['poll_seconds'], kinds=options['kind'])
+        # Finish the running jobs on SIGTERM, like docker stop sends
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker.name} waiting for jobs...'))
+        try:
+            worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from movies.models import Industry
+from movies.catalog import bump_catalog_version
 
 class Command(BaseCommand):
     help = 'Set up initial movie industries'
@@ -17,19 +18,28 @@ class Command(BaseCommand):
             {
                 'name': 'South Indian',
                 'description': 'Film industries of South India including Tamil, Telugu, Malayalam, and Kannada cinema',
-            }
+            },
+            {
+                'name': 'Other',
+                'description': 'Films from outside the industries above, such as French or Korean cinema',
+            },
         ]
 
+        created_any = False
         for industry_data in industries:
             industry, created = Industry.objects.get_or_create(
                 name=industry_data['name'],
                 defaults={'description': industry_data['description']}
             )
             if created:
+                created_any = True
                 self.stdout.write(
                     self.style.SUCCESS(f'Successfully created industry: {industry.name}')
                 )
             else:
                 self.stdout.write(
                     self.style.WARNING(f'Industry already exists: {industry.name}')
-                ) 
\ No newline at end of file
+                )
+
+        if created_any:
+            bump_catalog_version()
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from movies.tmdb_simulator import Faults, SimulatorServer, catalog_corpus, synthetic_corpus
+
+
+class Command(BaseCommand):
+    help = 'Serve a local TMDB stand-in with configurable latency, errors and rate limits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--movies', type=int, default=10000, help='Size of the synthetic corpus')
+        parser.add_argument('--seed', type=int, default=1, help='Seed for the corpus and injected faults')
+        parser.add_argument(
+            '--from-catalog', action='store_true', help='Serve the movies in the catalog database instead'
+        )
+        parser.add_argument('--latency-ms', type=float, default=0, help='Base latency of every response')
+        parser.add_argument('--jitter-ms', type=float, default=0, help='Random +/- spread around the base latency')
+        parser.add_argument('--slow-rate', type=float, default=0, help='Share of responses that take --slow-ms')
+        parser.add_argument('--slow-ms', type=float, default=2000)
+        parser.add_argument('--error-rate', type=float, default=0, help='Share of responses that fail with 503')
+        parser.add_argument('--rate-limit', type=float, help='Requests per second before answering 429')
+
+    def handle(self, *args, **options):
+        if options['from_catalog']:
+            corpus = catalog_corpus()
+        else:
+            corpus = synthetic_corpus(options['movies'], options['seed'])
+        if not corpus.summaries:
+            raise CommandError('The corpus is empty.')
+
+        faults = Faults(
+            latency_ms=options['latency_ms'], jitter_ms=options['jitter_ms'], slow_rate=options['slow_rate'],
+            slow_ms=options['slow_ms'], error_rate=options['error_rate'], rate_limit=options['rate_limit'],
+            seed=options['seed'],
+        )
+        server = SimulatorServer((options['host'], options['port']), corpus, faults)
+        base_url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(self.style.SUCCESS(f'Serving {len(corpus.summaries)} movies at {base_url}'))
+        self.stdout.write(f'  TMDB_BASE_URL={base_url} TMDB_EXPORTS_URL={base_url}/p/exports')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
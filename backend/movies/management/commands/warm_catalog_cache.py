@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from movies.catalog import read_catalog_version
+from movies.warming import warm_version
+
+
+class Command(BaseCommand):
+    help = 'Render the landing page and most popular detail responses into the response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help='Requests rendered at once')
+        parser.add_argument('--top-details', type=int, help='Detail pages of this many popular movies')
+
+    def handle(self, *args, **options):
+        version = read_catalog_version()
+        warmed, failed = warm_version(version, options['concurrency'], options['top_details'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Warmed {warmed} responses for catalog version {version} ({failed} failed)'
+        ))
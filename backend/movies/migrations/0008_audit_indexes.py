@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-19 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_remove_movie_genres_delete_genre'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='movie',
+            name='unique_tmdb_id',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_tmdb_id_0e4cad_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-popularity'], name='movies_movi_popular_3c541f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-rating', '-popularity', '-release_date'], name='movies_movi_rating_1a8908_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-release_date'], name='movies_movi_release_e8f22e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['industry', '-popularity'], name='movies_movi_industr_c53b3f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['movie', 'key'], name='movies_vide_movie_i_2bdacf_idx'),
+        ),
+    ]
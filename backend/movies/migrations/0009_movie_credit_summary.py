@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-19 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_audit_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='credit_names',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='director_names',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='top_cast_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='top_cast_names',
+            field=models.CharField(blank=True, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='trailer_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
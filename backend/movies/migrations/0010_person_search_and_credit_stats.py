@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-19 15:35
+
+from django.db import migrations, models
+
+
+def fill_search_name(apps, schema_editor):
+    Person = apps.get_model('movies', 'Person')
+    people = list(Person.objects.only('id', 'name'))
+    for person in people:
+        person.search_name = ' '.join((person.name or '').casefold().split())
+    Person.objects.bulk_update(people, ['search_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_movie_credit_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='credit_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='known_for',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='person',
+            name='search_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['search_name'], name='movies_pers_search__03f36e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='person',
+            index=models.Index(fields=['-credit_count'], name='movies_pers_credit__fbec53_idx'),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+    ]
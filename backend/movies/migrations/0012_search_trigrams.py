@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-19 15:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Postgres uses pg_trgm with GIN indexes instead of the SearchTrigram table
+TRIGRAM_INDEXES = [
+    ('movies_movie_title_trgm_idx', 'movies_movie', 'title'),
+    ('movies_person_name_trgm_idx', 'movies_person', 'name'),
+]
+
+
+def create_pg_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_pg_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_catalogstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('total', models.PositiveSmallIntegerField()),
+                ('movie', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('person', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.person')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['trigram', 'movie'], name='movies_sear_trigram_20ad99_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchtrigram',
+            index=models.Index(fields=['trigram', 'person'], name='movies_sear_trigram_0d05cd_idx'),
+        ),
+        migrations.RunPython(create_pg_trgm_indexes, drop_pg_trgm_indexes),
+    ]
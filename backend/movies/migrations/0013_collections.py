@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-19 16:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Collection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CollectionEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('tmdb_id', models.IntegerField()),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='movies.collection')),
+                ('movie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='movies.movie')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='collectionentry',
+            index=models.Index(fields=['tmdb_id'], name='movies_coll_tmdb_id_add665_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='collectionentry',
+            constraint=models.UniqueConstraint(fields=('collection', 'position'), name='movies_collection_entry_position'),
+        ),
+    ]
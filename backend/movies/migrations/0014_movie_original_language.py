@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_collections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='original_language',
+            field=models.CharField(blank=True, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='production_countries',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
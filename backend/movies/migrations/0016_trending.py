@@ -0,0 +1,51 @@
+# Generated by Django 4.2 on 2026-10-19 16:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='movies.movie')),
+                ('score', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='catalogstate',
+            name='trending_epoch',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score'], name='movies_tren_score_6e0467_idx'),
+        ),
+        migrations.AddField(
+            model_name='movieviewbucket',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie'),
+        ),
+        migrations.AddIndex(
+            model_name='movieviewbucket',
+            index=models.Index(fields=['hour'], name='movies_movi_hour_bbc855_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='movieviewbucket',
+            constraint=models.UniqueConstraint(fields=('movie', 'hour'), name='movies_viewbucket_unique_hour'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 16:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0016_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='user_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='user_rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='user_rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-user_rating', '-popularity'], name='movies_movi_user_ra_b037a0_idx'),
+        ),
+    ]
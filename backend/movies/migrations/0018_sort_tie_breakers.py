@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-19 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_movie_user_rating'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_popular_3c541f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_rating_1a8908_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_release_e8f22e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_industr_c53b3f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movies_movi_user_ra_b037a0_idx',
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title', 'id'], name='movies_movi_title_5260dc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-popularity', 'id'], name='movies_movi_popular_e79108_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-rating', '-popularity', '-release_date', 'id'], name='movies_movi_rating_b8f2ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-release_date', 'id'], name='movies_movi_release_113978_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['industry', '-popularity', 'id'], name='movies_movi_industr_79d0f9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-user_rating', '-popularity', 'id'], name='movies_movi_user_ra_e9ff81_idx'),
+        ),
+    ]
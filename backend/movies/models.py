@@ -1,8 +1,33 @@
 from django.db import models
+from django.db.models import OuterRef, Q, Subquery
 from django.utils.text import slugify
 
 # Create your models here.
 
+# Number of cast members kept in Movie.top_cast_names / top_cast_ids
+TOP_BILLED_CAST = 5
+SUMMARY_SEPARATOR = ', '
+# Number of titles kept in Person.known_for
+KNOWN_FOR_TITLES = 3
+
+
+def normalize_search_text(value):
+    """Case-fold text for the indexed prefix lookup columns."""
+    return ' '.join((value or '').casefold().split())
+
+class CatalogState(models.Model):
+    """
+    Single row holding the catalog version, bumped by every command that
+    changes movies or people. See movies.catalog.
+    """
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Reference time of the trending scores, see movies.trending
+    trending_epoch = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Catalog v{self.version}"
+
 class Industry(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -29,22 +54,60 @@ class Movie(models.Model):
     popularity = models.FloatField(default=0)
     rating = models.FloatField(default=0)
     industry = models.ForeignKey(Industry, on_delete=models.SET_NULL, null=True, related_name='movies')
+    # From TMDB, for industry classification (see movies/industries.py)
+    original_language = models.CharField(max_length=12, blank=True)
+    production_countries = models.CharField(max_length=255, blank=True)
+
+    # Denormalized from MovieCast, MovieCrew and Video so list and search
+    # queries read a single table. Kept current by refresh_credit_summary().
+    director_names = models.CharField(max_length=255, blank=True)
+    top_cast_names = models.CharField(max_length=512, blank=True)
+    top_cast_ids = models.JSONField(default=list, blank=True)
+    credit_names = models.TextField(blank=True)
+    video_count = models.PositiveIntegerField(default=0)
+    trailer_key = models.CharField(max_length=255, blank=True)
+
+    # Our users' ratings (users.UserRating), kept current with F() updates in
+    # the transaction that changes a rating. user_rating is the Bayesian
+    # average; reconcile_user_ratings repairs drift.
+    user_rating_count = models.PositiveIntegerField(default=0)
+    user_rating_sum = models.PositiveIntegerField(default=0)
+    user_rating = models.FloatField(default=0)
+
+    SUMMARY_FIELDS = [
+        'director_names', 'top_cast_names', 'top_cast_ids',
+        'credit_names', 'video_count', 'trailer_key',
+    ]
+    # Only changed by users/ratings.py
+    USER_RATING_FIELDS = ['user_rating_count', 'user_rating_sum', 'user_rating']
 
     class Meta:
+        # tmdb_id is already covered by the unique index from unique=True
         indexes = [
-            models.Index(fields=['tmdb_id']),
             models.Index(fields=['title', 'release_date']),
-        ]
-        constraints = [
-            models.UniqueConstraint(
-                fields=['tmdb_id'],
-                name='unique_tmdb_id'
-            )
+            # The list sorts of movies/filters.py, each ending in id to break ties
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['-popularity', 'id']),
+            models.Index(fields=['-rating', '-popularity', '-release_date', 'id']),
+            models.Index(fields=['-release_date', 'id']),
+            models.Index(fields=['industry', '-popularity', 'id']),
+            models.Index(fields=['-user_rating', '-popularity', 'id']),
         ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # A full save of a loaded movie (an import, the admin) would write
+        # back the user rating aggregates as they were when it was read,
+        # undoing ratings made in between
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.USER_RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     @classmethod
     def create_or_update(cls, tmdb_id, **data):
         """
@@ -59,16 +122,122 @@ class Movie(models.Model):
             for key, value in data.items():
                 setattr(movie, key, value)
             movie.save()
+        else:
+            CollectionEntry.link_movies([tmdb_id])
         return movie, created
 
+    def set_credit_summary(self, cast, crew, videos):
+        """
+        Fill the summary columns from already loaded cast, crew and video rows.
+        Cast must be in billing order and have its person loaded.
+        """
+        directors = [c.person.name for c in crew if c.job == 'Director']
+        top_cast = [c.person for c in cast[:TOP_BILLED_CAST]]
+        names = [c.person.name for c in cast] + [c.person.name for c in crew]
+
+        self.director_names = SUMMARY_SEPARATOR.join(dict.fromkeys(directors))[:255]
+        self.top_cast_names = SUMMARY_SEPARATOR.join(p.name for p in top_cast)[:512]
+        self.top_cast_ids = [p.tmdb_id for p in top_cast]
+        self.credit_names = SUMMARY_SEPARATOR.join(dict.fromkeys(names))
+        self.video_count = len(videos)
+        self.trailer_key = next(
+            (v.key for v in videos if v.type == 'Trailer' and v.site == 'YouTube'),
+            ''
+        )
+
+    def refresh_credit_summary(self, save=True):
+        """
+        Recompute the summary columns from the related rows.
+        Call this after replacing a movie's cast, crew or videos. When saving,
+        the credited people's stats and the fuzzy search index are refreshed too.
+        """
+        from .fuzzy import index_movies, index_people
+
+        cast = list(self.cast.select_related('person').order_by('order'))
+        crew = list(self.crew.select_related('person'))
+        self.set_credit_summary(cast, crew, list(self.videos.all()))
+        if save:
+            self.save(update_fields=self.SUMMARY_FIELDS)
+            people = {c.person_id: c.person for c in cast + crew}
+            Person.refresh_credit_stats(people.keys())
+            index_movies([self])
+            index_people(people.values())
+
 class Person(models.Model):
     tmdb_id = models.IntegerField(unique=True)
     name = models.CharField(max_length=255)
     profile_path = models.CharField(max_length=255, blank=True, null=True)
+    # Case-folded name used for indexed prefix search
+    search_name = models.CharField(max_length=255, blank=True)
+
+    # Precomputed by refresh_credit_stats() so person pages don't aggregate on read
+    credit_count = models.PositiveIntegerField(default=0)
+    known_for = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['search_name']),
+            models.Index(fields=['-credit_count']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search_text(self.name)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def search(cls, query):
+        """People whose name starts with query, as an index range scan on search_name."""
+        prefix = normalize_search_text(query)
+        return cls.objects.filter(search_name__gte=prefix, search_name__lt=prefix + '\uffff')
+
+    @classmethod
+    def refresh_credit_stats(cls, person_ids=None, batch_size=500):
+        """
+        Recompute credit_count and known_for for the given people (all people if None).
+        Credits are read with one query per table per batch.
+        """
+        if person_ids is None:
+            person_ids = cls.objects.values_list('id', flat=True).order_by('id')
+        person_ids = list(person_ids)
+
+        for start in range(0, len(person_ids), batch_size):
+            batch_ids = person_ids[start:start + batch_size]
+            movies_by_person = {person_id: {} for person_id in batch_ids}
+            for credit_model in (MovieCast, MovieCrew):
+                credits = credit_model.objects.filter(person_id__in=batch_ids).values_list(
+                    'person_id', 'movie__tmdb_id', 'movie__title', 'movie__popularity'
+                )
+                for person_id, tmdb_id, title, popularity in credits:
+                    movies_by_person[person_id][tmdb_id] = (popularity, title)
+
+            people = list(cls.objects.filter(id__in=batch_ids).only('id'))
+            for person in people:
+                movies = movies_by_person[person.id]
+                top = sorted(movies.items(), key=lambda item: item[1][0], reverse=True)
+                person.credit_count = len(movies)
+                person.known_for = [
+                    {'tmdb_id': tmdb_id, 'title': title}
+                    for tmdb_id, (_, title) in top[:KNOWN_FOR_TITLES]
+                ]
+            cls.objects.bulk_update(people, ['credit_count', 'known_for'])
+
+    def filmography(self):
+        """
+        Movies this person is credited on, newest first, in a single query.
+        Each movie is annotated with the person's character and job.
+        """
+        cast = MovieCast.objects.filter(person_id=self.id)
+        crew = MovieCrew.objects.filter(person_id=self.id)
+        return Movie.objects.filter(
+            Q(id__in=cast.values('movie_id')) | Q(id__in=crew.values('movie_id'))
+        ).annotate(
+            character=Subquery(cast.filter(movie_id=OuterRef('pk')).values('character')[:1]),
+            job=Subquery(crew.filter(movie_id=OuterRef('pk')).values('job')[:1]),
+        ).select_related('industry').order_by('-release_date')
+
     def delete_if_unused(self):
         # Check if person has any associated movies through cast or crew
         if not self.moviecast_set.exists() and not self.moviecrew_set.exists():
@@ -102,3 +271,153 @@ class Video(models.Model):
     key = models.CharField(max_length=255)
     site = models.CharField(max_length=50)
     name = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            # Looked up by update_or_create(movie=..., key=...) during imports
+            models.Index(fields=['movie', 'key']),
+        ]
+
+class SearchTrigram(models.Model):
+    """
+    Trigram postings for typo-tolerant search on databases without pg_trgm.
+    Each row links one trigram to the movie title or person name it came from.
+    Maintained by movies.fuzzy.
+    """
+    trigram = models.CharField(max_length=3)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, null=True, related_name='+')
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, null=True, related_name='+')
+    # Number of distinct trigrams in the indexed text, for similarity scoring
+    total = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['trigram', 'movie']),
+            models.Index(fields=['trigram', 'person']),
+        ]
+
+class Collection(models.Model):
+    """A curated, ordered list of movies, such as a home page rail."""
+    slug = models.SlugField(unique=True)
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    def rail(self):
+        """The collection's movies in entry order, skipping titles not imported yet."""
+        entries = self.entries.filter(movie__isnull=False).select_related('movie__industry')
+        return [entry.movie for entry in entries]
+
+class CollectionEntry(models.Model):
+    """
+    One position in a collection, pinned to a TMDB id so it never needs a
+    title search again. movie is filled in once that id is in the catalog.
+    """
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE, related_name='entries')
+    position = models.PositiveIntegerField()
+    tmdb_id = models.IntegerField()
+    # The curated title the id was resolved from
+    title = models.CharField(max_length=255, blank=True)
+    movie = models.ForeignKey(Movie, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['collection', 'position'], name='movies_collection_entry_position'),
+        ]
+        indexes = [
+            models.Index(fields=['tmdb_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.collection.slug} #{self.position}: {self.title or self.tmdb_id}'
+
+    @classmethod
+    def link_movies(cls, tmdb_ids=None):
+        """Point unlinked entries at their movies once those are in the catalog, in one UPDATE."""
+        entries = cls.objects.filter(movie__isnull=True)
+        if tmdb_ids is not None:
+            entries = entries.filter(tmdb_id__in=list(tmdb_ids))
+        return entries.filter(
+            tmdb_id__in=Movie.objects.values('tmdb_id')
+        ).update(
+            movie=Subquery(Movie.objects.filter(tmdb_id=OuterRef('tmdb_id')).values('id')[:1])
+        )
+
+class Job(models.Model):
+    """
+    A unit of background work (an import, sync or rebuild) queued for the
+    run_jobs worker. See movies.jobs for the job types and the worker.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+    kind = models.CharField(max_length=100)
+    params = models.JSONField(default=dict, blank=True)
+    # Higher runs first
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    # 0-1, or null while a job can't tell how far along it is
+    progress = models.FloatField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's claim query: next queued job by priority, then age
+            models.Index(fields=['status', '-priority', 'created_at']),
+            models.Index(fields=['status', 'kind']),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+class MovieViewBucket(models.Model):
+    """Detail page views of a movie in one hour, merged from the workers' counters."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'hour'], name='movies_viewbucket_unique_hour'),
+        ]
+        indexes = [
+            # Pruning and rebuilding scan by time
+            models.Index(fields=['hour']),
+        ]
+
+class TrendingScore(models.Model):
+    """
+    Exponentially decayed view count of a movie, relative to
+    CatalogState.trending_epoch. See movies.trending.
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
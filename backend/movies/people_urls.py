@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import PersonListAPIView, PersonDetailAPIView
+
+urlpatterns = [
+    path('', PersonListAPIView.as_view(), name='person-list'),
+    path('<int:tmdb_id>/', PersonDetailAPIView.as_view(), name='person-detail'),
+]
@@ -0,0 +1,206 @@
+"""
+Read-replica routing for the catalog API.
+
+The read views in movies.views run inside serve_from_replica(), which picks
+one of the DATABASE_REPLICAS aliases by weight for the whole request, and
+ReplicaRouter sends that request's movies reads to it. Everything else
+(imports, the admin, the watcher thread) reads from and writes to the
+primary database.
+
+A replica is only used while it is caught up: at most every
+DATABASE_REPLICA_CHECK_SECONDS its catalog version is compared with the
+primary's (so a finished import is not served stale), and on Postgres its
+replay lag is compared with DATABASE_REPLICA_MAX_LAG_SECONDS. With no
+healthy replica, reads fall back to the primary.
+
+Read-your-writes: once a request writes, its later reads go to the primary,
+and ReadYourWritesMiddleware sets a short-lived cookie so the same client's
+following requests (an admin editing a movie, then viewing it through the
+API) also read from the primary until replicas have had time to catch up.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'primary_reads_until'
+
+_state = ContextVar('replica_routing_state', default=None)
+_health_lock = threading.Lock()
+_healthy = None
+_checked_at = 0.0
+
+
+class RoutingState:
+    """Per-request routing decisions, shared by the middleware, views and router."""
+
+    def __init__(self):
+        self.alias = None
+        self.wrote = False
+
+
+def replica_weights():
+    """{alias: weight} for the configured replicas."""
+    return getattr(settings, 'DATABASE_REPLICAS', {})
+
+
+def check_interval():
+    return getattr(settings, 'DATABASE_REPLICA_CHECK_SECONDS', 5)
+
+
+def replica_lag(alias, primary_version):
+    """
+    Seconds the replica is behind, or None when it is missing catalog
+    versions the primary already has.
+    """
+    from .catalog import read_database_catalog_version
+
+    if read_database_catalog_version(alias) < primary_version:
+        return None
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+            'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+        )
+        return float(cursor.fetchone()[0])
+
+
+def check_replicas():
+    """Return {alias: weight} for the replicas that are reachable and caught up."""
+    from .catalog import read_database_catalog_version
+
+    max_lag = getattr(settings, 'DATABASE_REPLICA_MAX_LAG_SECONDS', 10)
+    primary_version = read_database_catalog_version()
+    healthy = {}
+    for alias, weight in replica_weights().items():
+        try:
+            lag = replica_lag(alias, primary_version)
+        except DatabaseError:
+            logger.warning('Replica %s is unreachable; reading from primary instead', alias, exc_info=True)
+            continue
+        if lag is None or lag > max_lag:
+            logger.info('Replica %s is behind the primary (lag %s); skipping it', alias, lag)
+            continue
+        healthy[alias] = weight
+    return healthy
+
+
+def healthy_replicas():
+    """
+    The healthy replicas, rechecked at most once per check interval. Only
+    one thread rechecks; the others keep using the previous result.
+    """
+    global _healthy, _checked_at
+    if _healthy is None or time.monotonic() - _checked_at >= check_interval():
+        if _health_lock.acquire(blocking=_healthy is None):
+            try:
+                _healthy = check_replicas()
+                _checked_at = time.monotonic()
+            finally:
+                _health_lock.release()
+    return _healthy
+
+
+def choose_replica():
+    """Pick a healthy replica alias by weight, or None to use the primary."""
+    if not replica_weights():
+        return None
+    healthy = healthy_replicas()
+    if not healthy:
+        return None
+    return random.choices(list(healthy), weights=list(healthy.values()))[0]
+
+
+def pinned_to_primary(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+@contextmanager
+def serve_from_replica(request):
+    """Route the movies reads of this request to a replica, unless it must see the primary."""
+    state = _state.get()
+    token = None
+    if state is None:
+        state = RoutingState()
+        token = _state.set(state)
+    if not state.wrote and not pinned_to_primary(request):
+        state.alias = choose_replica()
+    try:
+        yield
+    finally:
+        state.alias = None
+        if token is not None:
+            _state.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary in this block, e.g. while importing inside a request."""
+    token = _state.set(RoutingState())
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+class ReplicaRouter:
+    """Sends the reads of serve_from_replica() blocks to their chosen replica."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.wrote or state.alias is None:
+            return None
+        if model._meta.app_label == 'movies':
+            return state.alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # Read your own writes for the rest of this request
+            state.wrote = True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas receive their schema from the primary
+        if db in replica_weights():
+            return False
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    Tracks writes per request and, after one, pins the client's reads to the
+    primary for READ_YOUR_WRITES_SECONDS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote and replica_weights():
+            seconds = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10)
+            response.set_cookie(
+                PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True, samesite='Lax'
+            )
+        return response
@@ -0,0 +1,126 @@
+"""
+Rendered responses for the catalog read endpoints, cached per catalog version.
+
+CachedResponseMixin stores the JSON body of successful GETs together with a
+gzip-compressed copy, under a key made of the catalog version and the
+request's path and sorted query string. Clients that accept gzip get the
+compressed copy, so a hit costs one cache read and no rendering or
+compression. Keys include the version, so entries never need invalidating:
+the next version simply starts with a fresh set.
+
+warming(version) renders responses for a version that is not live yet (see
+movies/warming.py): inside it keys use that version and requests read the
+primary database, which already holds the new catalog.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import urlencode
+
+from .catalog import get_catalog_version
+
+_warming_version = ContextVar('response_cache_warming_version', default=None)
+
+# Responses smaller than this are not worth compressing
+MIN_GZIP_BYTES = 200
+
+
+@contextmanager
+def warming(version):
+    """Cache responses rendered in this block under the given catalog version."""
+    token = _warming_version.set(version)
+    try:
+        yield
+    finally:
+        _warming_version.reset(token)
+
+
+def is_warming():
+    return _warming_version.get() is not None
+
+
+def cache_key(request, variant=''):
+    version = _warming_version.get()
+    if version is None:
+        version = get_catalog_version()
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return f'response:{version}:{variant}:{request.path}?{query}'
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def encode(response):
+    """The cache entry for a rendered response."""
+    content = response.content
+    entry = {'content': content, 'content_type': response['Content-Type'], 'gzip': None}
+    if len(content) >= MIN_GZIP_BYTES:
+        entry['gzip'] = gzip.compress(content, compresslevel=6)
+    return entry
+
+
+def build_response(entry, request):
+    """An HttpResponse for a cache entry, compressed if the client accepts it."""
+    if entry['gzip'] is not None and accepts_gzip(request):
+        response = HttpResponse(entry['gzip'], content_type=entry['content_type'])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['Content-Length'] = str(len(response.content))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def response_cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_SECONDS', 0) > 0
+
+
+class CachedResponseMixin:
+    """
+    Serve GETs from the response cache, caching successful responses.
+    Views can override is_cacheable() to skip requests not worth keeping,
+    and get_cache_variant() for responses that also change within a catalog version.
+    """
+
+    def is_cacheable(self, request):
+        return True
+
+    def get_cache_variant(self, request):
+        return ''
+
+    @classmethod
+    def cached_entry(cls, request):
+        """
+        (key, entry) of a cacheable GET, entry being None on a miss, or None
+        when the request isn't cached. Looked up once per request, so
+        throttle_cost() can price a hit before the view runs.
+        """
+        if not hasattr(request, '_response_cache_entry'):
+            view = cls()
+            if request.method != 'GET' or not response_cache_enabled() or not view.is_cacheable(request):
+                request._response_cache_entry = None
+            else:
+                key = cache_key(request, view.get_cache_variant(request))
+                request._response_cache_entry = (key, cache.get(key))
+        return request._response_cache_entry
+
+    def dispatch(self, request, *args, **kwargs):
+        cached = self.cached_entry(request)
+        if cached is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        key, entry = cached
+        if entry is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.render()
+            entry = encode(response)
+            cache.set(key, entry, settings.RESPONSE_CACHE_SECONDS)
+        return build_response(entry, request)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Movie, Person, MovieCast, MovieCrew, Video, Industry
+from .models import Collection, Movie, Person, MovieCast, MovieCrew, Video, Industry
 
 class IndustrySerializer(serializers.ModelSerializer):
     class Meta:
@@ -28,6 +28,10 @@ class VideoSerializer(serializers.ModelSerializer):
         model = Video
         fields = ['id', 'type', 'key', 'site', 'name']
 
+# Movie payloads are cached per catalog version and read from snapshots, so
+# they leave out the user rating aggregates, which change with every rating;
+# those are served live by MovieUserRatingsSerializer.
+
 class MovieSerializer(serializers.ModelSerializer):
     cast = MovieCastSerializer(many=True, read_only=True)
     crew = MovieCrewSerializer(many=True, read_only=True)
@@ -39,10 +43,77 @@ class MovieSerializer(serializers.ModelSerializer):
         model = Movie
         fields = [
             'id', 'tmdb_id', 'title', 'overview', 'poster_path', 'backdrop_path',
-            'release_date', 'popularity', 'rating', 'cast', 'crew', 'videos', 'autoembed_url', 'industry'
+            'release_date', 'popularity', 'rating',
+            'cast', 'crew', 'videos', 'autoembed_url', 'industry',
+            'director_names', 'top_cast_names', 'video_count', 'trailer_key'
+        ]
+
+    def get_autoembed_url(self, obj):
+        if obj.tmdb_id:
+            return f"https://player.autoembed.cc/embed/movie/{obj.tmdb_id}"
+        return None
+
+class MovieSummarySerializer(serializers.ModelSerializer):
+    """Card-sized movie payload built from the Movie row alone, without nested credits."""
+    industry = IndustrySerializer(read_only=True)
+    autoembed_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Movie
+        fields = [
+            'id', 'tmdb_id', 'title', 'poster_path', 'backdrop_path', 'release_date',
+            'popularity', 'rating', 'autoembed_url', 'industry',
+            'director_names', 'top_cast_names', 'top_cast_ids', 'video_count', 'trailer_key'
         ]
 
     def get_autoembed_url(self, obj):
         if obj.tmdb_id:
             return f"https://player.autoembed.cc/embed/movie/{obj.tmdb_id}"
         return None
+
+class FilmographySerializer(serializers.ModelSerializer):
+    character = serializers.CharField(read_only=True, allow_null=True)
+    job = serializers.CharField(read_only=True, allow_null=True)
+    industry = IndustrySerializer(read_only=True)
+
+    class Meta:
+        model = Movie
+        fields = [
+            'id', 'tmdb_id', 'title', 'poster_path', 'release_date',
+            'popularity', 'rating', 'industry', 'character', 'job'
+        ]
+
+class PersonListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Person
+        fields = ['id', 'tmdb_id', 'name', 'profile_path', 'credit_count', 'known_for']
+
+class PersonDetailSerializer(PersonListSerializer):
+    filmography = serializers.SerializerMethodField()
+
+    class Meta(PersonListSerializer.Meta):
+        fields = PersonListSerializer.Meta.fields + ['filmography']
+
+    def get_filmography(self, obj):
+        return FilmographySerializer(obj.filmography(), many=True).data
+
+class CollectionSerializer(serializers.ModelSerializer):
+    movies = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Collection
+        fields = ['slug', 'name', 'description', 'movies']
+
+    def get_movies(self, obj):
+        return MovieSummarySerializer(obj.rail(), many=True).data
+
+class MovieUserRatingsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Movie
+        fields = ['tmdb_id', 'user_rating', 'user_rating_count']
+
+class MovieUserRatingsParamsSerializer(serializers.Serializer):
+    # ?tmdb_id=1&tmdb_id=2, e.g. the movies of one page
+    tmdb_id = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=2 ** 31 - 1), min_length=1, max_length=100
+    )
@@ -0,0 +1,356 @@
+"""
+Immutable catalog snapshot files for read-only API replicas.
+
+export_catalog_snapshot copies the catalog tables into a standalone SQLite
+file, records its SHA-256 in a manifest and publishes it by atomically
+replacing latest.json in CATALOG_SNAPSHOT_DIR. A published file is never
+written again, so replicas open it read-only and immutable and let SQLite
+memory-map its pages.
+
+With CATALOG_SNAPSHOT_READS on, the read endpoints in movies.views run inside
+serve_from_snapshot(), and SnapshotRouter sends their catalog queries to the
+newest verified snapshot, pinned for the whole request. The catalog version
+of such a process is the version of that snapshot, so the watcher in
+movies/catalog.py picks up a newly published file and swaps it in with one
+assignment; requests already running finish on the file they started with,
+and the last of them to finish unregisters the superseded file's alias.
+Connections are per thread, so each thread closes its own connections to
+superseded files the next time it starts or finishes a request.
+Writes, and reads anywhere else, keep going to the primary database.
+"""
+from contextlib import contextmanager
+from collections import Counter
+from contextvars import ContextVar
+import datetime
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .catalog_dump import insert_rows
+from .models import (
+    CatalogState, Collection, CollectionEntry, Industry, Movie, MovieCast, MovieCrew, Person, SearchTrigram, Video
+)
+
+logger = logging.getLogger(__name__)
+
+# Copied in this order, so foreign keys always point at rows already loaded
+SNAPSHOT_MODELS = [
+    CatalogState, Industry, Person, Movie, MovieCast, MovieCrew, Video, SearchTrigram,
+    Collection, CollectionEntry,
+]
+
+MANIFEST_NAME = 'latest.json'
+ALIAS_PREFIX = 'catalog_snapshot_'
+COPY_BATCH_SIZE = 5000
+MMAP_SIZE = 256 * 1024 * 1024
+
+_pinned_alias = ContextVar('catalog_snapshot_alias', default=None)
+_swap_lock = threading.Lock()
+# (version, alias) of the snapshot new requests are served from
+_current = None
+# Requests serving from each alias, and superseded aliases still in use
+_in_use = Counter()
+_retired = set()
+# {alias: connection} of the snapshot connections each thread has opened
+_opened = threading.local()
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'CATALOG_SNAPSHOT_DIR', settings.BASE_DIR / 'snapshots'))
+
+
+def snapshot_reads_enabled():
+    return getattr(settings, 'CATALOG_SNAPSHOT_READS', False)
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _register_database(alias, name):
+    """Add a SQLite connection alias at runtime."""
+    connections.settings[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {},
+        'ATOMIC_REQUESTS': False,
+        'AUTOCOMMIT': True,
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'TIME_ZONE': None,
+        'USER': '',
+        'PASSWORD': '',
+        'HOST': '',
+        'PORT': '',
+        'TEST': {'CHARSET': None, 'COLLATION': None, 'MIGRATE': False, 'MIRROR': None, 'NAME': None},
+    }
+    return alias
+
+
+def _unregister_database(alias):
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+def _forget_database(alias):
+    """Drop an alias whose connections have been closed by the threads that used it."""
+    connections.settings.pop(alias, None)
+    try:
+        del connections[alias]
+    except AttributeError:
+        # This thread never used it
+        pass
+
+
+def _thread_connections():
+    if not hasattr(_opened, 'connections'):
+        _opened.connections = {}
+    return _opened.connections
+
+
+@receiver(connection_created)
+def _configure_snapshot_connection(sender, connection, **kwargs):
+    if connection.alias.startswith(ALIAS_PREFIX):
+        _thread_connections()[connection.alias] = connection
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+
+
+@receiver(request_started)
+@receiver(request_finished)
+def close_superseded_connections(**kwargs):
+    """Close this thread's connections to snapshots no longer served, unless it is still reading one."""
+    opened = _thread_connections()
+    current = _current[1] if _current else None
+    for alias in [alias for alias in opened if alias not in (current, _pinned_alias.get())]:
+        opened.pop(alias).close()
+        try:
+            del connections[alias]
+        except AttributeError:
+            pass
+
+
+# Export
+
+def _source_rows(model, batch_size):
+    """Yield each row of model on the primary database as a list of column values."""
+    from . import fuzzy
+
+    fields = model._meta.concrete_fields
+    if model is SearchTrigram and fuzzy.use_pg_trgm():
+        # Postgres keeps trigrams in GIN indexes, so build the SQLite postings here
+        for source, field, text_field in ((Movie, 'movie', 'title'), (Person, 'person', 'name')):
+            objects = source.objects.only('id', text_field).order_by('id').iterator(chunk_size=batch_size)
+            for obj in objects:
+                for posting in fuzzy._postings(field, [obj], lambda o: getattr(o, text_field)):
+                    yield [getattr(posting, f.attname) for f in fields]
+        return
+
+    queryset = model.objects.using('default').order_by('pk').values_list(*[f.attname for f in fields])
+    for row in queryset.iterator(chunk_size=batch_size):
+        yield list(row)
+
+
+def _write_json(path, data):
+    """Write a JSON file so readers see either the old or the new contents."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def export_snapshot(directory=None, keep=3, batch_size=COPY_BATCH_SIZE):
+    """
+    Write the catalog to a new snapshot file and publish it. Returns the
+    manifest. Only the newest `keep` snapshot files are left in the directory.
+    """
+    from .catalog import read_database_catalog_version
+
+    directory = Path(directory or snapshot_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # One read transaction on the primary, so every table matches the version
+    with transaction.atomic(using='default'):
+        if connections['default'].vendor == 'postgresql':
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+        version = read_database_catalog_version()
+        path = directory / f'catalog-{version:06d}.sqlite3'
+        tmp_path = path.with_name(path.name + '.tmp')
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+        alias = _register_database(f'{ALIAS_PREFIX}export', str(tmp_path))
+        try:
+            connection = connections[alias]
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode = OFF')
+                cursor.execute('PRAGMA synchronous = OFF')
+            counts = {}
+            # Indexes are deferred by the schema editor and created on exit,
+            # after the rows are in
+            with connection.schema_editor() as editor:
+                for model in SNAPSHOT_MODELS:
+                    editor.create_model(model)
+                for model in SNAPSHOT_MODELS:
+                    counts[model._meta.model_name] = insert_rows(
+                        model, model._meta.concrete_fields, _source_rows(model, batch_size),
+                        using=alias, batch_size=batch_size,
+                    )
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+                cursor.execute('VACUUM')
+        finally:
+            _unregister_database(alias)
+
+    os.chmod(tmp_path, 0o444)
+    os.replace(tmp_path, path)
+    manifest = {
+        'version': version,
+        'file': path.name,
+        'sha256': file_checksum(path),
+        'size': path.stat().st_size,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'counts': counts,
+    }
+    _write_json(path.with_suffix('.json'), manifest)
+    _write_json(directory / MANIFEST_NAME, manifest)
+
+    for old in sorted(directory.glob('catalog-*.sqlite3'))[:-keep]:
+        if old != path:
+            old.unlink()
+            old.with_suffix('.json').unlink(missing_ok=True)
+    return manifest
+
+
+# Serving
+
+def read_manifest(directory=None):
+    """The published manifest, or None when nothing has been exported yet."""
+    try:
+        with open(Path(directory or snapshot_dir()) / MANIFEST_NAME) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def sync_snapshot():
+    """
+    Switch to the published snapshot if it is newer than the one in use and
+    its checksum matches. Returns the catalog version being served, or None
+    when no snapshot is available.
+    """
+    global _current
+    manifest = read_manifest()
+    if manifest is None or (_current and _current[0] >= manifest['version']):
+        return _current[0] if _current else None
+
+    with _swap_lock:
+        if _current and _current[0] >= manifest['version']:
+            return _current[0]
+        path = snapshot_dir() / manifest['file']
+        try:
+            checksum = file_checksum(path)
+        except FileNotFoundError:
+            checksum = None
+        if checksum != manifest['sha256']:
+            logger.error('Catalog snapshot %s failed verification; keeping the current one', path)
+            return _current[0] if _current else None
+
+        alias = _register_database(
+            f"{ALIAS_PREFIX}{manifest['version']}",
+            f'{path.resolve().as_uri()}?mode=ro&immutable=1',
+        )
+        previous, _current = _current, (manifest['version'], alias)
+        if previous is not None:
+            if _in_use[previous[1]]:
+                _retired.add(previous[1])
+            else:
+                _forget_database(previous[1])
+        logger.info('Serving catalog reads from snapshot %s', path)
+        return _current[0]
+
+
+def current_alias():
+    if _current is None:
+        sync_snapshot()
+    return _current[1] if _current else None
+
+
+def _acquire():
+    """The current snapshot's alias, counted as in use until _release()."""
+    if _current is None:
+        sync_snapshot()
+    with _swap_lock:
+        if _current is None:
+            return None
+        alias = _current[1]
+        _in_use[alias] += 1
+        return alias
+
+
+def _release(alias):
+    with _swap_lock:
+        _in_use[alias] -= 1
+        if _in_use[alias] or alias not in _retired:
+            return
+        del _in_use[alias]
+        _retired.discard(alias)
+        _forget_database(alias)
+
+
+@contextmanager
+def serve_from_snapshot():
+    """
+    Route catalog reads in this block to the current snapshot, when snapshot
+    reads are on and one has been published.
+    """
+    alias = _acquire() if snapshot_reads_enabled() else None
+    token = _pinned_alias.set(alias)
+    try:
+        yield
+    finally:
+        _pinned_alias.reset(token)
+        if alias is not None:
+            _release(alias)
+            close_superseded_connections()
+
+
+@contextmanager
+def bypass_snapshot():
+    """Read from the databases in this block, even inside serve_from_snapshot()."""
+    token = _pinned_alias.set(None)
+    try:
+        yield
+    finally:
+        _pinned_alias.reset(token)
+
+
+class SnapshotRouter:
+    """Sends catalog reads to the snapshot pinned by serve_from_snapshot()."""
+
+    def db_for_read(self, model, **hints):
+        if model in SNAPSHOT_MODELS:
+            return _pinned_alias.get()
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db.startswith(ALIAS_PREFIX):
+            return False
+        return None
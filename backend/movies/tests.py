@@ -1,3 +1,1112 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import gzip
+from io import StringIO
+import json
+import os
+from pathlib import Path
+import random
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.contrib.admin.sites import site
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import requests
+
+from . import (
+    autocomplete, catalog, catalog_dump, columnar, curation, fetch_through, filters, fuzzy, industries, ingest, jobs,
+    replicas, snapshot_files, throttling, tmdb_client, tmdb_service, trending, views, warming,
+)
+from .admin import EstimatedCountPaginator, JobForm
+from .filters import MAX_LIMIT, MovieListParamsSerializer, filter_movies, page_bounds, sort_movies
+from .management.commands.explain_queries import Command as ExplainQueries
+from .models import CatalogState, Collection, CollectionEntry, Industry, Job, Movie, MovieCast, MovieViewBucket, Person
+from .tmdb_simulator import Faults, SimulatorServer, synthetic_corpus
+from .views import MovieListAPIView
 
 # Create your tests here.
+
+
+class ExplainQueriesTests(TestCase):
+    def test_reports_queries_that_match_nothing(self):
+        # With no movies the fuzzy search has no candidates and compiles to no SQL
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn('[no query] GET /api/movies/?search=drishyam&fuzzy=1', out.getvalue())
+        self.assertIn('[ok] GET /api/movies/<tmdb_id>/', out.getvalue())
+
+    def test_proposals_follow_the_plan(self):
+        command = ExplainQueries()
+        queryset = Movie.objects.filter(industry_id=1, rating__gte=7).order_by('-rating', 'id')
+        self.assertEqual(
+            command.propose_index(queryset, [('temp b-tree sort', None)]),
+            "Movie: models.Index(fields=['industry', '-rating', 'id'])",
+        )
+        # A scan without a sort indexes the range condition instead
+        self.assertEqual(
+            command.propose_index(Movie.objects.filter(rating__gte=7), [('full scan', 'movies_movie')]),
+            "Movie: models.Index(fields=['rating'])",
+        )
+        # Substring search can't use a B-tree, and a scan of another table isn't this query's
+        search = MovieListAPIView.match_search(Movie.objects.all(), 'drishyam')
+        self.assertIsNone(command.propose_index(search, [('full scan', 'movies_movie')]))
+        self.assertIsNone(command.propose_index(Movie.objects.filter(rating__gte=7), [('full scan', 'movies_video')]))
+
+
+class SnapshotSwapTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        overrides = override_settings(CATALOG_SNAPSHOT_DIR=Path(self.directory.name), CATALOG_SNAPSHOT_READS=True)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.addCleanup(self.reset_snapshots)
+        Industry.objects.create(name='Hollywood', slug='hollywood')
+
+    def reset_snapshots(self):
+        for alias in list(connections.settings):
+            if alias.startswith(snapshot_files.ALIAS_PREFIX):
+                connections[alias].close()
+                snapshot_files._forget_database(alias)
+        snapshot_files._current = None
+        snapshot_files._in_use.clear()
+        snapshot_files._retired.clear()
+
+    def publish(self, version):
+        CatalogState.objects.update_or_create(pk=1, defaults={'version': version})
+        snapshot_files.export_snapshot()
+        return snapshot_files.sync_snapshot()
+
+    def test_superseded_alias_is_dropped_after_its_last_request(self):
+        self.assertEqual(self.publish(1), 1)
+        with snapshot_files.serve_from_snapshot():
+            self.assertEqual(Industry.objects.get().slug, 'hollywood')
+            self.assertEqual(self.publish(2), 2)
+            # Still serving the request that started on version 1
+            self.assertIn('catalog_snapshot_1', connections.settings)
+            self.assertEqual(Industry.objects.count(), 1)
+        self.assertNotIn('catalog_snapshot_1', connections.settings)
+        self.assertIn('catalog_snapshot_2', connections.settings)
+
+    def test_unused_alias_is_dropped_on_swap(self):
+        self.publish(1)
+        self.publish(2)
+        self.assertNotIn('catalog_snapshot_1', connections.settings)
+        with snapshot_files.serve_from_snapshot():
+            self.assertEqual(Industry.objects.get().slug, 'hollywood')
+        self.assertEqual(dict(snapshot_files._in_use), {'catalog_snapshot_2': 0})
+
+    def open_files(self, version):
+        """This process's open handles to a version's snapshot file."""
+        name = f'catalog-{version:06d}.sqlite3'
+        return [fd for fd in Path('/proc/self/fd').iterdir() if os.path.realpath(fd).endswith(name)]
+
+    @skipUnless(Path('/proc/self/fd').is_dir(), 'needs /proc')
+    def test_every_thread_closes_superseded_files(self):
+        def read_on_another_thread():
+            def read():
+                with snapshot_files.serve_from_snapshot():
+                    Industry.objects.count()
+                # As a worker does between requests
+                request_finished.send(sender=None)
+            thread_pool.submit(read).result()
+
+        # One thread each, reading whichever snapshot is current
+        thread_pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(thread_pool.shutdown)
+        self.publish(1)
+        read_on_another_thread()
+        with snapshot_files.serve_from_snapshot():
+            Industry.objects.count()
+        self.assertTrue(self.open_files(1))
+
+        for version in (2, 3):
+            self.publish(version)
+            read_on_another_thread()
+            with snapshot_files.serve_from_snapshot():
+                Industry.objects.count()
+            self.assertEqual(self.open_files(version - 1), [])
+        self.assertTrue(self.open_files(3))
+
+
+class ReplicaRoutingTests(TestCase):
+    """Routing between the primary and two SQLite replicas registered for the test."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        CatalogState.objects.create(pk=1, version=3)
+        for alias in ('replica_a', 'replica_b'):
+            snapshot_files._register_database(alias, str(Path(self.directory.name) / f'{alias}.sqlite3'))
+            self.addCleanup(snapshot_files._unregister_database, alias)
+            with connections[alias].schema_editor() as editor:
+                editor.create_model(CatalogState)
+            self.set_replica_version(alias, 3)
+        overrides = override_settings(DATABASE_REPLICAS={'replica_a': 3, 'replica_b': 1})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        replicas._healthy = None
+        self.addCleanup(setattr, replicas, '_healthy', None)
+        self.router = replicas.ReplicaRouter()
+        self.request = RequestFactory().get('/api/movies/')
+
+    def set_replica_version(self, alias, version):
+        CatalogState.objects.using(alias).update_or_create(pk=1, defaults={'version': version})
+        replicas._healthy = None
+
+    def test_replicas_are_chosen_by_weight(self):
+        random.seed(0)
+        picks = [replicas.choose_replica() for _ in range(4000)]
+        self.assertAlmostEqual(picks.count('replica_a') / len(picks), 0.75, delta=0.03)
+        self.assertEqual(set(picks), {'replica_a', 'replica_b'})
+
+    def test_lagging_replicas_fall_back_to_the_primary(self):
+        self.set_replica_version('replica_a', 2)
+        self.assertEqual(replicas.check_replicas(), {'replica_b': 1})
+        self.set_replica_version('replica_b', 2)
+        self.assertIsNone(replicas.choose_replica())
+        with replicas.serve_from_replica(self.request):
+            self.assertIsNone(self.router.db_for_read(Movie))
+
+    def test_reads_follow_the_request_to_its_replica(self):
+        self.set_replica_version('replica_a', 2)
+        with replicas.serve_from_replica(self.request):
+            self.assertEqual(self.router.db_for_read(Movie), 'replica_b')
+            # Only catalog reads leave the primary
+            self.assertIsNone(self.router.db_for_read(get_user_model()))
+        self.assertIsNone(self.router.db_for_read(Movie))
+
+    def test_writes_pin_the_request_and_the_client_to_the_primary(self):
+        def view(request):
+            with replicas.serve_from_replica(request):
+                self.assertIsNotNone(self.router.db_for_read(Movie))
+                self.router.db_for_write(Movie)
+                self.assertIsNone(self.router.db_for_read(Movie))
+            return HttpResponse()
+
+        response = replicas.ReadYourWritesMiddleware(view)(self.request)
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], 10)
+
+        pinned = RequestFactory().get('/api/movies/')
+        pinned.COOKIES[replicas.PIN_COOKIE] = cookie.value
+        with replicas.serve_from_replica(pinned):
+            self.assertIsNone(self.router.db_for_read(Movie))
+
+
+class CollectionResolutionTests(TestCase):
+    def definitions(self):
+        return [{
+            'slug': 'thrillers', 'name': 'Thrillers', 'languages': ['hi'],
+            'entries': [{'title': 'Drishyam', 'year': 2015, 'tmdb_id': None}, {'title': 'Se7en', 'tmdb_id': 807}],
+        }]
+
+    @mock.patch.object(curation, 'search_movies')
+    def test_hints_pick_between_same_named_films(self, search_movies):
+        search_movies.return_value = {'results': [
+            {'id': 1, 'title': 'Drishyam', 'original_language': 'ml', 'release_date': '2013-12-19'},
+            {'id': 2, 'title': 'Drishyam', 'original_language': 'hi', 'release_date': '2015-07-31'},
+        ]}
+        definitions = self.definitions()
+        self.assertEqual(curation.resolve_definitions(definitions), 1)
+        self.assertEqual([entry['tmdb_id'] for entry in definitions[0]['entries']], [2, 807])
+
+    @mock.patch.object(curation, 'search_movies')
+    def test_ids_saved_by_an_earlier_load_are_reused(self, search_movies):
+        collection = Collection.objects.create(slug='thrillers', name='Thrillers')
+        CollectionEntry.objects.create(collection=collection, position=1, tmdb_id=2, title='Drishyam')
+        definitions = self.definitions()
+        self.assertEqual(curation.resolve_definitions(definitions), 0)
+        self.assertEqual(definitions[0]['entries'][0]['tmdb_id'], 2)
+        search_movies.assert_not_called()
+
+    def test_load_leaves_the_definition_file_alone(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'thrillers.json'
+            curation.write_definitions(path, self.definitions())
+            before = path.read_bytes()
+            with mock.patch.object(curation, 'search_movies', return_value={'results': []}), \
+                    mock.patch('movies.management.commands.load_collections.bump_catalog_version'):
+                call_command('load_collections', str(path), '--no-import', stdout=StringIO())
+            self.assertEqual(path.read_bytes(), before)
+        self.assertEqual(list(CollectionEntry.objects.values_list('tmdb_id', flat=True)), [807])
+
+
+class CollectionRailCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.collection = Collection.objects.create(slug='thrillers', name='Thrillers')
+        self.assertEqual(self.client.get('/api/collections/thrillers/').json()['name'], 'Thrillers')
+
+    def test_admin_edits_drop_the_cached_rail(self):
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        form = {
+            'name': 'Slow Burns', 'slug': 'slow-burns', 'description': '',
+            'entries-TOTAL_FORMS': 0, 'entries-INITIAL_FORMS': 0,
+            'entries-MIN_NUM_FORMS': 0, 'entries-MAX_NUM_FORMS': 1000,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/admin/movies/collection/{self.collection.pk}/change/', form)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get('/api/collections/slow-burns/').json()['name'], 'Slow Burns')
+        self.assertEqual(self.client.get('/api/collections/thrillers/').status_code, 404)
+
+    def test_reloading_a_collection_drops_the_cached_rail(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            curation.save_collection({'slug': 'thrillers', 'name': 'Edge of the Seat', 'entries': []})
+        self.assertEqual(self.client.get('/api/collections/thrillers/').json()['name'], 'Edge of the Seat')
+
+
+@override_settings(TMDB_FETCH_THROUGH=True, TMDB_FETCH_THROUGH_BUDGET_SECONDS=2, RESPONSE_CACHE_SECONDS=0)
+class FetchThroughTests(TransactionTestCase):
+    """The import runs on the fetch-through pool, so the tests commit for real."""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(fetch_through, 'get_movie_details')
+        self.get_movie_details = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def not_found(self, tmdb_id):
+        response = requests.Response()
+        response.status_code = 404
+        raise requests.HTTPError(response=response)
+
+    def test_concurrent_requests_share_one_import(self):
+        release = threading.Event()
+
+        def slow_details(tmdb_id):
+            release.wait(5)
+            return {'id': tmdb_id}
+
+        self.get_movie_details.side_effect = slow_details
+        with mock.patch.object(fetch_through, 'save_movie_batch') as save:
+            results = []
+            callers = [
+                threading.Thread(target=lambda: results.append(fetch_through.fetch_through(42, budget=5)))
+                for _ in range(5)
+            ]
+            for caller in callers:
+                caller.start()
+            release.set()
+            for caller in callers:
+                caller.join()
+        self.assertEqual(results, [fetch_through.FOUND] * 5)
+        self.get_movie_details.assert_called_once_with(42)
+        save.assert_called_once()
+
+    def test_ids_tmdb_does_not_know_are_remembered(self):
+        self.get_movie_details.side_effect = self.not_found
+        self.assertEqual(fetch_through.fetch_through(43), fetch_through.MISSING)
+        self.assertEqual(fetch_through.fetch_through(43), fetch_through.MISSING)
+        self.get_movie_details.assert_called_once_with(43)
+        self.assertEqual(self.client.get('/api/movies/43/').status_code, 404)
+
+    def test_slow_imports_answer_202_after_the_budget(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.get_movie_details.side_effect = lambda tmdb_id: release.wait(5) and self.not_found(tmdb_id)
+        with override_settings(TMDB_FETCH_THROUGH_BUDGET_SECONDS=0.1):
+            response = self.client.get('/api/movies/44/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'tmdb_id': 44, 'status': fetch_through.PENDING})
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_failed_imports_answer_503(self):
+        # A payload the ingest code can't read
+        self.get_movie_details.return_value = {'id': 45}
+        with mock.patch.object(fetch_through, 'save_movie_batch', side_effect=KeyError('title')), \
+                self.assertLogs('movies.fetch_through', 'ERROR'):
+            response = self.client.get('/api/movies/45/')
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(
+    TMDB_CIRCUIT_FAILURES=3, TMDB_CIRCUIT_WINDOW_SECONDS=30, TMDB_CIRCUIT_RESET_SECONDS=0.2,
+    TMDB_TIMEOUT_SECONDS=5, TMDB_HEDGE_PERCENTILE=95,
+)
+class TMDBClientTests(SimpleTestCase):
+    """The resilient TMDB client against the local simulator."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        corpus = synthetic_corpus(50)
+        cls.server = SimulatorServer(('127.0.0.1', 0), corpus)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+        cls.movie_ids = [summary['id'] for summary in corpus.summaries[:2]]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.faults = Faults()
+        patcher = mock.patch.object(tmdb_client, 'logger')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmdb_client._endpoints.clear()
+        tmdb_client._stale.clear()
+        tmdb_client._metrics.clear()
+
+    def get(self, tmdb_id):
+        endpoint = f'/movie/{tmdb_id}'
+        return tmdb_client.get(endpoint, self.base_url + endpoint, {}, {})
+
+    def counts(self):
+        return tmdb_client.metrics()['/movie/{id}']['counts']
+
+    def circuit(self):
+        return tmdb_client._endpoint('/movie/{id}').circuit
+
+    def test_failures_open_the_circuit_and_serve_the_last_good_payload(self):
+        cached, uncached = self.movie_ids
+        payload = self.get(cached)
+        self.server.faults.error_rate = 1
+        for _ in range(3):
+            self.assertEqual(self.get(cached), payload)
+        self.assertEqual(self.circuit().state, self.circuit().OPEN)
+
+        requests_served = sum(self.server.stats.values())
+        self.assertEqual(self.get(cached), payload)
+        with self.assertRaises(tmdb_client.TMDBUnavailable):
+            self.get(uncached)
+        # Short-circuited: the simulator saw neither request
+        self.assertEqual(sum(self.server.stats.values()), requests_served)
+        self.assertEqual(self.counts()[tmdb_client.SHORT_CIRCUITED], 2)
+        self.assertEqual(self.counts()[tmdb_client.STALE], 4)
+
+    def test_half_open_trial_closes_or_reopens_the_circuit(self):
+        movie_id = self.movie_ids[0]
+        self.server.faults.error_rate = 1
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                self.get(movie_id)
+        time.sleep(0.25)
+        # The trial fails: open again
+        with self.assertRaises(requests.HTTPError):
+            self.get(movie_id)
+        self.assertEqual(self.circuit().state, self.circuit().OPEN)
+
+        time.sleep(0.25)
+        self.server.faults.error_rate = 0
+        self.assertEqual(self.get(movie_id)['id'], movie_id)
+        self.assertEqual(self.circuit().state, self.circuit().CLOSED)
+
+    def test_a_trial_failing_with_any_error_reopens_the_circuit(self):
+        movie_id = self.movie_ids[0]
+        self.server.faults.error_rate = 1
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                self.get(movie_id)
+        time.sleep(0.25)
+        with mock.patch.object(tmdb_client, '_request', side_effect=ValueError('bad payload')):
+            with self.assertRaises(ValueError):
+                self.get(movie_id)
+        self.assertEqual(self.circuit().state, self.circuit().OPEN)
+        time.sleep(0.25)
+        self.assertTrue(self.circuit().allow())
+
+    def test_slow_requests_are_hedged(self):
+        movie_id = self.movie_ids[0]
+        for _ in range(tmdb_client.MIN_HEDGE_SAMPLES):
+            self.get(movie_id)
+        # Only the first request is slow: the duplicate sent after the p95 answers
+        self.server.faults = Faults(slow_rate=1, slow_ms=2000)
+        threading.Timer(0.02, setattr, (self.server, 'faults', Faults())).start()
+        started = time.monotonic()
+        self.assertEqual(self.get(movie_id)['id'], movie_id)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.counts()[tmdb_client.HEDGED], 1)
+        self.assertEqual(self.counts()[tmdb_client.HEDGE_WON], 1)
+
+
+class JobQueueTests(TestCase):
+    def test_claims_the_highest_priority_then_oldest_job(self):
+        first = jobs.enqueue('refresh_movies', {'movie_ids': [1]})
+        second = jobs.enqueue('refresh_movies', {'movie_ids': [2]})
+        Job.objects.filter(pk=second.pk).update(created_at=first.created_at + timedelta(seconds=1))
+        urgent = jobs.enqueue('rebuild_trending', priority=5)
+        self.assertEqual(jobs.claim('worker-1'), urgent)
+        claimed = jobs.claim('worker-1')
+        self.assertEqual(claimed, first)
+        self.assertEqual((claimed.status, claimed.worker, claimed.attempts), (Job.RUNNING, 'worker-1', 1))
+
+    def test_concurrency_limits_hold_across_workers(self):
+        for n in range(2):
+            jobs.enqueue('rebuild_trending', {'args': [], 'options': {'n': n}})
+        self.assertIsNotNone(jobs.claim('worker-1'))
+        # rebuild_trending runs one at a time
+        self.assertIsNone(jobs.claim('worker-2'))
+        jobs.enqueue('refresh_movies', {'movie_ids': [1]})
+        self.assertEqual(jobs.claim('worker-2').kind, 'refresh_movies')
+
+    def test_jobs_of_stopped_workers_are_requeued_then_failed(self):
+        stale = timezone.now() - timedelta(seconds=jobs.STALE_SECONDS + 1)
+        retry = Job.objects.create(kind='rebuild_trending', status=Job.RUNNING, heartbeat_at=stale, attempts=1)
+        give_up = Job.objects.create(
+            kind='rebuild_trending', status=Job.RUNNING, heartbeat_at=stale, attempts=jobs.MAX_ATTEMPTS
+        )
+        alive = Job.objects.create(kind='rebuild_trending', status=Job.RUNNING, heartbeat_at=timezone.now())
+        self.assertEqual(jobs.requeue_stale(), 2)
+        retry.refresh_from_db()
+        give_up.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((retry.status, retry.worker), (Job.QUEUED, ''))
+        self.assertEqual(give_up.status, Job.FAILED)
+        self.assertIsNotNone(give_up.finished_at)
+        self.assertEqual(alive.status, Job.RUNNING)
+
+    def test_params_must_be_an_object(self):
+        for params in ('[1, 2]', '"x"', 'nope'):
+            with self.assertRaisesMessage(CommandError, '--params must be a JSON object.'):
+                call_command('enqueue_job', 'refresh_movies', '--params', params)
+        with self.assertRaises(ValueError):
+            jobs.enqueue('refresh_movies', [1, 2])
+        form = JobForm(data={'kind': 'rebuild_trending', 'params': '["--all"]', 'priority': 0})
+        self.assertIn('params', form.errors)
+        self.assertFalse(Job.objects.exists())
+
+    def test_cancelling_queued_jobs_finishes_them(self):
+        queued = jobs.enqueue('rebuild_trending')
+        running = Job.objects.create(kind='refresh_movies', status=Job.RUNNING)
+        admin = site._registry[Job]
+        with mock.patch.object(admin, 'message_user'):
+            admin.cancel_jobs(None, Job.objects.all())
+        queued.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(queued.status, Job.CANCELLED)
+        self.assertIsNotNone(queued.finished_at)
+        self.assertEqual((running.status, running.cancel_requested), (Job.RUNNING, True))
+
+
+@override_settings(CATALOG_WARMING=True)
+class CatalogWarmingTests(TestCase):
+    def test_bump_inside_a_transaction_warms_after_the_commit(self):
+        CatalogState.objects.create(pk=1, version=7)
+        warmed = []
+        with mock.patch.object(warming, 'warm_version', side_effect=lambda version: warmed.append(
+            (version, CatalogState.objects.get().version)
+        )):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.assertIsNone(catalog.bump_catalog_version())
+                self.assertEqual(warmed, [])
+                self.assertEqual(CatalogState.objects.get().version, 7)
+            self.assertEqual(len(callbacks), 1)
+        # Warmed for the next version while the current one was still published
+        self.assertEqual(warmed, [(8, 7)])
+        self.assertEqual(CatalogState.objects.get().version, 8)
+
+
+@override_settings(RESPONSE_CACHE_SECONDS=60)
+class MovieUserRatingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.movie = Movie.objects.create(tmdb_id=101, title='Drishyam')
+
+    def rate(self):
+        # As users/ratings.py does, behind any loaded instance's back
+        Movie.objects.filter(pk=self.movie.pk).update(user_rating_count=1, user_rating_sum=9, user_rating=7.0)
+
+    def test_full_saves_keep_the_aggregates(self):
+        self.rate()
+        self.movie.title = 'Drishyam (2013)'
+        self.movie.save()
+        Movie.create_or_update(101, title='Drishyam', popularity=12.5)
+        movie = Movie.objects.get()
+        self.assertEqual((movie.title, movie.popularity), ('Drishyam', 12.5))
+        self.assertEqual((movie.user_rating_count, movie.user_rating_sum, movie.user_rating), (1, 9, 7.0))
+        admin = site._registry[Movie]
+        self.assertTrue(set(Movie.USER_RATING_FIELDS) <= set(admin.get_readonly_fields(None, movie)))
+
+    def test_aggregates_are_served_live_not_from_cached_payloads(self):
+        response = self.client.get('/api/movies/101/')
+        self.assertNotIn('user_rating', response.json())
+        self.rate()
+        response = self.client.get('/api/movies/user-ratings/', {'tmdb_id': [101, 102]})
+        self.assertEqual(response.json(), {'results': [{'tmdb_id': 101, 'user_rating': 7.0, 'user_rating_count': 1}]})
+        self.assertEqual(self.client.get('/api/movies/user-ratings/').status_code, 400)
+
+    def test_user_rating_lists_read_the_primary(self):
+        with mock.patch.object(views, 'primary_reads', wraps=replicas.primary_reads) as primary_reads:
+            self.client.get('/api/movies/', {'limit': 5})
+            self.assertFalse(primary_reads.called)
+            self.client.get('/api/movies/', {'limit': 5, 'sort': 'user_rating'})
+            self.client.get('/api/movies/', {'limit': 5, 'min_user_rating': 6})
+            self.assertEqual(primary_reads.call_count, 2)
+
+
+@override_settings(API_THROTTLING=True, API_THROTTLE_RATES={'client': '3/min'})
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_buckets_refill_at_their_rate(self):
+        bucket = {'bucket': (10, 60)}
+        self.assertEqual(throttling.take(bucket, 4, now=1000), 0)
+        self.assertEqual(throttling.take(bucket, 4, now=1000), 0)
+        # Two tokens left; the third request waits for two more at 6s each
+        self.assertEqual(throttling.take(bucket, 4, now=1000), 12)
+        self.assertEqual(throttling.take(bucket, 4, now=1012), 0)
+        # A request dearer than a whole bucket takes just the bucket
+        self.assertEqual(throttling.take({'other': (10, 60)}, 50, now=1000), 0)
+
+    def test_tokens_are_taken_from_every_bucket_or_none(self):
+        throttling.take({'empty': (1, 60)}, 1, now=1000)
+        self.assertEqual(throttling.take({'empty': (1, 60), 'full': (1, 60)}, 1, now=1000), 60)
+        self.assertEqual(throttling.take({'full': (1, 60)}, 1, now=1000), 0)
+
+    def test_forwarded_for_headers_do_not_make_new_clients(self):
+        for i in range(3):
+            response = self.client.get('/api/movies/user-ratings/', {'tmdb_id': 1}, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/movies/user-ratings/', {'tmdb_id': 1}, HTTP_X_FORWARDED_FOR='10.0.0.9')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    @override_settings(RESPONSE_CACHE_SECONDS=60, API_THROTTLE_RATES={'client': '1200/min', 'movie-list': '60/min'})
+    def test_cached_home_page_rails_are_cheap(self):
+        # The rails of frontend/app/page.tsx
+        home_page = [
+            '/api/movies/?sort=popularity&min_rating=7&limit=15', '/api/movies/?industry=hollywood',
+            '/api/movies/?industry=bollywood', '/api/movies/?industry=south%20indian',
+            '/api/movies/?sort=top_rated&min_rating=8.5&limit=15',
+        ]
+        # 34 tokens to render them, then 5 a load from the cache
+        for _ in range(6):
+            for path in home_page:
+                self.assertEqual(self.client.get(path).status_code, 200, path)
+        # An uncached list still costs its full price
+        self.assertEqual(self.client.get('/api/movies/?industry=hollywood&year=2019').status_code, 429)
+        # Served from the cache, they are the last to be shed
+        with mock.patch.object(throttling.monitor, 'load', return_value=3), \
+                override_settings(API_THROTTLING=False):
+            self.assertEqual(self.client.get('/api/movies/?industry=bollywood').status_code, 200)
+            self.assertEqual(self.client.get('/api/movies/?industry=bollywood&year=2019').status_code, 503)
+
+    def test_expensive_requests_are_shed_first(self):
+        with mock.patch.object(throttling.monitor, 'load', return_value=3):
+            response = self.client.get('/api/movies/')
+            self.assertEqual((response.status_code, response['Retry-After']), (503, '3'))
+            self.assertEqual(self.client.get('/api/movies/user-ratings/', {'tmdb_id': 1}).status_code, 200)
+
+
+class ColumnarIndexTests(TestCase):
+    def setUp(self):
+        hollywood = Industry.objects.create(name='Hollywood')
+        rng = random.Random(7)
+        # Few distinct values, so every sort has ties for the id to break
+        for i in range(60):
+            Movie.objects.create(
+                tmdb_id=i + 1, title=rng.choice(['Drishyam', 'Kahaani', 'andhadhun', 'Zodiac']),
+                popularity=rng.choice([1.0, 2.5, 9.0]), rating=rng.choice([6.5, 7.0, 8.0]),
+                release_date=rng.choice([None, date(2013, 12, 19), date(2019, 5, 1)]),
+                industry=rng.choice([None, hollywood]),
+            )
+        self.columns = columnar.build_catalog_columns()
+
+    def test_pages_match_the_database_for_every_sort(self):
+        for sort in columnar.SORT_KEYS:
+            for query in (
+                {}, {'limit': '7'}, {'limit': '7', 'page': '3'}, {'industry': 'hollywood', 'limit': '5'},
+                {'year': '2019', 'limit': '3'},
+            ):
+                serializer = MovieListParamsSerializer(data=dict(query, sort=sort))
+                serializer.is_valid(raise_exception=True)
+                params = serializer.validated_data
+                start, end = page_bounds(params)
+                queryset = sort_movies(filter_movies(Movie.objects.all(), params), sort).values_list('id', flat=True)
+                self.assertEqual(self.columns.query(params), list(queryset[start:end]), (sort, query))
+
+
+class MovieListParamsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(5):
+            Movie.objects.create(tmdb_id=i + 1, title=f'Movie {i}', popularity=i)
+
+    def test_bad_parameters_are_rejected(self):
+        for params in (
+            {'year': '20x5'}, {'year': '2019-2010'}, {'year': '1700'}, {'sort': 'budget'},
+            {'limit': '0'}, {'limit': 'ten'}, {'page': '0'}, {'min_rating': '11'}, {'min_rating': 'high'},
+        ):
+            response = self.client.get('/api/movies/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn(next(iter(params)), response.json())
+
+    def test_lists_are_paged(self):
+        ids = list(Movie.objects.order_by('-popularity', 'id').values_list('tmdb_id', flat=True))
+        pages = [
+            [movie['tmdb_id'] for movie in self.client.get('/api/movies/', {'limit': 2, 'page': page}).json()]
+            for page in (1, 2, 3, 4)
+        ]
+        self.assertEqual(pages, [ids[:2], ids[2:4], ids[4:], []])
+        # Without a limit, a page of MAX_LIMIT
+        Movie.objects.bulk_create([Movie(tmdb_id=100 + i, title=f'Sequel {i}') for i in range(MAX_LIMIT)])
+        self.assertEqual(len(self.client.get('/api/movies/', {'summary': 1}).json()), MAX_LIMIT)
+
+    @override_settings(RESPONSE_CACHE_SECONDS=60)
+    def test_compiled_sql_is_opt_in_and_never_cached(self):
+        self.assertNotIn('X-Compiled-SQL', self.client.get('/api/movies/', {'limit': 2}))
+        with override_settings(API_COMPILED_SQL_HEADER=True):
+            self.assertNotIn('X-Compiled-SQL', self.client.get('/api/movies/', {'limit': 3}))
+            response = self.client.get('/api/movies/', {'limit': 3, 'min_user_rating': 1})
+            self.assertIn('LIMIT 3', response['X-Compiled-SQL'])
+
+
+class IndustryClassificationTests(TestCase):
+    def details(self, tmdb_id, language, countries=()):
+        return {
+            'id': tmdb_id, 'title': f'Movie {tmdb_id}', 'original_language': language,
+            'production_countries': [{'iso_3166_1': code} for code in countries],
+            'credits': {'cast': [], 'crew': []}, 'videos': {'results': []},
+        }
+
+    def test_unknown_languages_are_other(self):
+        self.assertEqual(industries.classify('fr', 'FR'), 'Other')
+        self.assertEqual(industries.classify('ko', 'KR'), 'Other')
+        self.assertEqual(industries.classify('en', 'US'), 'Hollywood')
+        self.assertEqual(industries.classify('en', 'GB,IN'), 'Bollywood')
+        self.assertIsNone(industries.classify(''))
+
+        hollywood = Industry.objects.create(name='Hollywood')
+        Movie.objects.create(tmdb_id=1, title='Amélie', original_language='fr', industry=hollywood)
+        self.assertEqual(industries.reclassify(), {'Bollywood': 0, 'South Indian': 0, 'Hollywood': 0, 'Other': 1})
+        self.assertEqual(Movie.objects.get(tmdb_id=1).industry.name, 'Other')
+
+    def test_import_tmdb_movies_stores_production_countries(self):
+        command = 'movies.management.commands.import_tmdb_movies'
+        listed = {'id': 1, 'title': 'Movie 1', 'original_language': 'en'}
+        with mock.patch(f'{command}.get_popular_movies', return_value={'results': [listed]}), \
+                mock.patch(f'{command}.get_movie_details', return_value=self.details(1, 'en', ['IN'])):
+            call_command('import_tmdb_movies', stdout=StringIO())
+        movie = Movie.objects.get(tmdb_id=1)
+        self.assertEqual((movie.production_countries, movie.industry.name), ('IN', 'Bollywood'))
+
+    def test_missing_language_keeps_the_stored_industry(self):
+        bollywood = Industry.objects.create(name='Bollywood')
+        Movie.objects.create(tmdb_id=1, title='Movie 1', original_language='hi', industry=bollywood)
+        ingest.save_movie_batch([self.details(1, None)], industries.IndustryClassifier())
+        self.assertEqual(Movie.objects.get(tmdb_id=1).industry, bollywood)
+
+    def test_import_movie_by_name_honors_industry(self):
+        Industry.objects.create(name='Hollywood')
+        payload = self.details(1, 'hi', ['IN'])
+        with mock.patch('movies.management.commands.import_movie_by_name.import_movie_by_name', return_value=payload), \
+                mock.patch.object(industries.IndustryClassifier, '__call__') as classify:
+            call_command('import_movie_by_name', 'Movie 1', industry='Hollywood', stdout=StringIO())
+        classify.assert_not_called()
+        self.assertEqual(Movie.objects.get(tmdb_id=1).industry.name, 'Hollywood')
+
+
+class SearchIndexTests(TestCase):
+    def test_admin_renames_refresh_the_trigram_index(self):
+        movie = Movie.objects.create(tmdb_id=1, title='Drishyam')
+        person = Person.objects.create(tmdb_id=2, name='Mohanlal')
+        movie.title = 'Kahaani'
+        site._registry[Movie].save_model(None, movie, mock.Mock(changed_data=['title']), True)
+        person.name = 'Vidya Balan'
+        site._registry[Person].save_model(None, person, mock.Mock(changed_data=['name']), True)
+        self.assertEqual(list(fuzzy.similar_movie_ids('kahani')), [movie.id])
+        self.assertEqual(list(fuzzy._similar_ids(Person, 'person', 'name', 'vidya balan', 10)), [person.id])
+        self.assertEqual(fuzzy.similar_movie_ids('drishyam'), {})
+
+    def test_indexing_checks_the_write_database(self):
+        movie = Movie.objects.create(tmdb_id=1, title='Drishyam')
+        # Movie reads routed to a Postgres replica must not stop the SQLite primary's index
+        databases = {'default': connections['default'], 'replica': mock.Mock(vendor='postgresql')}
+        route = lambda model, **hints: 'replica' if model is Movie else 'default'
+        with mock.patch.object(fuzzy, 'connections', databases), \
+                mock.patch('django.db.router.db_for_read', side_effect=route):
+            self.assertTrue(fuzzy.use_pg_trgm())
+            fuzzy.index_movies([movie])
+        self.assertEqual(list(fuzzy.similar_movie_ids('drishyam')), [movie.id])
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for tmdb_id, title in ((101, 'Drishyam'), (102, 'Kahaani'), (103, 'Zodiac')):
+            Movie.objects.create(tmdb_id=tmdb_id, title=title, popularity=tmdb_id)
+        self.tracker = trending.ViewTracker()
+        patcher = mock.patch.object(trending, 'tracker', self.tracker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def trending_ids(self, **params):
+        response = self.client.get('/api/movies/', dict(params, sort='trending', summary=1))
+        return [movie['tmdb_id'] for movie in response.json()]
+
+    def test_detail_views_are_merged_and_ranked(self):
+        for tmdb_id in (102, 102, 101, 102, 404):
+            self.client.get(f'/api/movies/{tmdb_id}/')
+        # Requests only count; nothing is written until a merge
+        self.assertIsNone(self.tracker.thread)
+        self.assertFalse(MovieViewBucket.objects.exists())
+        self.assertEqual(self.tracker.merge(), 4)
+        self.assertEqual(
+            list(MovieViewBucket.objects.order_by('movie__tmdb_id').values_list('movie__tmdb_id', 'views')),
+            [(101, 1), (102, 3)],
+        )
+        self.assertEqual(self.trending_ids(), [102, 101])
+        self.assertEqual(self.trending_ids(search='Drishyam'), [101])
+        self.assertEqual(self.tracker.merge(), 0)
+
+    @override_settings(RESPONSE_CACHE_SECONDS=60)
+    def test_cached_trending_lists_read_no_ranking(self):
+        with mock.patch.object(trending, 'ranking', wraps=trending.ranking) as ranking:
+            self.assertEqual(self.trending_ids(), [])
+            self.assertEqual(self.trending_ids(), [])
+        self.assertEqual(ranking.call_count, 1)
+        # The next merge interval asks for the new ranking
+        self.client.get('/api/movies/103/')
+        self.tracker.merge()
+        with mock.patch.object(trending, 'ranking_period', return_value=trending.ranking_period() + 1):
+            self.assertEqual(self.trending_ids(), [103])
+
+
+class CatalogDumpTests(TransactionTestCase):
+    """Foreign keys are checked when the load commits."""
+
+    def setUp(self):
+        path = Path(tempfile.mkdtemp()) / 'catalog.ndjson.gz'
+        self.addCleanup(path.unlink, missing_ok=True)
+        self.path = str(path)
+
+    def catalog(self):
+        return {model: list(model.objects.order_by('pk').values()) for model in catalog_dump.DUMP_MODELS}
+
+    def test_a_dump_loads_back_into_the_same_catalog(self):
+        industry = Industry.objects.create(name='Bollywood')
+        person = Person.objects.create(tmdb_id=10, name='Ajay Devgn')
+        movie = Movie.objects.create(
+            tmdb_id=101, title='Drishyam', industry=industry, release_date=date(2015, 7, 31), popularity=12.5,
+            top_cast_ids=[10],
+        )
+        movie.cast.create(person=person, character='Vijay Salgaonkar', order=0)
+        movie.crew.create(person=person, job='Director', department='Directing')
+        movie.videos.create(key='AuuX2j14NBg', name='Trailer', site='YouTube', type='Trailer')
+        collection = Collection.objects.create(slug='thrillers', name='Thrillers')
+        CollectionEntry.objects.create(collection=collection, position=1, tmdb_id=101, title='Drishyam', movie=movie)
+        before = self.catalog()
+
+        catalog_dump.dump_catalog(self.path)
+        for model in catalog_dump.DUMP_MODELS[::-1]:
+            model.objects.all().delete()
+        call_command('load_catalog', self.path, stdout=StringIO())
+        self.assertEqual(self.catalog(), before)
+        self.assertEqual(list(fuzzy.similar_movie_ids('drishyam')), [movie.pk])
+        # The sequences moved past the loaded ids
+        self.assertGreater(Movie.objects.create(tmdb_id=102, title='Kahaani').pk, movie.pk)
+
+    @skipUnless(connections['default'].vendor == 'sqlite', 'Foreign key checks are deferred in transactions elsewhere')
+    def test_loading_inside_a_transaction_is_refused_on_sqlite(self):
+        catalog_dump.dump_catalog(self.path)
+        with transaction.atomic(), self.assertRaisesMessage(catalog_dump.DumpError, 'outside of a transaction'):
+            catalog_dump.load_dump(self.path)
+
+
+class CreditSummaryTests(TestCase):
+    def details(self, cast, crew=(), videos=()):
+        return {
+            'id': 101, 'title': 'Drishyam', 'original_language': 'ml',
+            'credits': {
+                'cast': [{'id': tmdb_id, 'name': name, 'order': order} for order, (tmdb_id, name) in cast],
+                'crew': [{'id': tmdb_id, 'name': name, 'job': job} for tmdb_id, name, job in crew],
+            },
+            'videos': {'results': [{'key': key, 'type': kind, 'site': site} for key, kind, site in videos]},
+        }
+
+    def test_imports_refresh_the_summaries(self):
+        cast = [(order, (10 + order, f'Actor {order}')) for order in (5, 3, 0, 1, 4, 2)]
+        crew = [
+            (1, 'Jeethu Joseph', 'Director'), (1, 'Jeethu Joseph', 'Writer'), (2, 'Sathish Kurup', 'Cinematography'),
+        ]
+        videos = [('teaser', 'Teaser', 'YouTube'), ('vimeo', 'Trailer', 'Vimeo'), ('trailer', 'Trailer', 'YouTube')]
+        ingest.save_movie_batch([self.details(cast, crew, videos)], lambda details: None)
+
+        movie = Movie.objects.get(tmdb_id=101)
+        self.assertEqual(movie.director_names, 'Jeethu Joseph')
+        self.assertEqual(movie.top_cast_names, 'Actor 0, Actor 1, Actor 2, Actor 3, Actor 4')
+        self.assertEqual(movie.top_cast_ids, [10, 11, 12, 13, 14])
+        self.assertEqual((movie.video_count, movie.trailer_key), (3, 'trailer'))
+        self.assertIn('Actor 5', movie.credit_names)
+        self.assertNotIn('Sathish Kurup', movie.credit_names)
+        self.assertEqual(Person.objects.get(tmdb_id=10).credit_count, 1)
+
+        # A re-import replaces the credits, and the summaries with them
+        ingest.save_movie_batch([self.details([(0, (20, 'Mohanlal'))])], lambda details: None)
+        movie = Movie.objects.get(tmdb_id=101)
+        self.assertEqual(
+            (movie.director_names, movie.top_cast_names, movie.video_count, movie.trailer_key),
+            ('', 'Mohanlal', 0, ''),
+        )
+        self.assertEqual(list(fuzzy.similar_movie_ids('mohanlal')), [movie.pk])
+
+    def test_credit_edits_are_summarized_on_refresh(self):
+        ingest.save_movie_batch([self.details([(0, (20, 'Mohanlal'))])], lambda details: None)
+        movie = Movie.objects.get(tmdb_id=101)
+        movie.crew.create(person=Person.objects.create(tmdb_id=1, name='Jeethu Joseph'), job='Director')
+        movie.refresh_credit_summary()
+        response = self.client.get('/api/movies/', {'summary': 1})
+        self.assertEqual(response.json()[0]['director_names'], 'Jeethu Joseph')
+        self.assertEqual(Person.objects.get(tmdb_id=1).known_for, [{'tmdb_id': 101, 'title': 'Drishyam'}])
+
+
+class PersonSearchTests(TestCase):
+    def setUp(self):
+        industry = Industry.objects.create(name='South Indian')
+        movies = [
+            Movie.objects.create(tmdb_id=100 + i, title=title, release_date=released, industry=industry)
+            for i, (title, released) in enumerate([
+                ('Drishyam', date(2013, 12, 19)), ('Drishyam 2', date(2021, 2, 19)), ('Lucifer', date(2019, 3, 28)),
+            ])
+        ]
+        self.mohanlal = Person.objects.create(tmdb_id=1, name='Mohanlal')
+        agashe = Person.objects.create(tmdb_id=2, name='Mohan Agashe')
+        prithviraj = Person.objects.create(tmdb_id=3, name='Prithviraj Sukumaran')
+        for movie, character in zip(movies, ['Georgekutty', 'Georgekutty', 'Stephen Nedumpally']):
+            movie.cast.create(person=self.mohanlal, character=character, order=0)
+        movies[0].cast.create(person=agashe, character='Prabhakar', order=1)
+        movies[2].crew.create(person=prithviraj, job='Director', department='Directing')
+        movies[2].cast.create(person=prithviraj, character='Zayed Masood', order=1)
+        Person.refresh_credit_stats()
+        fuzzy.index_people(Person.objects.all())
+
+    def names(self, **params):
+        return [person['name'] for person in self.client.get('/api/people/', params).json()]
+
+    def test_search_orders_by_credits(self):
+        self.assertEqual(self.names(search='moh'), ['Mohanlal', 'Mohan Agashe'])
+        self.assertEqual(self.names(search='  MOHAN  a'), ['Mohan Agashe'])
+        # No prefix match falls back to typo-tolerant search
+        self.assertEqual(self.names(search='Mohanlaal'), ['Mohanlal'])
+        self.assertEqual(self.names(), ['Mohanlal', 'Mohan Agashe', 'Prithviraj Sukumaran'])
+        self.assertEqual(self.names(limit=1), ['Mohanlal'])
+        self.assertEqual(self.names(search='zzz'), [])
+
+    def test_filmography_is_newest_first_with_roles(self):
+        person = self.client.get('/api/people/3/').json()
+        self.assertEqual(person['credit_count'], 1)
+        self.assertEqual(
+            [(movie['title'], movie['character'], movie['job']) for movie in person['filmography']],
+            [('Lucifer', 'Zayed Masood', 'Director')],
+        )
+        filmography = self.client.get('/api/people/1/').json()['filmography']
+        self.assertEqual([movie['title'] for movie in filmography], ['Drishyam 2', 'Lucifer', 'Drishyam'])
+        self.assertEqual({movie['job'] for movie in filmography}, {None})
+        self.assertEqual(filmography[0]['industry']['name'], 'South Indian')
+        self.assertEqual(self.client.get('/api/people/404/').status_code, 404)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        # Built fresh for this test's database, and put back afterwards
+        patcher = mock.patch.multiple(autocomplete.autocomplete_index, version=None, value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def suggest(self, q, **params):
+        results = self.client.get('/api/autocomplete/', dict(params, q=q)).json()['results']
+        return [result.get('title') or result.get('name') for result in results]
+
+    def test_prefixes_rank_by_popularity(self):
+        index = autocomplete.AutocompleteIndex([
+            ('Drishyam', 30, 'drishyam'), ('Drishyam 2', 50, 'drishyam-2'), ('Dr. No', 10, 'dr-no'),
+            ('The Drifter', 20, 'drifter'), ('Andhadhun', 40, 'andhadhun'),
+        ])
+        # One- and two-character prefixes come from the precomputed lists, longer ones from the sorted keys
+        self.assertEqual(index.search('d'), ['drishyam-2', 'drishyam', 'drifter', 'dr-no'])
+        self.assertEqual(index.search('DR'), ['drishyam-2', 'drishyam', 'drifter', 'dr-no'])
+        self.assertEqual(index.search('dris'), ['drishyam-2', 'drishyam'])
+        # Every word starts a match, but not the middle of one
+        self.assertEqual(index.search('2'), ['drishyam-2'])
+        self.assertEqual(index.search('drifter'), ['drifter'])
+        self.assertEqual(index.search('hadhun'), [])
+        self.assertEqual(index.search('d', limit=2), ['drishyam-2', 'drishyam'])
+        self.assertEqual(index.search('  '), [])
+
+    def test_index_is_rebuilt_when_the_catalog_version_changes(self):
+        drishyam = Movie.objects.create(tmdb_id=101, title='Drishyam', popularity=30)
+        Movie.objects.create(tmdb_id=102, title='Dear Zindagi', popularity=60)
+        drishyam.cast.create(person=Person.objects.create(tmdb_id=1, name='Mohanlal'), order=0)
+        catalog.bump_catalog_version()
+        self.assertEqual(self.suggest('d'), ['Dear Zindagi', 'Drishyam'])
+        # A person ranks with their best-known movie
+        self.assertEqual(self.suggest('mohan'), ['Mohanlal'])
+
+        Movie.objects.create(tmdb_id=103, title='Drishyam 2', popularity=90)
+        self.assertEqual(self.suggest('dri'), ['Drishyam'])
+        catalog.bump_catalog_version()
+        self.assertEqual(self.suggest('dri'), ['Drishyam 2', 'Drishyam'])
+        self.assertEqual(self.suggest('d', limit=1), ['Drishyam 2'])
+
+
+@override_settings(API_THROTTLING=False)
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.multiple(filters.industry_map, version=None, value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        industries = [Industry.objects.create(name=name) for name in ('Hollywood', 'Bollywood', 'South Indian')]
+        rng = random.Random(31)
+        # Fewer than MAX_LIMIT, so a list holds every match
+        Movie.objects.bulk_create([
+            Movie(
+                tmdb_id=i + 1, title=rng.choice(['Drishyam', 'Kahaani', 'Zodiac']),
+                industry=rng.choice(industries + [None]), rating=rng.choice([0, 5.5, 6.9, 7.0, 7.5, 8.2, 9.1]),
+                release_date=rng.choice(
+                    [None, date(1999, 6, 1), date(2009, 12, 31), date(2010, 1, 1), date(2015, 7, 31)]
+                ),
+            )
+            for i in range(90)
+        ])
+
+    def count(self, params):
+        response = self.client.get('/api/movies/', dict(params, summary=1))
+        self.assertEqual(response.status_code, 200, params)
+        return len(response.json())
+
+    def test_counts_match_the_list_filters(self):
+        for params in (
+            {}, {'industry': 'bollywood'}, {'year': '2010-2019'}, {'min_rating': '7.5'}, {'search': 'drishyam'},
+            {'industry': 'south indian', 'year': '2009', 'min_rating': '7'}, {'industry': 'tollywood'},
+        ):
+            data = self.client.get('/api/movies/facets/', params).json()
+            self.assertEqual(data['total'], self.count(params), params)
+            # Each option counts the list with it replacing its own filter
+            facets = {'industry': 'industry', 'decade': 'year', 'year': 'year', 'rating': 'min_rating'}
+            for facet, param in facets.items():
+                for option in data['facets'][facet]:
+                    self.assertEqual(
+                        option['count'], self.count(dict(params, **{param: option['value']})), (params, facet, option)
+                    )
+
+
+class DailyExportImportTests(TestCase):
+    command = 'movies.management.commands.import_tmdb_export'
+
+    def setUp(self):
+        Industry.objects.create(name='Bollywood')
+        Movie.objects.create(tmdb_id=6, title='Kahaani')
+        path = Path(tempfile.mkdtemp()) / 'movie_ids_07_31_2015.json.gz'
+        self.addCleanup(path.unlink)
+        entries = [
+            {'id': 1, 'popularity': 5}, {'id': 2, 'popularity': 5, 'adult': True},
+            {'id': 3, 'popularity': 5, 'video': True}, {'id': 4, 'popularity': 0.5}, {'id': 5, 'popularity': 3},
+            {'id': 6, 'popularity': 9}, {'id': 7, 'popularity': 2},
+        ]
+        with gzip.open(path, 'wt') as f:
+            f.write(''.join(json.dumps(entry) + '\n\n' for entry in entries))
+        self.path = str(path)
+        self.fetched = []
+
+    def details(self, tmdb_id):
+        self.fetched.append(tmdb_id)
+        if tmdb_id == 5:
+            raise requests.ConnectionError('Connection reset')
+        return {
+            'id': tmdb_id, 'title': f'Movie {tmdb_id}', 'original_language': 'hi',
+            'credits': {'cast': [{'id': 100 + len(self.fetched), 'name': f'Actor {len(self.fetched)}'}], 'crew': []},
+        }
+
+    def run_import(self, *args, **options):
+        out = StringIO()
+        with mock.patch(f'{self.command}.get_movie_details', side_effect=self.details), \
+                mock.patch(f'{self.command}.iter_daily_export', wraps=tmdb_service.iter_daily_export) as export:
+            call_command('import_tmdb_export', *args, file=self.path, batch_size=2, workers=2, stdout=out,
+                         stderr=StringIO(), **options)
+        export.assert_called_once_with(self.path)
+        return out.getvalue()
+
+    def test_local_export_is_filtered_and_imported_in_batches(self):
+        out = self.run_import()
+        self.assertEqual(sorted(self.fetched), [1, 5, 7])
+        self.assertIn('Successfully imported 2 new and 0 updated movies (1 skipped, 1 failed)', out)
+        self.assertEqual(
+            list(Movie.objects.order_by('tmdb_id').values_list('tmdb_id', 'title', 'industry__name')),
+            [(1, 'Movie 1', 'Bollywood'), (6, 'Kahaani', None), (7, 'Movie 7', 'Bollywood')],
+        )
+
+    def test_options_narrow_and_override_the_import(self):
+        self.run_import('--min-popularity', '4', '--include-adult', '--update-existing', '--industry', 'bollywood')
+        self.assertEqual(sorted(self.fetched), [1, 2, 6])
+        self.assertEqual(Movie.objects.get(tmdb_id=6).title, 'Movie 6')
+        self.fetched.clear()
+        self.run_import('--limit', '1', '--update-existing')
+        self.assertEqual(self.fetched, [1])
+        with self.assertRaisesMessage(CommandError, "Unknown industry 'tollywood'"):
+            self.run_import('--industry', 'tollywood')
+
+    def test_reimports_refresh_the_stats_of_dropped_people(self):
+        self.run_import()
+        first = Movie.objects.get(tmdb_id=1).top_cast_ids[0]
+        self.assertEqual(Person.objects.get(tmdb_id=first).credit_count, 1)
+        self.run_import('--update-existing')
+        self.assertNotEqual(Movie.objects.get(tmdb_id=1).top_cast_ids[0], first)
+        self.assertEqual(Person.objects.get(tmdb_id=first).credit_count, 0)
+
+
+class LargeTableAdminTests(TestCase):
+    def setUp(self):
+        self.movies = [
+            Movie.objects.create(tmdb_id=101 + i, title=title, popularity=i)
+            for i, title in enumerate(['Drishyam', 'drifter', 'Kahaani', 'Andhadhun'])
+        ]
+        person = Person.objects.create(tmdb_id=1, name='Mohanlal')
+        self.movies[0].cast.create(person=person, order=0)
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def count(self, queryset):
+        return EstimatedCountPaginator(queryset.order_by('pk'), 2).count
+
+    def test_large_tables_are_counted_from_estimates(self):
+        with mock.patch('movies.admin.ESTIMATE_COUNTS_ABOVE', 3), mock.patch('movies.admin.MAX_EXACT_COUNT', 2):
+            # Without statistics the highest id stands in for the row count
+            Movie.objects.filter(pk=self.movies[1].pk).delete()
+            self.assertEqual(self.count(Movie.objects.all()), self.movies[-1].pk)
+            with connections['default'].cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.assertEqual(self.count(Movie.objects.all()), 3)
+            # Filtered lists count exactly, up to MAX_EXACT_COUNT
+            self.assertEqual(self.count(Movie.objects.filter(popularity__gte=2)), 2)
+            self.assertEqual(self.count(Movie.objects.filter(popularity__gte=3)), 1)
+            # Small tables count exactly
+            self.assertEqual(self.count(Person.objects.all()), 1)
+
+    def test_searches_use_prefixes_and_tmdb_ids(self):
+        def search(model, term):
+            queryset, _ = site._registry[model].get_search_results(None, model.objects.all(), term)
+            return sorted(str(obj) for obj in queryset)
+
+        self.assertEqual(search(Movie, 'dri'), ['Drishyam', 'drifter'])
+        self.assertEqual(search(Movie, 'Dri'), ['Drishyam'])
+        self.assertEqual(search(Movie, '103'), ['Kahaani'])
+        self.assertEqual(search(Movie, 'dhun'), [])
+        self.assertEqual(search(Person, 'MOHAN'), ['Mohanlal'])
+        self.assertEqual(search(Person, '1'), ['Mohanlal'])
+        self.assertEqual(len(search(MovieCast, 'drishyam')), 1)
+        self.assertEqual(len(search(MovieCast, 'rishyam')), 0)
+        self.assertEqual(len(search(MovieCast, '101')), 1)
+
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get('/admin/movies/movie/', {'q': 'Kah'})
+        self.assertContains(response, 'Kahaani')
+        self.assertNotContains(response, 'Drishyam')
+        self.assertFalse([query['sql'] for query in queries if 'LIKE' in query['sql']])
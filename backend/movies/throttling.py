@@ -0,0 +1,201 @@
+"""
+Rate limits and load shedding for the API.
+
+Throttling: every client (the signed-in user, or the IP address as DRF
+sees it behind NUM_PROXIES proxies) has a token bucket per rate in
+API_THROTTLE_RATES: 'client' covers all of its API requests, and an entry
+named after a URL name covers just that route. A request takes its cost in
+tokens from both buckets; views price their requests with a throttle_cost
+attribute, a number or a function of the request, so a catalog-wide
+search or an unlimited list uses up a client's budget much faster than a
+detail page. Responses already in the response cache cost DEFAULT_COST,
+since they never reach the database. A client without enough tokens gets
+a 429 with Retry-After.
+
+A bucket is a single number in the cache, the time at which it will be
+full again (the "generic cell rate algorithm"): taking tokens moves that
+time forward, and it only needs reading and writing when a request
+arrives. With a shared cache (REDIS_URL) all workers draw from the same
+buckets. Reads and writes aren't atomic, so concurrent requests from one
+client in different workers can occasionally both be admitted on the last
+tokens; a limit is never exceeded by more than that.
+
+Load shedding: each worker counts its requests in flight and times its
+database queries. The load is the larger of in-flight requests over
+LOAD_SHED_MAX_IN_FLIGHT and the mean query time over the last
+LOAD_SHED_WINDOW_SECONDS over LOAD_SHED_DB_LATENCY_MS. Above 1 the most
+expensive requests are answered 503 with Retry-After, and the cut-off
+cost falls as the load rises: a request is shed when cost * load exceeds
+the cost of the most expensive route, MAX_COST. Cheap detail pages keep
+being served longest.
+"""
+from collections import deque
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_COST = 1
+# Searches and lists that read the whole catalog
+MAX_COST = 10
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """(tokens, seconds) of a DRF style rate such as '600/min'."""
+    tokens, period = rate.split('/')
+    return int(tokens), PERIODS[period[0]]
+
+
+def request_cost(view_class, request):
+    cost = getattr(view_class, 'throttle_cost', DEFAULT_COST)
+    return cost(request) if callable(cost) else cost
+
+
+def client_ident(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{BaseThrottle().get_ident(request)}'
+
+
+def bucket_key(scope, ident):
+    return f'throttle:{scope}:{ident}'
+
+
+def take(buckets, cost, now=None):
+    """
+    Take cost tokens from every bucket in {key: rate}, or from none of them.
+    Returns 0 when taken, otherwise the seconds until they would be.
+    """
+    now = time.time() if now is None else now
+    full_at = cache.get_many(list(buckets))
+    updated = {}
+    wait = 0
+    for key, (tokens, period) in buckets.items():
+        # A request costing more than a whole bucket would never get through
+        taken = min(cost, tokens) * period / tokens
+        updated[key] = max(full_at.get(key, now), now) + taken
+        wait = max(wait, updated[key] - now - period)
+    if wait > 0:
+        return wait
+    cache.set_many(updated, math.ceil(max(updated.values()) - now) + 1)
+    return 0
+
+
+class LoadMonitor:
+    """This worker's requests in flight and its recent database query times."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        # [second, total query seconds, queries] of the last window
+        self.seconds = deque()
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def record_query(self, duration):
+        second = int(time.monotonic())
+        with self.lock:
+            if self.seconds and self.seconds[-1][0] == second:
+                self.seconds[-1][1] += duration
+                self.seconds[-1][2] += 1
+            else:
+                self.seconds.append([second, duration, 1])
+                if len(self.seconds) > settings.LOAD_SHED_WINDOW_SECONDS:
+                    self.seconds.popleft()
+
+    def db_latency(self):
+        """Mean query seconds over the window, 0 without queries."""
+        since = time.monotonic() - settings.LOAD_SHED_WINDOW_SECONDS
+        with self.lock:
+            recent = [(total, count) for second, total, count in self.seconds if second >= since]
+        queries = sum(count for _, count in recent)
+        return sum(total for total, _ in recent) / queries if queries else 0.0
+
+    def load(self):
+        return max(
+            self.in_flight / settings.LOAD_SHED_MAX_IN_FLIGHT,
+            self.db_latency() * 1000 / settings.LOAD_SHED_DB_LATENCY_MS,
+        )
+
+
+monitor = LoadMonitor()
+
+
+def _time_query(execute, sql, params, many, context):
+    started = time.monotonic()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        monitor.record_query(time.monotonic() - started)
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_install_query_timer, dispatch_uid='movies.throttling.query_timer')
+
+
+def too_many_requests(wait):
+    retry_after = max(1, math.ceil(wait))
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {retry_after} seconds.'}, status=429
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def overloaded(load):
+    response = JsonResponse({'detail': 'The server is overloaded, try again later.'}, status=503)
+    # Busier servers ask clients to stay away longer
+    response['Retry-After'] = str(max(1, math.ceil(load)))
+    return response
+
+
+class ThrottleMiddleware:
+    """Shed load and apply the rate limits to /api/ requests."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        monitor.enter()
+        try:
+            return self.get_response(request)
+        finally:
+            monitor.leave()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not request.path.startswith('/api/'):
+            return None
+        cost = request_cost(getattr(view_func, 'view_class', None), request)
+
+        load = monitor.load()
+        if cost * load > MAX_COST:
+            return overloaded(load)
+
+        if not settings.API_THROTTLING:
+            return None
+        ident = client_ident(request)
+        rates = settings.API_THROTTLE_RATES
+        buckets = {bucket_key('client', ident): parse_rate(rates['client'])}
+        route = request.resolver_match.url_name
+        if route in rates:
+            buckets[bucket_key(route, ident)] = parse_rate(rates[route])
+        wait = take(buckets, cost)
+        if wait:
+            return too_many_requests(wait)
+        return None
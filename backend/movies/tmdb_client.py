@@ -0,0 +1,260 @@
+"""
+Latency-aware resilience for TMDB requests, used by tmdb_service.tmdb_get().
+
+Requests are grouped by endpoint, with ids collapsed ("/movie/{id}"), and
+each group keeps:
+
+- Latency tracking: the last LATENCY_SAMPLES successful request durations.
+- Hedging: once a group has enough samples, a request still running after
+  the group's TMDB_HEDGE_PERCENTILE latency gets a duplicate, and whichever
+  answers first wins. Slow outliers cost one extra request instead of the
+  full timeout.
+- A circuit breaker: TMDB_CIRCUIT_FAILURES failures (timeouts, connection
+  errors, 429s and 5xx) within TMDB_CIRCUIT_WINDOW_SECONDS open it, and
+  requests fail fast for TMDB_CIRCUIT_RESET_SECONDS. Then one trial request
+  is let through; it closes the circuit or opens it again.
+- Stale fallback: the last good payload of recent requests is kept in
+  process, and served when the circuit is open or the request fails.
+
+Every outcome is counted per endpoint (see metrics()) and logged.
+Point TMDB_BASE_URL at a local server to exercise these paths.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 200
+# Hedge only once the percentile is estimated from this many samples
+MIN_HEDGE_SAMPLES = 20
+MIN_HEDGE_DELAY = 0.05
+STALE_ENTRIES = 256
+WORKERS = 32
+
+# Metric names
+OK = 'ok'
+HEDGED = 'hedged'
+HEDGE_WON = 'hedge_won'
+NOT_FOUND = 'not_found'
+ERROR = 'error'
+SHORT_CIRCUITED = 'short_circuited'
+STALE = 'stale'
+CIRCUIT_OPENED = 'circuit_opened'
+
+
+class TMDBUnavailable(requests.RequestException):
+    """TMDB is failing and there is no earlier payload to fall back on."""
+
+
+def endpoint_group(endpoint):
+    return re.sub(r'/\d+', '/{id}', endpoint)
+
+
+def is_failure(error):
+    """Whether an error says TMDB is degraded, as opposed to a definitive answer like a 404."""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, requests.RequestException)
+
+
+class LatencyTracker:
+    def __init__(self):
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, percent, min_samples=1):
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.failures = deque()
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= settings.TMDB_CIRCUIT_RESET_SECONDS:
+                # Let one trial request through
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures.clear()
+
+    def record_failure(self):
+        """Returns True if this failure opened the circuit."""
+        now = time.monotonic()
+        with self.lock:
+            self.failures.append(now)
+            while self.failures and now - self.failures[0] > settings.TMDB_CIRCUIT_WINDOW_SECONDS:
+                self.failures.popleft()
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and len(self.failures) >= settings.TMDB_CIRCUIT_FAILURES
+            ):
+                self.state = self.OPEN
+                self.opened_at = now
+                return True
+            return False
+
+
+class Endpoint:
+    def __init__(self, name):
+        self.name = name
+        self.latency = LatencyTracker()
+        self.circuit = CircuitBreaker()
+
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='tmdb')
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+_stale = OrderedDict()
+_stale_lock = threading.Lock()
+
+
+def _endpoint(name):
+    with _endpoints_lock:
+        if name not in _endpoints:
+            _endpoints[name] = Endpoint(name)
+        return _endpoints[name]
+
+
+def _count(endpoint, metric):
+    with _metrics_lock:
+        _metrics[endpoint.name, metric] += 1
+    logger.debug('TMDB %s %s', endpoint.name, metric)
+
+
+def _remember(key, payload):
+    with _stale_lock:
+        _stale[key] = payload
+        _stale.move_to_end(key)
+        if len(_stale) > STALE_ENTRIES:
+            _stale.popitem(last=False)
+
+
+def _last_good(key):
+    with _stale_lock:
+        return _stale.get(key)
+
+
+def _request(endpoint, url, params, headers):
+    started = time.monotonic()
+    response = requests.get(url, params=params, headers=headers, timeout=settings.TMDB_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    payload = response.json()
+    endpoint.latency.record(time.monotonic() - started)
+    return payload
+
+
+def _hedged_request(endpoint, url, params, headers):
+    """Run the request, adding a duplicate if it outlives the endpoint's hedge percentile."""
+    first = _executor.submit(_request, endpoint, url, params, headers)
+    delay = endpoint.latency.percentile(settings.TMDB_HEDGE_PERCENTILE, MIN_HEDGE_SAMPLES)
+    pending = {first}
+    if delay is not None:
+        done, _ = wait(pending, timeout=max(delay, MIN_HEDGE_DELAY))
+        if not done:
+            _count(endpoint, HEDGED)
+            pending.add(_executor.submit(_request, endpoint, url, params, headers))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                payload = future.result()
+            except requests.RequestException as e:
+                if not is_failure(e):
+                    raise
+                error = e
+                continue
+            if future is not first:
+                _count(endpoint, HEDGE_WON)
+            return payload
+    raise error
+
+
+def get(endpoint_path, url, params, headers):
+    """GET a TMDB endpoint with hedging, circuit breaking and stale fallback."""
+    endpoint = _endpoint(endpoint_group(endpoint_path))
+    key = (url, tuple(sorted((str(k), str(v)) for k, v in params.items())))
+
+    if not endpoint.circuit.allow():
+        _count(endpoint, SHORT_CIRCUITED)
+        return _fall_back(endpoint, key, TMDBUnavailable(f'Circuit open for {endpoint.name}'))
+    try:
+        payload = _hedged_request(endpoint, url, params, headers)
+    except requests.RequestException as e:
+        if not is_failure(e):
+            # TMDB answered; 404s are expected when looking up ids
+            endpoint.circuit.record_success()
+            _count(endpoint, NOT_FOUND if e.response.status_code == 404 else ERROR)
+            raise
+        _count(endpoint, ERROR)
+        if endpoint.circuit.record_failure():
+            _count(endpoint, CIRCUIT_OPENED)
+            logger.warning('TMDB circuit opened for %s after %s', endpoint.name, e)
+        return _fall_back(endpoint, key, e)
+    except Exception:
+        # Anything else still ends a half-open trial, so the circuit can't stay stuck
+        _count(endpoint, ERROR)
+        if endpoint.circuit.record_failure():
+            _count(endpoint, CIRCUIT_OPENED)
+        raise
+
+    endpoint.circuit.record_success()
+    _count(endpoint, OK)
+    _remember(key, payload)
+    return payload
+
+
+def _fall_back(endpoint, key, error):
+    """The last good payload for this request, or raise error if there is none."""
+    payload = _last_good(key)
+    if payload is None:
+        raise error
+    _count(endpoint, STALE)
+    logger.info('Serving last good TMDB payload for %s', endpoint.name)
+    return payload
+
+
+def metrics():
+    """Per-endpoint counters and latency percentiles for this process."""
+    with _metrics_lock:
+        counts = dict(_metrics)
+    with _endpoints_lock:
+        endpoints = list(_endpoints.values())
+    return {
+        endpoint.name: {
+            'counts': {metric: n for (name, metric), n in counts.items() if name == endpoint.name},
+            'p50': endpoint.latency.percentile(50),
+            'p95': endpoint.latency.percentile(95),
+            'circuit': endpoint.circuit.state,
+        }
+        for endpoint in endpoints
+    }
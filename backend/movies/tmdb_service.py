@@ -1,7 +1,13 @@
+import gzip
+import json
 import os
 import requests
 
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
+from . import tmdb_client
+
+TMDB_BASE_URL = os.environ.get("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+# Daily ID exports, see https://developer.themoviedb.org/docs/daily-id-exports
+TMDB_EXPORTS_URL = os.environ.get("TMDB_EXPORTS_URL", "http://files.tmdb.org/p/exports")
 TMDB_BEARER_TOKEN = os.environ.get('TMDB_BEARER_TOKEN')
 
 def tmdb_get(endpoint, params=None):
@@ -12,9 +18,8 @@ def tmdb_get(endpoint, params=None):
         "Authorization": f"Bearer {TMDB_BEARER_TOKEN}",
         "accept": "application/json"
     }
-    response = requests.get(url, params=params, headers=headers, timeout=10)
-    response.raise_for_status()
-    return response.json()
+    # Hedged, circuit-broken and falling back to the last good payload
+    return tmdb_client.get(endpoint, url, params, headers)
 
 def get_popular_movies(page=1):
     return tmdb_get("/movie/popular", params={"page": page})
@@ -25,6 +30,26 @@ def get_movie_details(tmdb_id):
         "append_to_response": "credits,videos"
     })
 
+def daily_export_url(date):
+    """URL of the movie id export TMDB published on the given date."""
+    return f"{TMDB_EXPORTS_URL}/movie_ids_{date:%m_%d_%Y}.json.gz"
+
+def iter_daily_export(source):
+    """
+    Stream the entries of a daily movie id export, one dict per line, from
+    a URL or a local .json.gz file. Only one line is held in memory at a time.
+    """
+    if source.startswith(('http://', 'https://')):
+        response = requests.get(source, stream=True, timeout=30)
+        response.raise_for_status()
+        stream = gzip.GzipFile(fileobj=response.raw)
+    else:
+        stream = gzip.open(source, 'rb')
+    with stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
 def get_movie_credits(tmdb_id):
     return tmdb_get(f"/movie/{tmdb_id}/credits")
 
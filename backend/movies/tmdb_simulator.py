@@ -0,0 +1,420 @@
+"""
+A local stand-in for the TMDB API, for benchmarking and testing imports offline.
+
+It serves the endpoints tmdb_service uses from an in-memory corpus, either
+synthetic (generated from a seed, so every run serves the same movies) or
+recorded from the current catalog:
+
+    /movie/{id}                  with append_to_response=credits,videos
+    /movie/{id}/credits, /movie/{id}/videos
+    /movie/popular, /movie/top_rated, /movie/now_playing, /movie/upcoming
+    /discover/movie              with_genres, sort_by
+    /search/movie                query
+    /genre/movie/list
+    /p/exports/movie_ids_MM_DD_YYYY.json.gz   the daily id export
+
+Responses can be slowed down (a base latency with jitter, plus a share of
+slow outliers), fail with 5xx at a given rate, and are rate limited with a
+token bucket that answers 429 with Retry-After, like TMDB. Counts per
+endpoint and status are served at /__simulator__/stats.
+
+Start it with `manage.py tmdb_simulator` and point TMDB_BASE_URL (and
+TMDB_EXPORTS_URL) at it.
+"""
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 20
+MAX_PAGES = 500
+CAST_SIZE = 15
+TODAY = date(2025, 6, 1)
+
+GENRES = {
+    28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy', 80: 'Crime', 99: 'Documentary',
+    18: 'Drama', 10751: 'Family', 14: 'Fantasy', 36: 'History', 27: 'Horror', 10402: 'Music',
+    9648: 'Mystery', 10749: 'Romance', 878: 'Science Fiction', 10770: 'TV Movie', 53: 'Thriller',
+    10752: 'War', 37: 'Western',
+}
+# (original_language, production country, share of the synthetic corpus)
+LANGUAGES = [
+    ('en', 'US', 50), ('en', 'GB', 8), ('hi', 'IN', 12), ('ta', 'IN', 5), ('te', 'IN', 5),
+    ('ml', 'IN', 4), ('kn', 'IN', 2), ('ko', 'KR', 4), ('ja', 'JP', 4), ('fr', 'FR', 3), ('es', 'ES', 3),
+]
+COUNTRY_NAMES = {
+    'US': 'United States of America', 'GB': 'United Kingdom', 'IN': 'India', 'KR': 'South Korea',
+    'JP': 'Japan', 'FR': 'France', 'ES': 'Spain',
+}
+TITLE_WORDS = [
+    'Silent', 'Dark', 'Last', 'Hidden', 'Broken', 'Midnight', 'Crimson', 'Lost', 'Final', 'Cold',
+    'Witness', 'Shadow', 'Game', 'Code', 'Room', 'Road', 'Secret', 'Storm', 'Night', 'Trap',
+    'Mirror', 'Signal', 'Alibi', 'Motive', 'Escape', 'Protocol', 'Verdict', 'Echo', 'Cipher', 'Ransom',
+]
+FIRST_NAMES = [
+    'Aarav', 'Maya', 'Ravi', 'Priya', 'John', 'Emma', 'Lucas', 'Sofia', 'Arjun', 'Kavya',
+    'Daniel', 'Olivia', 'Vikram', 'Anjali', 'Hiro', 'Yuna', 'Pierre', 'Lea', 'Carlos', 'Elena',
+]
+LAST_NAMES = [
+    'Sharma', 'Nair', 'Reddy', 'Iyer', 'Smith', 'Johnson', 'Kim', 'Park', 'Tanaka', 'Dubois',
+    'Garcia', 'Lopez', 'Khan', 'Menon', 'Rao', 'Brown', 'Wilson', 'Martin', 'Sato', 'Patel',
+]
+CREW_JOBS = [('Director', 'Directing'), ('Screenplay', 'Writing'), ('Writer', 'Writing'), ('Producer', 'Production')]
+
+
+class Corpus:
+    """
+    Movies to serve. summaries are list-result dicts; details(tmdb_id)
+    returns the full /movie/{id} payload with credits and videos, or None.
+    """
+
+    def __init__(self, summaries, details):
+        self.summaries = summaries
+        self.details = details
+        released = [m for m in summaries if m['release_date'] and m['release_date'] <= TODAY.isoformat()]
+        self.lists = {
+            'popular': sorted(summaries, key=lambda m: -m['popularity']),
+            'top_rated': sorted(summaries, key=lambda m: (-m['vote_average'], -m['vote_count'])),
+            'now_playing': sorted(released, key=lambda m: m['release_date'], reverse=True),
+            'upcoming': sorted(
+                (m for m in summaries if m['release_date'] > TODAY.isoformat()), key=lambda m: m['release_date']
+            ),
+        }
+
+    def export_lines(self):
+        for movie in sorted(self.summaries, key=lambda m: m['id']):
+            yield json.dumps({
+                'adult': False, 'id': movie['id'], 'original_title': movie['original_title'],
+                'popularity': movie['popularity'], 'video': False,
+            })
+
+
+def synthetic_corpus(size=10000, seed=1):
+    """size generated movies, with ids spread out so some lookups miss. A seed always gives the same corpus."""
+    rng = random.Random(seed)
+    people = [
+        {'id': 100000 + i, 'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'}
+        for i in range(max(50, size // 2))
+    ]
+    languages, weights = [(lang, country) for lang, country, _ in LANGUAGES], [w for _, _, w in LANGUAGES]
+    summaries = []
+    for index in range(size):
+        language, country = rng.choices(languages, weights)[0]
+        title = ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 3)))
+        release = date(1970, 1, 1) + timedelta(days=rng.randint(0, (TODAY - date(1970, 1, 1)).days + 365))
+        summaries.append({
+            'adult': False,
+            'backdrop_path': f'/sim/backdrop/{index}.jpg',
+            'genre_ids': rng.sample(list(GENRES), rng.randint(1, 3)),
+            'id': 2 + index * 3,
+            'original_language': language,
+            'original_title': title,
+            'overview': f'{title}: a thriller from the simulator corpus.',
+            'popularity': round(rng.paretovariate(1.5), 3),
+            'poster_path': f'/sim/poster/{index}.jpg',
+            'release_date': release.isoformat(),
+            'title': title,
+            'video': False,
+            'vote_average': round(rng.uniform(3, 9.5), 1),
+            'vote_count': rng.randint(0, 20000),
+            '_country': country,
+        })
+
+    def details(tmdb_id):
+        index, offset = divmod(tmdb_id - 2, 3)
+        if offset or not 0 <= index < len(summaries):
+            return None
+        movie = summaries[index]
+        # Seeded per movie, so a payload is the same whichever order it is asked for in
+        movie_rng = random.Random(seed * 1000003 + tmdb_id)
+        cast = movie_rng.sample(people, min(CAST_SIZE, len(people)))
+        crew_people = movie_rng.sample(people, len(CREW_JOBS))
+        payload = {key: value for key, value in movie.items() if not key.startswith('_') and key != 'genre_ids'}
+        payload.update({
+            'genres': [{'id': genre, 'name': GENRES[genre]} for genre in movie['genre_ids']],
+            'production_countries': [{'iso_3166_1': movie['_country'], 'name': COUNTRY_NAMES[movie['_country']]}],
+            'runtime': movie_rng.randint(85, 170),
+            'status': 'Released' if movie['release_date'] <= TODAY.isoformat() else 'Post Production',
+            'credits': {
+                'cast': [
+                    {
+                        'id': person['id'], 'name': person['name'], 'character': f'Character {order + 1}',
+                        'order': order, 'profile_path': f"/sim/profile/{person['id']}.jpg",
+                        'known_for_department': 'Acting',
+                    }
+                    for order, person in enumerate(cast)
+                ],
+                'crew': [
+                    {
+                        'id': person['id'], 'name': person['name'], 'job': job, 'department': department,
+                        'profile_path': f"/sim/profile/{person['id']}.jpg",
+                    }
+                    for person, (job, department) in zip(crew_people, CREW_JOBS)
+                ],
+            },
+            'videos': {
+                'results': [
+                    {
+                        'key': f'sim{tmdb_id}v{n}', 'name': 'Official Trailer' if n == 0 else f'Clip {n}',
+                        'site': 'YouTube', 'type': 'Trailer' if n == 0 else 'Clip', 'official': True,
+                        'iso_639_1': movie['original_language'],
+                    }
+                    for n in range(movie_rng.randint(0, 3))
+                ],
+            },
+        })
+        return payload
+
+    return Corpus(summaries, details)
+
+
+def catalog_corpus():
+    """A corpus recorded from the movies, credits and videos in the catalog database."""
+    from .models import Movie, MovieCast, MovieCrew, Video
+
+    movies = {}
+    for movie in Movie.objects.values(
+        'id', 'tmdb_id', 'title', 'overview', 'poster_path', 'backdrop_path', 'release_date',
+        'popularity', 'rating', 'original_language', 'production_countries',
+    ).iterator():
+        movies[movie['id']] = {
+            'summary': {
+                'adult': False,
+                'backdrop_path': movie['backdrop_path'] or None,
+                'genre_ids': [],
+                'id': movie['tmdb_id'],
+                'original_language': movie['original_language'] or 'en',
+                'original_title': movie['title'],
+                'overview': movie['overview'],
+                'popularity': movie['popularity'],
+                'poster_path': movie['poster_path'] or None,
+                'release_date': movie['release_date'].isoformat() if movie['release_date'] else '',
+                'title': movie['title'],
+                'video': False,
+                'vote_average': movie['rating'],
+                'vote_count': 0,
+            },
+            'countries': [c for c in movie['production_countries'].split(',') if c],
+            'cast': [], 'crew': [], 'videos': [],
+        }
+    for row in MovieCast.objects.values(
+        'movie_id', 'character', 'order', 'person__tmdb_id', 'person__name', 'person__profile_path',
+    ).iterator():
+        movies[row['movie_id']]['cast'].append({
+            'id': row['person__tmdb_id'], 'name': row['person__name'], 'character': row['character'],
+            'order': row['order'], 'profile_path': row['person__profile_path'],
+        })
+    for row in MovieCrew.objects.values(
+        'movie_id', 'job', 'department', 'person__tmdb_id', 'person__name', 'person__profile_path',
+    ).iterator():
+        movies[row['movie_id']]['crew'].append({
+            'id': row['person__tmdb_id'], 'name': row['person__name'], 'job': row['job'],
+            'department': row['department'], 'profile_path': row['person__profile_path'],
+        })
+    for row in Video.objects.values('movie_id', 'key', 'name', 'site', 'type').iterator():
+        movies[row['movie_id']]['videos'].append({k: row[k] for k in ('key', 'name', 'site', 'type')})
+
+    by_tmdb_id = {movie['summary']['id']: movie for movie in movies.values()}
+
+    def details(tmdb_id):
+        movie = by_tmdb_id.get(tmdb_id)
+        if movie is None:
+            return None
+        payload = {key: value for key, value in movie['summary'].items() if key != 'genre_ids'}
+        payload.update({
+            'genres': [],
+            'production_countries': [{'iso_3166_1': c, 'name': COUNTRY_NAMES.get(c, c)} for c in movie['countries']],
+            'credits': {'cast': movie['cast'], 'crew': movie['crew']},
+            'videos': {'results': movie['videos']},
+        })
+        return payload
+
+    return Corpus([movie['summary'] for movie in movies.values()], details)
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    slow_rate: float = 0
+    slow_ms: float = 0
+    error_rate: float = 0
+    # Requests per second, None for no limit
+    rate_limit: float = None
+    seed: int = 1
+
+
+class TokenBucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Take a token; returns 0, or the seconds until one is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+def _page(results, params):
+    try:
+        page = max(1, min(int(params.get('page', 1)), MAX_PAGES))
+    except ValueError:
+        page = 1
+    total = len(results)
+    return {
+        'page': page,
+        'results': [
+            {key: value for key, value in movie.items() if not key.startswith('_')}
+            for movie in results[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        ],
+        'total_pages': min(MAX_PAGES, max(1, -(-total // PAGE_SIZE))),
+        'total_results': total,
+    }
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, corpus, faults=None):
+        super().__init__(address, SimulatorHandler)
+        self.corpus = corpus
+        self.faults = faults or Faults()
+        self.bucket = TokenBucket(self.faults.rate_limit) if self.faults.rate_limit else None
+        self.rng = random.Random(self.faults.seed)
+        self.rng_lock = threading.Lock()
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    def random(self):
+        with self.rng_lock:
+            return self.rng.random()
+
+    def count(self, endpoint, status):
+        with self.stats_lock:
+            self.stats[f'{endpoint} {status}'] += 1
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def not_found(self):
+        return 404, {'success': False, 'status_code': 34, 'status_message': 'The resource you requested could not be found.'}
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip('/') or '/'
+        if path.startswith('/3/'):
+            path = path[2:]
+        endpoint = re.sub(r'/\d+', '/{id}', path)
+
+        if path == '/__simulator__/stats':
+            with server.stats_lock:
+                return self.send_json(200, dict(server.stats))
+
+        if server.bucket:
+            wait = server.bucket.take()
+            if wait:
+                server.count(endpoint, 429)
+                return self.send_json(429, {
+                    'success': False, 'status_code': 25,
+                    'status_message': 'Your request count is over the allowed limit.',
+                }, {'Retry-After': str(max(1, round(wait)))})
+
+        faults = server.faults
+        delay = faults.latency_ms + faults.jitter_ms * (2 * server.random() - 1)
+        if faults.slow_rate and server.random() < faults.slow_rate:
+            delay = faults.slow_ms
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if faults.error_rate and server.random() < faults.error_rate:
+            server.count(endpoint, 503)
+            return self.send_json(503, {'success': False, 'status_code': 9, 'status_message': 'Service offline.'})
+
+        if path.startswith('/p/exports/') and path.endswith('.json.gz'):
+            data = gzip.compress('\n'.join(server.corpus.export_lines()).encode() + b'\n')
+            server.count('/p/exports', 200)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        status, body = self.route(path, params)
+        server.count(endpoint, status)
+        self.send_json(status, body)
+
+    def route(self, path, params):
+        corpus = self.server.corpus
+        match = re.fullmatch(r'/movie/(\d+)(/credits|/videos)?', path)
+        if match:
+            details = corpus.details(int(match.group(1)))
+            if details is None:
+                return self.not_found()
+            if match.group(2) == '/credits':
+                return 200, {'id': details['id'], **details['credits']}
+            if match.group(2) == '/videos':
+                return 200, {'id': details['id'], **details['videos']}
+            appended = set(params.get('append_to_response', '').split(','))
+            return 200, {
+                key: value for key, value in details.items()
+                if key not in ('credits', 'videos') or key in appended
+            }
+
+        match = re.fullmatch(r'/movie/(popular|top_rated|now_playing|upcoming)', path)
+        if match:
+            return 200, _page(corpus.lists[match.group(1)], params)
+
+        if path == '/discover/movie':
+            results = corpus.lists['popular']
+            if params.get('with_genres'):
+                genres = {int(g) for g in re.split('[,|]', params['with_genres']) if g.isdigit()}
+                results = [m for m in results if genres & set(m['genre_ids'])]
+            if params.get('sort_by') == 'vote_average.desc':
+                results = sorted(results, key=lambda m: -m['vote_average'])
+            return 200, _page(results, params)
+
+        if path == '/search/movie':
+            query = params.get('query', '').casefold()
+            if not query:
+                return 200, _page([], params)
+            results = [
+                m for m in corpus.lists['popular']
+                if query in m['title'].casefold() or query in m['original_title'].casefold()
+            ]
+            return 200, _page(results, params)
+
+        if path == '/genre/movie/list':
+            return 200, {'genres': [{'id': genre, 'name': name} for genre, name in GENRES.items()]}
+
+        return self.not_found()
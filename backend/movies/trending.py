@@ -0,0 +1,245 @@
+"""
+Trending movies from our own detail page views.
+
+Counting: every successful /api/movies/{tmdb_id}/ view increments an
+in-process counter. The counter is split into TRENDING_SHARDS shards, each
+with its own lock, so request threads rarely wait on each other.
+
+Merging: every TRENDING_MERGE_SECONDS a background thread drains the
+counters and, in one transaction, adds the counts to the hourly
+MovieViewBucket rows and to each movie's TrendingScore. Both are additive
+upserts, so any number of workers can merge at once. The WSGI/ASGI entry
+points start the thread with tracker.start(); elsewhere (tests, management
+commands) views are only counted until something calls tracker.merge().
+
+Scoring: a view at time t is worth 2^((t - epoch) / half-life) instead of
+decaying every stored score as time passes. All scores would decay by the
+same factor, so ranking by the stored values is the same as ranking by the
+decayed ones, and a merge only touches the movies it counted. When the
+weights grow too large the epoch moves forward and every score is scaled
+down once.
+
+Serving: the top TRENDING_SIZE movie ids are read with one indexed query
+after each merge and kept in the cache; sort=trending filters and cuts that
+list instead of sorting the catalog. Cached trending responses are keyed by
+ranking_period(), so a cache hit reads neither the ranking nor the database.
+"""
+from collections import Counter
+from datetime import timedelta
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CatalogState, Movie, MovieViewBucket, TrendingScore
+from .snapshot_files import bypass_snapshot
+
+logger = logging.getLogger(__name__)
+
+RANKING_KEY = 'trending-ranking'
+# Move the epoch once weights reach 2^REBASE_HALF_LIVES
+REBASE_HALF_LIVES = 64
+# Movies below the worth of this many fresh views are not trending
+MIN_SCORE = 0.1
+
+
+class ShardedCounter:
+    """Counts keyed by TMDB id, spread over shards with a lock each."""
+
+    def __init__(self, shards):
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.shards = [Counter() for _ in range(shards)]
+
+    def add(self, key, count=1):
+        i = hash(key) % len(self.shards)
+        with self.locks[i]:
+            self.shards[i][key] += count
+
+    def drain(self):
+        """Return and reset the counts of every shard."""
+        total = Counter()
+        for i, lock in enumerate(self.locks):
+            with lock:
+                counts, self.shards[i] = self.shards[i], Counter()
+            total.update(counts)
+        return total
+
+
+def half_life():
+    return timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def weight(moment, epoch):
+    """What one view at moment is worth relative to epoch."""
+    return 2.0 ** ((moment - epoch) / half_life())
+
+
+def current_hour():
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def _epoch_for_update(now):
+    """Lock the state row and return the scores' epoch, moving it forward if it is too old."""
+    CatalogState.objects.get_or_create(pk=1)
+    state = CatalogState.objects.select_for_update().get(pk=1)
+    epoch = state.trending_epoch
+    if epoch is None:
+        epoch = now
+    elif now - epoch > half_life() * REBASE_HALF_LIVES:
+        TrendingScore.objects.update(score=F('score') / weight(now, epoch))
+        epoch = now
+        logger.info('Moved the trending epoch to %s', epoch)
+    else:
+        return epoch
+    CatalogState.objects.filter(pk=1).update(trending_epoch=epoch)
+    return epoch
+
+
+def _upsert(model, conflict, rows, increment):
+    """INSERT rows, adding the increment column to existing rows on conflict."""
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = [*conflict, increment]
+    sql = (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({", ".join(conflict)}) DO UPDATE SET {increment} = {table}.{increment} + excluded.{increment}'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def merge_views(views):
+    """Add {tmdb_id: count} to the hourly buckets and trending scores."""
+    movie_ids = dict(Movie.objects.filter(tmdb_id__in=list(views)).values_list('tmdb_id', 'id'))
+    if not movie_ids:
+        return
+    hour = current_hour()
+    with transaction.atomic():
+        epoch = _epoch_for_update(hour)
+        worth = weight(hour, epoch)
+        _upsert(
+            MovieViewBucket, ['movie_id', 'hour'],
+            [(movie_ids[t], connection.ops.adapt_datetimefield_value(hour), n)
+             for t, n in views.items() if t in movie_ids],
+            'views',
+        )
+        _upsert(
+            TrendingScore, ['movie_id'],
+            [(movie_ids[t], n * worth) for t, n in views.items() if t in movie_ids],
+            'score',
+        )
+
+
+def compute_ranking():
+    """The TRENDING_SIZE highest scoring movie ids, best first."""
+    epoch = CatalogState.objects.filter(pk=1).values_list('trending_epoch', flat=True).first()
+    if epoch is None:
+        return []
+    threshold = MIN_SCORE * weight(timezone.now(), epoch)
+    return list(
+        TrendingScore.objects.filter(score__gte=threshold)
+        .order_by('-score').values_list('movie_id', flat=True)[:settings.TRENDING_SIZE]
+    )
+
+
+def refresh_ranking():
+    ranking = compute_ranking()
+    cache.set(RANKING_KEY, ranking, settings.TRENDING_MERGE_SECONDS)
+    return ranking
+
+
+def ranking_period():
+    """The TRENDING_MERGE_SECONDS interval now falls in, which a ranking is cached for at most."""
+    return int(time.time() // settings.TRENDING_MERGE_SECONDS)
+
+
+def ranking():
+    """Ids of the current ranking, recomputed when the cached one expired."""
+    current = cache.get(RANKING_KEY)
+    if current is None:
+        # Scores live only in the primary database, not in snapshot files
+        with bypass_snapshot():
+            current = refresh_ranking()
+    return current
+
+
+def rank(queryset, limit=None):
+    """Ids of the trending movies in queryset, best first, cut to limit."""
+    ids = ranking()
+    matching = set(queryset.filter(id__in=ids).values_list('id', flat=True))
+    ranked = [pk for pk in ids if pk in matching]
+    return ranked[:limit] if limit else ranked
+
+
+class ViewTracker:
+    """This process's view counter and the thread that merges it."""
+
+    def __init__(self):
+        self.counter = ShardedCounter(settings.TRENDING_SHARDS)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the merge thread, and merge what is left at exit.
+        Called once per worker process from the WSGI/ASGI entry points.
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='trending-merge', daemon=True)
+                self.thread.start()
+                atexit.register(self.merge)
+
+    def record(self, tmdb_id):
+        self.counter.add(tmdb_id)
+
+    def merge(self):
+        """Merge the counted views into the database. Returns how many were merged."""
+        views = self.counter.drain()
+        if not views:
+            return 0
+        merge_views(views)
+        refresh_ranking()
+        return sum(views.values())
+
+    def _run(self):
+        while True:
+            time.sleep(settings.TRENDING_MERGE_SECONDS)
+            try:
+                self.merge()
+            except Exception:
+                logger.exception('Could not merge view counts')
+            finally:
+                close_old_connections()
+
+
+tracker = ViewTracker()
+
+
+def rebuild_scores(now=None):
+    """
+    Recompute every trending score from the hourly buckets and delete buckets
+    older than TRENDING_BUCKET_RETENTION_DAYS. Returns (movies, deleted buckets).
+    """
+    now = now or current_hour()
+    deleted, _ = MovieViewBucket.objects.filter(
+        hour__lt=now - timedelta(days=settings.TRENDING_BUCKET_RETENTION_DAYS)
+    ).delete()
+    scores = Counter()
+    for movie_id, hour, views in MovieViewBucket.objects.values_list('movie_id', 'hour', 'views').iterator():
+        scores[movie_id] += views * weight(hour, now)
+    with transaction.atomic():
+        CatalogState.objects.get_or_create(pk=1)
+        CatalogState.objects.filter(pk=1).update(trending_epoch=now)
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(
+            [TrendingScore(movie_id=movie_id, score=score) for movie_id, score in scores.items()],
+            batch_size=1000,
+        )
+    refresh_ranking()
+    return len(scores), deleted
@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import MovieListAPIView, MovieDetailAPIView, IndustryMoviesAPIView
+from .views import (
+    MovieListAPIView, MovieFacetsAPIView, MovieDetailAPIView, MovieUserRatingsAPIView, IndustryMoviesAPIView
+)
 
 urlpatterns = [
     path('', MovieListAPIView.as_view(), name='movie-list'),
+    path('facets/', MovieFacetsAPIView.as_view(), name='movie-facets'),
+    path('user-ratings/', MovieUserRatingsAPIView.as_view(), name='movie-user-ratings'),
     path('<int:tmdb_id>/', MovieDetailAPIView.as_view(), name='movie-detail'),
     path('industry/<str:industry_name>/', IndustryMoviesAPIView.as_view(), name='industry-movies'),
 ]
@@ -1,87 +1,330 @@
 from django.shortcuts import render
 from rest_framework import generics
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
-from .models import Movie, Industry
-from .serializers import MovieSerializer
+from django.http import Http404
+from django.utils.http import urlencode
+from . import trending
+from .autocomplete import autocomplete_index
+from .catalog import get_catalog_version
+from .columnar import SORT_KEYS, catalog_columns, columnar_enabled
+from .curation import cached_rail
+from .facets import compute_facets
+from .fetch_through import FOUND, PENDING, UNAVAILABLE, fetch_through, fetch_through_enabled
+from .filters import (
+    MovieListParamsSerializer, compiled_sql, filter_movies, industry_id_for, page_bounds, sort_movies
+)
+from .fuzzy import fuzzy_search_movies, fuzzy_search_people
+from .models import Movie, Industry, Person
+from .replicas import primary_reads, serve_from_replica
+from .response_cache import CachedResponseMixin, is_warming
+from .serializers import (
+    MovieSerializer, MovieSummarySerializer, MovieUserRatingsParamsSerializer, MovieUserRatingsSerializer,
+    PersonListSerializer, PersonDetailSerializer
+)
+from .snapshot_files import bypass_snapshot, serve_from_snapshot
+from .throttling import DEFAULT_COST, MAX_COST
 
 # Create your views here.
 
-class MovieListAPIView(generics.ListAPIView):
+# Query parameters that change facet counts
+FACET_PARAMS = ('search', 'fuzzy', 'industry', 'year', 'min_rating')
+
+class CatalogReadMixin:
+    """
+    Serve the request from the current catalog snapshot file when snapshot
+    reads are on, otherwise from a healthy read replica if any are configured.
+    Responses rendered to warm the cache for an unpublished catalog version
+    read the primary database, the only one that has it yet, and so do
+    requests for which reads_primary() is true.
+    """
+
+    def reads_primary(self, request):
+        return False
+
+    def dispatch(self, request, *args, **kwargs):
+        if is_warming() or self.reads_primary(request):
+            with bypass_snapshot(), primary_reads():
+                return super().dispatch(request, *args, **kwargs)
+        with serve_from_snapshot(), serve_from_replica(request):
+            return super().dispatch(request, *args, **kwargs)
+
+class MovieListAPIView(CachedResponseMixin, CatalogReadMixin, generics.ListAPIView):
     serializer_class = MovieSerializer
 
+    @classmethod
+    def throttle_cost(cls, request):
+        # Cached responses cost no more than a detail page, whatever they hold
+        cached = cls.cached_entry(request)
+        if cached is not None and cached[1] is not None:
+            return DEFAULT_COST
+        # Searches and full pages of MAX_LIMIT movies cost the most (see movies/throttling.py)
+        if request.GET.get('search') or not request.GET.get('limit'):
+            return MAX_COST
+        return 2
+
+    @staticmethod
+    def uses_user_ratings(request):
+        return request.GET.get('sort') == 'user_rating' or 'min_user_rating' in request.GET
+
+    def is_cacheable(self, request):
+        # Free-text searches rarely repeat, and user ratings change between catalog versions
+        return not (request.GET.get('search') or self.uses_user_ratings(request))
+
+    def reads_primary(self, request):
+        # Snapshots and replicas hold user ratings as of their catalog version
+        return self.uses_user_ratings(request)
+
+    def get_cache_variant(self, request):
+        # Trending results change with every merged ranking, not with the catalog
+        if request.GET.get('sort') == 'trending':
+            return 'trending-{}'.format(trending.ranking_period())
+        return ''
+
+    def get_params(self):
+        """Validated query parameters; invalid ones raise a 400."""
+        if not hasattr(self, '_params'):
+            serializer = MovieListParamsSerializer(data=self.request.query_params)
+            serializer.is_valid(raise_exception=True)
+            self._params = serializer.validated_data
+        return self._params
+
+    def get_serializer_class(self):
+        # ?summary=1 returns card fields only, read from the movie table alone
+        if self.get_params()['summary']:
+            return MovieSummarySerializer
+        return MovieSerializer
+
+    def filter_search(self, queryset):
+        """
+        Apply the search parameter. Returns the queryset and whether the
+        typo-tolerant fallback was used.
+        """
+        # Person names are matched through the denormalized credit_names
+        # column, so no join (and no DISTINCT) is needed.
+        params = self.get_params()
+        search_query = params.get('search')
+        if not search_query:
+            return queryset, False
+
+        matches = self.match_search(queryset, search_query)
+        # Fall back to typo-tolerant matching when nothing matches exactly,
+        # or always with ?fuzzy=1
+        if params['fuzzy'] or not matches.exists():
+            return fuzzy_search_movies(queryset, search_query), True
+        return matches, False
+
+    @staticmethod
+    def match_search(queryset, search_query):
+        """Movies whose title, overview or credited names contain the query."""
+        return queryset.filter(
+            Q(title__icontains=search_query) |
+            Q(overview__icontains=search_query) |
+            Q(credit_names__icontains=search_query)
+        )
+
+    def get_columnar_ids(self):
+        """
+        Ids of the requested page from the in-memory columnar index, or None
+        when the request should go to the database. Searches are not
+        answered from the index.
+        """
+        params = self.get_params()
+        if not columnar_enabled() or params.get('search'):
+            return None
+        if params.get('sort', 'popularity') not in SORT_KEYS or params.get('min_user_rating') is not None:
+            # Trending and user ratings are not in the index
+            return None
+        return catalog_columns.get().query(params)
+
     def get_queryset(self):
-        queryset = Movie.objects.all().prefetch_related(
-            'cast', 'crew', 'videos'
-        ).select_related('industry')
+        params = self.get_params()
+        queryset = Movie.objects.all().select_related('industry')
+        if not params['summary']:
+            queryset = queryset.prefetch_related('cast__person', 'crew__person', 'videos')
 
-        # Search filter
-        search_query = self.request.query_params.get('search', None)
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(overview__icontains=search_query) |
-                Q(cast__person__name__icontains=search_query) |
-                Q(crew__person__name__icontains=search_query)
-            ).distinct()
-
-        # Industry filter
-        industry = self.request.query_params.get('industry', None)
-        if industry:
-            queryset = queryset.filter(industry__name__iexact=industry)
-
-        # Year filter
-        year = self.request.query_params.get('year', None)
-        if year:
-            if '-' in year:  # Range like 2010-2019
-                start_year, end_year = year.split('-')
-                queryset = queryset.filter(
-                    release_date__year__gte=start_year,
-                    release_date__year__lte=end_year
-                )
-            else:
-                queryset = queryset.filter(release_date__year=year)
-
-        # Minimum rating filter
-        min_rating = self.request.query_params.get('min_rating', None)
-        if min_rating:
-            queryset = queryset.filter(rating__gte=float(min_rating))
-
-        # Sort
-        sort = self.request.query_params.get('sort', 'popularity')
-        sort_mapping = {
-            'popularity': '-popularity',
-            'rating': '-rating',
-            'release_date': '-release_date',
-            'title': 'title',
-            'top_rated': ('-rating', '-popularity', '-release_date'),  # Sort by rating, then popularity, then newest
-        }
-        
-        sort_field = sort_mapping.get(sort, '-popularity')
-        if isinstance(sort_field, tuple):
-            queryset = queryset.order_by(*sort_field)
+        if params.get('sort') == 'trending':
+            # Filter and cut the precomputed ranking of movies/trending.py
+            matches, _ = self.filter_search(Movie.objects.all())
+            start, end = page_bounds(params)
+            self.page_ids = trending.rank(filter_movies(matches, params), end)[start:]
         else:
-            queryset = queryset.order_by(sort_field)
+            self.page_ids = self.get_columnar_ids()
+        if self.page_ids is not None:
+            # Hydrate just this page; list() restores the index's order
+            return queryset.filter(id__in=self.page_ids)
+
+        queryset, fuzzy = self.filter_search(queryset)
+        queryset = filter_movies(queryset, params)
+
+        # Fuzzy results keep their similarity order unless a sort is given
+        sort = params.get('sort', None if fuzzy else 'popularity')
+        if sort is not None:
+            queryset = sort_movies(queryset, sort)
+
+        start, end = page_bounds(params)
+        return queryset[start:end]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        movies = queryset
+        if self.page_ids is not None:
+            position = {pk: i for i, pk in enumerate(self.page_ids)}
+            movies = sorted(queryset, key=lambda movie: position[movie.id])
+        serializer = self.get_serializer(movies, many=True)
+        response = Response(serializer.data)
+        # Only on responses that aren't cached, so a cache hit and a miss look the same
+        if settings.API_COMPILED_SQL_HEADER and self.cached_entry(request._request) is None:
+            response['X-Compiled-SQL'] = compiled_sql(queryset)
+        return response
 
-        # Limit results if specified
-        limit = self.request.query_params.get('limit', None)
-        if limit:
-            queryset = queryset[:int(limit)]
+class MovieFacetsAPIView(MovieListAPIView):
+    """
+    Facet counts for the /api/movies/ filters, computed in one grouped query
+    and cached per catalog version.
+    """
+    cache_timeout = 60 * 60 * 24
 
-        return queryset
+    @staticmethod
+    def throttle_cost(request):
+        # Counts without a search are cached per catalog version
+        return MAX_COST if request.GET.get('search') else 2
 
-class MovieDetailAPIView(generics.RetrieveAPIView):
+    def get(self, request, *args, **kwargs):
+        params = self.get_params()
+        cache_key = 'movie-facets:{}:{}'.format(
+            get_catalog_version(),
+            urlencode(sorted((key, str(params.get(key, ''))) for key in FACET_PARAMS)),
+        )
+        data = cache.get(cache_key)
+        if data is None:
+            industry_id = None
+            if params.get('industry'):
+                # -1 matches no industry, like the list endpoint's empty result
+                industry_id = industry_id_for(params['industry']) or -1
+            queryset, _ = self.filter_search(Movie.objects.all())
+            data = compute_facets(
+                queryset,
+                industry_id=industry_id,
+                year_range=params.get('year'),
+                min_rating=params.get('min_rating'),
+            )
+            cache.set(cache_key, data, self.cache_timeout)
+        return Response(data)
+
+class MovieDetailAPIView(CachedResponseMixin, CatalogReadMixin, generics.RetrieveAPIView):
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
     lookup_field = 'tmdb_id'
 
-class IndustryMoviesAPIView(generics.ListAPIView):
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        # Count views for trending, including ones served from the cache
+        if request.method == 'GET' and response.status_code == 200 and not is_warming():
+            trending.tracker.record(kwargs['tmdb_id'])
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if not fetch_through_enabled():
+                raise
+
+        # Not in the catalog (or not yet on this replica): import it from TMDB
+        tmdb_id = kwargs['tmdb_id']
+        status = fetch_through(tmdb_id)
+        if status == FOUND:
+            with bypass_snapshot(), primary_reads():
+                return super().retrieve(request, *args, **kwargs)
+        if status == PENDING:
+            response = Response({'tmdb_id': tmdb_id, 'status': PENDING}, status=202)
+            response['Retry-After'] = '1'
+            return response
+        if status == UNAVAILABLE:
+            return Response({'detail': 'TMDB is unavailable, try again later.'}, status=503)
+        raise Http404
+
+class MovieUserRatingsAPIView(APIView):
+    """
+    Our users' rating aggregates of up to 100 movies, ?tmdb_id=1&tmdb_id=2.
+    They change with every rating, so they are left out of the cached movie
+    payloads and read here from the primary database, uncached.
+    """
+
+    def get(self, request):
+        params = MovieUserRatingsParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        movies = Movie.objects.filter(tmdb_id__in=params.validated_data['tmdb_id']).order_by('tmdb_id')
+        return Response({'results': MovieUserRatingsSerializer(movies, many=True).data})
+
+class IndustryMoviesAPIView(CatalogReadMixin, generics.ListAPIView):
     serializer_class = MovieSerializer
+    # Every movie of the industry, unpaginated
+    throttle_cost = MAX_COST
 
     def get_queryset(self):
-        industry_name = self.kwargs.get('industry_name')
+        industry_id = industry_id_for(self.kwargs.get('industry_name'))
+        if industry_id is None:
+            return Movie.objects.none()
         return Movie.objects.filter(
-            industry__name__iexact=industry_name
+            industry_id=industry_id
         ).prefetch_related(
-            'cast', 'crew', 'videos'
+            'cast__person', 'crew__person', 'videos'
         ).select_related('industry')
+
+class PersonListAPIView(CatalogReadMixin, generics.ListAPIView):
+    serializer_class = PersonListSerializer
+    default_limit = 20
+    max_limit = 50
+
+    @staticmethod
+    def throttle_cost(request):
+        return 3 if request.GET.get('search') else 1
+
+    def get_queryset(self):
+        search_query = self.request.query_params.get('search', '').strip()
+        if search_query:
+            queryset = Person.search(search_query).order_by('-credit_count', 'search_name')
+            if not queryset.exists():
+                queryset = fuzzy_search_people(Person.objects.all(), search_query)
+        else:
+            queryset = Person.objects.order_by('-credit_count', 'search_name')
+
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, self.max_limit))
+
+        return queryset[:limit]
+
+class PersonDetailAPIView(CatalogReadMixin, generics.RetrieveAPIView):
+    queryset = Person.objects.all()
+    serializer_class = PersonDetailSerializer
+    lookup_field = 'tmdb_id'
+
+class AutocompleteAPIView(APIView):
+    """Typeahead suggestions served from the in-process prefix index, without database queries."""
+    default_limit = 8
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        results = autocomplete_index.get().search(query, limit=max(1, limit))
+        return Response({'query': query, 'results': results})
+
+class CollectionDetailAPIView(CatalogReadMixin, APIView):
+    """A curated collection and its movies in order, precomputed per catalog version."""
+
+    def get(self, request, slug):
+        data = cached_rail(slug)
+        if data is None:
+            raise Http404
+        return Response(data)
@@ -0,0 +1,95 @@
+"""
+Warming the response cache for a new catalog version before it goes live.
+
+With CATALOG_WARMING on, bump_catalog_version() first renders the requests
+the frontend makes on its landing page, plus the detail pages of the most
+popular movies, for the version it is about to publish. They go through the
+real views, CATALOG_WARMING_CONCURRENCY at a time, and land in the response
+cache under the new version's keys (see movies/response_cache.py). Only then
+is the version bumped, so the first visitors after an import hit a warm
+cache instead of all rendering the same pages at once.
+
+Warming only helps API workers that share the cache with the process
+running the import, so it is on by default only with REDIS_URL set.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve
+
+from . import catalog
+from .models import Movie
+from .response_cache import warming
+
+logger = logging.getLogger(__name__)
+
+# What the landing page requests: the hero and each rail (frontend/app/page.tsx)
+FRONTEND_REQUESTS = [
+    '/api/movies/?sort=top_rated&min_rating=8&limit=1',
+    '/api/movies/?sort=popularity&min_rating=7&limit=15',
+    '/api/movies/?industry=hollywood',
+    '/api/movies/?industry=bollywood',
+    '/api/movies/?industry=south%20indian',
+    '/api/movies/?sort=top_rated&min_rating=8.5&limit=15',
+]
+
+
+def warming_enabled():
+    return getattr(settings, 'CATALOG_WARMING', False)
+
+
+def warm_paths(top_details=None):
+    """The request paths to warm: the landing page, then the most popular detail pages."""
+    if top_details is None:
+        top_details = settings.CATALOG_WARMING_TOP_DETAILS
+    tmdb_ids = Movie.objects.order_by('-popularity').values_list('tmdb_id', flat=True)[:top_details]
+    return FRONTEND_REQUESTS + [f'/api/movies/{tmdb_id}/' for tmdb_id in tmdb_ids]
+
+
+def _render(version, path):
+    """Request path through its view, caching the response under version. Returns the status code."""
+    request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip')
+    match = resolve(urlsplit(path).path)
+    try:
+        with warming(version):
+            return match.func(request, *match.args, **match.kwargs).status_code
+    finally:
+        connections.close_all()
+
+
+def warm_version(version, concurrency=None, top_details=None):
+    """
+    Fill the response cache for a catalog version from the primary database.
+    Returns (warmed, failed) request counts.
+    """
+    started = time.monotonic()
+    # In-process snapshots (industry ids, the columnar index) may predate the import
+    for snapshot in catalog._snapshots:
+        if snapshot.value is not None:
+            snapshot.refresh(version)
+
+    paths = warm_paths(top_details)
+    warmed = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency or settings.CATALOG_WARMING_CONCURRENCY) as executor:
+        futures = {path: executor.submit(_render, version, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                status = future.result()
+            except Exception:
+                logger.exception('Could not warm %s', path)
+                status = None
+            if status == 200:
+                warmed += 1
+            else:
+                failed += 1
+                logger.warning('Warming %s returned %s', path, status)
+    logger.info(
+        'Warmed %s responses for catalog version %s in %.0f ms (%s failed)',
+        warmed, version, (time.monotonic() - started) * 1000, failed
+    )
+    return warmed, failed
@@ -61,6 +61,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "movies.replicas.ReadYourWritesMiddleware",
+    "movies.throttling.ThrottleMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -97,6 +99,28 @@ DATABASES = {
     }
 }
 
+# Read replicas for the catalog API (see movies/replicas.py)
+# DATABASE_REPLICAS is a comma-separated list of SQLite files, each
+# optionally followed by =weight, e.g. "replica1.sqlite3=3,replica2.sqlite3".
+# Postgres replicas can be added to DATABASES and DATABASE_REPLICAS directly.
+DATABASE_REPLICAS = {}
+for index, entry in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), start=1):
+    replica_path, _, weight = entry.strip().partition('=')
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / replica_path,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+
+# A replica is skipped while it lags the primary by more than this, or is
+# missing a catalog version the primary has
+DATABASE_REPLICA_MAX_LAG_SECONDS = int(os.environ.get('DATABASE_REPLICA_MAX_LAG_SECONDS', 10))
+DATABASE_REPLICA_CHECK_SECONDS = int(os.environ.get('DATABASE_REPLICA_CHECK_SECONDS', 5))
+# After a client writes, its reads stay on the primary this long
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -156,9 +180,134 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For.
+    # Throttling keys anonymous clients on the address the last of them saw;
+    # with none it's REMOTE_ADDR, as any client can send the header itself.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Cache
+# Local memory by default; set REDIS_URL (requires the redis package) to
+# share cached responses and counters between workers
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Catalog snapshots
+# How often each worker checks whether the catalog version changed and
+# rebuilds its in-process indexes (see movies/catalog.py)
+CATALOG_VERSION_POLL_SECONDS = int(os.environ.get('CATALOG_VERSION_POLL_SECONDS', 5))
+
+# Answer /api/movies/ filter and sort requests from an in-memory NumPy
+# snapshot of the catalog instead of SQL (see movies/columnar.py)
+COLUMNAR_CATALOG_INDEX = os.environ.get('COLUMNAR_CATALOG_INDEX', '').lower() in ('1', 'true')
+
+# Catalog snapshot files (see movies/snapshot_files.py)
+# export_catalog_snapshot writes to CATALOG_SNAPSHOT_DIR. With
+# CATALOG_SNAPSHOT_READS on, the movie and people read endpoints serve from
+# the newest published file there while writes stay on the primary database.
+CATALOG_SNAPSHOT_DIR = Path(os.environ.get('CATALOG_SNAPSHOT_DIR', BASE_DIR / 'snapshots'))
+CATALOG_SNAPSHOT_READS = os.environ.get('CATALOG_SNAPSHOT_READS', '').lower() in ('1', 'true')
+DATABASE_ROUTERS = ['movies.snapshot_files.SnapshotRouter', 'movies.replicas.ReplicaRouter']
+
+# Response cache and warming (see movies/response_cache.py, movies/warming.py)
+# Movie list and detail responses are cached per catalog version, with a
+# gzip copy; 0 turns the cache off. With CATALOG_WARMING on, every catalog
+# version bump first renders the landing page requests and the detail pages
+# of the CATALOG_WARMING_TOP_DETAILS most popular movies into the cache.
+# Warming only reaches other workers through a shared cache (REDIS_URL).
+RESPONSE_CACHE_SECONDS = int(os.environ.get('RESPONSE_CACHE_SECONDS', 60 * 60))
+# Send the SQL of /api/movies/ queries in an X-Compiled-SQL header, on
+# responses that bypass the response cache
+API_COMPILED_SQL_HEADER = os.environ.get('API_COMPILED_SQL_HEADER', '').lower() in ('1', 'true')
+CATALOG_WARMING = os.environ.get(
+    'CATALOG_WARMING', 'true' if os.environ.get('REDIS_URL') else ''
+).lower() in ('1', 'true')
+CATALOG_WARMING_CONCURRENCY = int(os.environ.get('CATALOG_WARMING_CONCURRENCY', 4))
+CATALOG_WARMING_TOP_DETAILS = int(os.environ.get('CATALOG_WARMING_TOP_DETAILS', 100))
+
+# TMDB client resilience (see movies/tmdb_client.py)
+TMDB_TIMEOUT_SECONDS = float(os.environ.get('TMDB_TIMEOUT_SECONDS', 10))
+# A request still running after this percentile of its endpoint's recent
+# latencies is duplicated, and the first answer wins
+TMDB_HEDGE_PERCENTILE = int(os.environ.get('TMDB_HEDGE_PERCENTILE', 95))
+# This many failures within the window open an endpoint's circuit for
+# TMDB_CIRCUIT_RESET_SECONDS
+TMDB_CIRCUIT_FAILURES = int(os.environ.get('TMDB_CIRCUIT_FAILURES', 5))
+TMDB_CIRCUIT_WINDOW_SECONDS = int(os.environ.get('TMDB_CIRCUIT_WINDOW_SECONDS', 30))
+TMDB_CIRCUIT_RESET_SECONDS = int(os.environ.get('TMDB_CIRCUIT_RESET_SECONDS', 30))
+
+# Fetch-through for movie details (see movies/fetch_through.py)
+# With TMDB_FETCH_THROUGH on, /api/movies/{tmdb_id}/ imports a movie missing
+# from the catalog from TMDB. Requests wait at most the budget and then get
+# a 202 while the import finishes in the background. Ids TMDB doesn't know
+# are remembered for TMDB_FETCH_THROUGH_MISSING_SECONDS.
+TMDB_FETCH_THROUGH = os.environ.get('TMDB_FETCH_THROUGH', '').lower() in ('1', 'true')
+TMDB_FETCH_THROUGH_BUDGET_SECONDS = float(os.environ.get('TMDB_FETCH_THROUGH_BUDGET_SECONDS', 2))
+TMDB_FETCH_THROUGH_MISSING_SECONDS = int(os.environ.get('TMDB_FETCH_THROUGH_MISSING_SECONDS', 60 * 60 * 6))
+
+# Trending (see movies/trending.py)
+# Movie detail views are counted in memory and merged into hourly buckets
+# and decayed scores every TRENDING_MERGE_SECONDS. A view's weight halves
+# every TRENDING_HALF_LIFE_HOURS; sort=trending ranks the top TRENDING_SIZE.
+TRENDING_MERGE_SECONDS = int(os.environ.get('TRENDING_MERGE_SECONDS', 60))
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+TRENDING_SIZE = int(os.environ.get('TRENDING_SIZE', 500))
+TRENDING_SHARDS = int(os.environ.get('TRENDING_SHARDS', 16))
+TRENDING_BUCKET_RETENTION_DAYS = int(os.environ.get('TRENDING_BUCKET_RETENTION_DAYS', 30))
+
+# Watch progress (see users/progress.py)
+# Player heartbeats are buffered per process and upserted in batches every
+# WATCH_PROGRESS_FLUSH_SECONDS, or sooner once WATCH_PROGRESS_BUFFER_MAX
+# movies are pending. Continue watching lists are cached per user.
+WATCH_PROGRESS_FLUSH_SECONDS = float(os.environ.get('WATCH_PROGRESS_FLUSH_SECONDS', 5))
+WATCH_PROGRESS_BUFFER_MAX = int(os.environ.get('WATCH_PROGRESS_BUFFER_MAX', 5000))
+CONTINUE_WATCHING_LIMIT = int(os.environ.get('CONTINUE_WATCHING_LIMIT', 20))
+CONTINUE_WATCHING_CACHE_SECONDS = int(os.environ.get('CONTINUE_WATCHING_CACHE_SECONDS', 60 * 60 * 24))
+
+# User ratings (see users/ratings.py)
+# Movie.user_rating adds this many votes of the prior mean to the real ones;
+# run reconcile_user_ratings after changing them
+USER_RATING_PRIOR_VOTES = int(os.environ.get('USER_RATING_PRIOR_VOTES', 5))
+USER_RATING_PRIOR_MEAN = float(os.environ.get('USER_RATING_PRIOR_MEAN', 6.5))
+
+# Recommendations (see users/recommendations.py)
+# compute_recommendations stores this many movies per user, scoring users in
+# batches of RECOMMENDATION_BATCH_SIZE
+RECOMMENDATIONS_PER_USER = int(os.environ.get('RECOMMENDATIONS_PER_USER', 50))
+RECOMMENDATION_BATCH_SIZE = int(os.environ.get('RECOMMENDATION_BATCH_SIZE', 128))
+
+# API throttling and load shedding (see movies/throttling.py)
+# Each client has a token bucket for all its API requests ('client') and one
+# per URL name listed here; views price requests in throttle_cost, with
+# searches and unlimited lists costing the most. Buckets live in the cache,
+# so workers only share them through REDIS_URL. A worker sheds expensive
+# requests first once it has more than LOAD_SHED_MAX_IN_FLIGHT requests
+# running or its queries took LOAD_SHED_DB_LATENCY_MS on average over the
+# last LOAD_SHED_WINDOW_SECONDS.
+API_THROTTLING = os.environ.get('API_THROTTLING', 'true').lower() in ('1', 'true')
+API_THROTTLE_RATES = {
+    'client': os.environ.get('API_THROTTLE_RATE', '1200/min'),
+    'movie-list': os.environ.get('API_MOVIE_LIST_THROTTLE_RATE', '300/min'),
+    'movie-facets': '300/min',
+    'industry-movies': '60/min',
+    'person-list': '300/min',
 }
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', 32))
+LOAD_SHED_DB_LATENCY_MS = float(os.environ.get('LOAD_SHED_DB_LATENCY_MS', 250))
+LOAD_SHED_WINDOW_SECONDS = int(os.environ.get('LOAD_SHED_WINDOW_SECONDS', 10))
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # For development
 CORS_ALLOW_CREDENTIALS = True
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
\ No newline at end of file
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'X-Compiled-SQL', 'Retry-After']
\ No newline at end of file
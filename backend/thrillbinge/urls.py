@@ -17,13 +17,24 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from movies import tmdb_client
+from movies.views import AutocompleteAPIView, CollectionDetailAPIView
 
 def health_check(request):
     return HttpResponse("OK")
 
+def tmdb_health(request):
+    # Per-endpoint TMDB client counters, latencies and circuit states for this process
+    return JsonResponse(tmdb_client.metrics())
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/movies/', include('movies.urls')),
+    path('api/people/', include('movies.people_urls')),
+    path('api/autocomplete/', AutocompleteAPIView.as_view(), name='autocomplete'),
+    path('api/me/', include('users.urls')),
+    path('api/collections/<slug:slug>/', CollectionDetailAPIView.as_view(), name='collection-detail'),
     path('health/', health_check, name='health_check'),
+    path('health/tmdb/', tmdb_health, name='tmdb_health'),
 ]
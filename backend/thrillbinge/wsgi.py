@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "thrillbinge.settings")
 
 application = get_wsgi_application()
+
+# Build the in-process catalog indexes and start merging trending views
+# once per worker, before serving traffic
+from movies.catalog import warm_snapshots  # noqa: E402
+from movies.trending import tracker  # noqa: E402
+
+warm_snapshots()
+tracker.start()
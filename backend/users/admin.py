@@ -1,3 +1,46 @@
 from django.contrib import admin
+from .models import Recommendation, UserRating, WatchlistEntry, WatchProgress
+from .ratings import unrate
 
 # Register your models here.
+
+@admin.register(WatchlistEntry)
+class WatchlistEntryAdmin(admin.ModelAdmin):
+    list_display = ['user', 'movie', 'added_at']
+    list_select_related = ['user', 'movie']
+    raw_id_fields = ['user', 'movie']
+
+
+@admin.register(WatchProgress)
+class WatchProgressAdmin(admin.ModelAdmin):
+    list_display = ['user', 'movie', 'position_seconds', 'duration_seconds', 'finished', 'updated_at']
+    list_select_related = ['user', 'movie']
+    raw_id_fields = ['user', 'movie']
+    readonly_fields = ['sequence', 'updated_at']
+
+
+@admin.register(UserRating)
+class UserRatingAdmin(admin.ModelAdmin):
+    list_display = ['user', 'movie', 'score', 'updated_at']
+    list_select_related = ['user', 'movie']
+    raw_id_fields = ['user', 'movie']
+    # Saved through users.ratings so the movie aggregates stay in step
+    readonly_fields = ['user', 'movie', 'score', 'created_at', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def delete_model(self, request, obj):
+        unrate(obj.user, obj.movie_id)
+
+    def delete_queryset(self, request, queryset):
+        for rating in queryset.select_related('user'):
+            unrate(rating.user, rating.movie_id)
+
+
+@admin.register(Recommendation)
+class RecommendationAdmin(admin.ModelAdmin):
+    list_display = ['user', 'computed_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    readonly_fields = ['items', 'computed_at']
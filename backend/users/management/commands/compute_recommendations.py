@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from users.recommendations import compute_recommendations, np
+
+
+class Command(BaseCommand):
+    help = 'Precompute "because you watched" recommendations for users whose history changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute every user with history')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('Recommendations require NumPy.')
+
+        def progress(done, total):
+            self.stdout.write(f'Scored {done} of {total} users')
+
+        updated = compute_recommendations(all_users=options['all'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f'Updated recommendations for {updated} users'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from users.ratings import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute the user rating aggregates on Movie from users' ratings and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many movies drifted')
+
+    def handle(self, *args, **options):
+        drifted = reconcile(dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f'{drifted} movies have drifted user rating aggregates')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired user rating aggregates of {drifted} movies'))
@@ -0,0 +1,62 @@
+# Generated by Django 4.2 on 2026-10-19 16:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('movies', '0015_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position_seconds', models.PositiveIntegerField(default=0)),
+                ('duration_seconds', models.PositiveIntegerField(default=0)),
+                ('finished', models.BooleanField(default=False)),
+                ('sequence', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watch_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'watch progress',
+            },
+        ),
+        migrations.CreateModel(
+            name='WatchlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='watchlist', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'watchlist entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='watchprogress',
+            index=models.Index(fields=['user', 'finished', '-updated_at'], name='users_watch_user_id_2b6ff8_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='watchprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'movie'), name='users_watchprogress_unique_movie'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlistentry',
+            index=models.Index(fields=['user', '-added_at'], name='users_watch_user_id_2812a8_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='watchlistentry',
+            constraint=models.UniqueConstraint(fields=('user', 'movie'), name='users_watchlist_unique_movie'),
+        ),
+    ]
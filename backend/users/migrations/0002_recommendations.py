@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-19 16:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recommendation', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('items', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='watchlistentry',
+            index=models.Index(fields=['added_at'], name='users_watch_added_a_6ffe72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchprogress',
+            index=models.Index(fields=['updated_at'], name='users_watch_updated_144505_idx'),
+        ),
+    ]
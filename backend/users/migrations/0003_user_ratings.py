@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-19 16:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_movie_user_rating'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0002_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRating',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ratings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='userrating',
+            index=models.Index(fields=['user', '-updated_at'], name='users_userr_user_id_4e75ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrating',
+            index=models.Index(fields=['movie', 'score'], name='users_userr_movie_i_cc5b9a_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userrating',
+            constraint=models.UniqueConstraint(fields=('user', 'movie'), name='users_rating_unique_movie'),
+        ),
+    ]
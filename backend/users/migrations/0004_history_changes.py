@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-19 16:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def mark_existing_history(apps, schema_editor):
+    # Everyone with history is rescored once by the next incremental run
+    HistoryChange = apps.get_model('users', 'HistoryChange')
+    WatchlistEntry = apps.get_model('users', 'WatchlistEntry')
+    WatchProgress = apps.get_model('users', 'WatchProgress')
+    user_ids = set(WatchlistEntry.objects.values_list('user_id', flat=True))
+    user_ids |= set(WatchProgress.objects.values_list('user_id', flat=True))
+    now = timezone.now()
+    HistoryChange.objects.bulk_create([HistoryChange(user_id=user_id, changed_at=now) for user_id in user_ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_user_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryChange',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='history_change', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('changed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(mark_existing_history, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='watchlistentry',
+            name='users_watch_added_a_6ffe72_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='watchprogress',
+            name='users_watch_updated_144505_idx',
+        ),
+    ]
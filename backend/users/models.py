@@ -1,3 +1,112 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from movies.models import Movie
 
 # Create your models here.
+
+class WatchlistEntry(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watchlist')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'watchlist entries'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'movie'], name='users_watchlist_unique_movie'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-added_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.movie}'
+
+class WatchProgress(models.Model):
+    """
+    How far a user got in a movie. Written in batches by users/progress.py;
+    sequence is the client's heartbeat counter, and a row only moves forward.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watch_progress')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    position_seconds = models.PositiveIntegerField(default=0)
+    duration_seconds = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    sequence = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = 'watch progress'
+        constraints = [
+            # The conflict target of the batched upsert
+            models.UniqueConstraint(fields=['user', 'movie'], name='users_watchprogress_unique_movie'),
+        ]
+        indexes = [
+            # Continue watching: a user's unfinished movies, most recent first
+            models.Index(fields=['user', 'finished', '-updated_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.movie} at {self.position_seconds}s'
+
+class UserRating(models.Model):
+    """
+    A user's 1-10 rating of a movie. Change ratings through users/ratings.py,
+    which keeps the aggregates on Movie in step.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='ratings')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    score = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'movie'], name='users_rating_unique_movie'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-updated_at']),
+            # Reconciliation groups ratings by movie
+            models.Index(fields=['movie', 'score']),
+        ]
+
+    def __str__(self):
+        return f'{self.user} rated {self.movie} {self.score}'
+
+class Recommendation(models.Model):
+    """
+    A user's precomputed recommendations, written by compute_recommendations
+    (see users/recommendations.py) and read whole by /api/me/recommendations/.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='recommendation'
+    )
+    # [movie_id, id of the watched movie it is recommended because of, or None], best first
+    items = models.JSONField(default=list)
+    computed_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'Recommendations for {self.user}'
+
+class HistoryChange(models.Model):
+    """
+    When a user's watch history (progress or watchlist) was last written,
+    stamped by the writer at write time, so compute_recommendations finds
+    late flushes and removals too. See users/recommendations.py.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='history_change'
+    )
+    changed_at = models.DateTimeField(db_index=True)
+
+    @classmethod
+    def mark(cls, user_ids):
+        """Stamp the users' history as changed now."""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, changed_at=now) for user_id in set(user_ids)],
+            update_conflicts=True, unique_fields=['user'], update_fields=['changed_at'],
+        )
+
+    def __str__(self):
+        return f'{self.user} changed at {self.changed_at}'
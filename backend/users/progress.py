@@ -0,0 +1,201 @@
+"""
+Write-behind buffering of watch-progress heartbeats.
+
+The player reports its position every few seconds while a movie plays.
+Heartbeats are not written as they arrive: each process keeps only the
+newest one per (user, movie) in memory, and a background thread flushes
+them every WATCH_PROGRESS_FLUSH_SECONDS (or as soon as
+WATCH_PROGRESS_BUFFER_MAX movies are pending) in one batched upsert. A
+process that dies loses at most one flush interval of progress.
+
+Every heartbeat carries the client's sequence number, increasing for the
+same user and movie (a millisecond timestamp works). The upsert only
+replaces a row with a higher sequence, so retried, duplicated and
+reordered heartbeats, including ones flushed by different processes, are
+harmless.
+
+"Continue watching" is read through a per-user cache of compact
+(movie_id, position, duration) rows, which a flush drops for the users it
+wrote.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from movies.models import Movie
+
+from .models import HistoryChange, WatchProgress
+
+logger = logging.getLogger(__name__)
+
+# A movie watched this far counts as finished
+FINISHED_SHARE = 0.95
+UPSERT_BATCH_SIZE = 500
+# Column ranges of WatchProgress: PositiveIntegerField and BigIntegerField
+MAX_SECONDS = 2 ** 31 - 1
+MAX_SEQUENCE = 2 ** 63 - 1
+MOVIE_ID_SECONDS = 60 * 60
+MISSING_MOVIE_SECONDS = 60
+
+
+@dataclass
+class Heartbeat:
+    user_id: int
+    movie_id: int
+    position: int
+    duration: int
+    sequence: int
+    received_at: datetime
+
+    @property
+    def finished(self):
+        return self.duration > 0 and self.position >= self.duration * FINISHED_SHARE
+
+
+def movie_id_for(tmdb_id):
+    """The catalog id of a TMDB id, or None, cached so heartbeats don't query for it."""
+    key = f'movie-id:{tmdb_id}'
+    movie_id = cache.get(key)
+    if movie_id is None:
+        movie_id = Movie.objects.filter(tmdb_id=tmdb_id).values_list('id', flat=True).first() or 0
+        cache.set(key, movie_id, MOVIE_ID_SECONDS if movie_id else MISSING_MOVIE_SECONDS)
+    return movie_id or None
+
+
+def continue_watching_key(user_id):
+    return f'continue-watching:{user_id}'
+
+
+def _upsert_sql():
+    table = connection.ops.quote_name(WatchProgress._meta.db_table)
+    columns = ['user_id', 'movie_id', 'position_seconds', 'duration_seconds', 'finished', 'sequence', 'updated_at']
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns[2:])
+    # ON CONFLICT ... DO UPDATE ... WHERE reads the same on SQLite and Postgres
+    return (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT (user_id, movie_id) DO UPDATE SET {updates} '
+        f'WHERE {table}.sequence < excluded.sequence'
+    )
+
+
+def write_progress(heartbeats):
+    """Upsert heartbeats in batches, keeping rows with a higher sequence as they are."""
+    sql = _upsert_sql()
+    rows = [
+        (
+            heartbeat.user_id, heartbeat.movie_id, heartbeat.position, heartbeat.duration,
+            heartbeat.finished, heartbeat.sequence,
+            connection.ops.adapt_datetimefield_value(heartbeat.received_at),
+        )
+        for heartbeat in heartbeats
+    ]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+                cursor.executemany(sql, rows[start:start + UPSERT_BATCH_SIZE])
+        # updated_at is when the heartbeat arrived, which may be long before this flush
+        HistoryChange.mark(heartbeat.user_id for heartbeat in heartbeats)
+    cache.delete_many([continue_watching_key(user_id) for user_id in {h.user_id for h in heartbeats}])
+
+
+def drop_orphans(heartbeats):
+    """The heartbeats whose user and movie still exist; a movie id may be cached past its deletion."""
+    movie_ids = set(Movie.objects.filter(id__in={h.movie_id for h in heartbeats}).values_list('id', flat=True))
+    user_ids = set(
+        get_user_model().objects.filter(pk__in={h.user_id for h in heartbeats}).values_list('pk', flat=True)
+    )
+    return [h for h in heartbeats if h.movie_id in movie_ids and h.user_id in user_ids]
+
+
+class ProgressBuffer:
+    """The newest unwritten heartbeat per (user, movie) in this process, and its flush thread."""
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def add(self, heartbeat):
+        """Buffer a heartbeat. Returns False if a newer one for the same movie is already buffered."""
+        key = (heartbeat.user_id, heartbeat.movie_id)
+        with self.lock:
+            current = self.pending.get(key)
+            if current is not None and current.sequence >= heartbeat.sequence:
+                return False
+            self.pending[key] = heartbeat
+            full = len(self.pending) >= settings.WATCH_PROGRESS_BUFFER_MAX
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='watch-progress', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+        if full:
+            self.wake.set()
+        return True
+
+    def flush(self):
+        """Write everything buffered. Returns how many heartbeats were written."""
+        with self.lock:
+            heartbeats, self.pending = list(self.pending.values()), {}
+        if not heartbeats:
+            return 0
+        try:
+            try:
+                write_progress(heartbeats)
+            except IntegrityError:
+                # Retrying would fail the same way: write the rows that can be written
+                valid = drop_orphans(heartbeats)
+                logger.warning('Dropped %s heartbeats of deleted users or movies', len(heartbeats) - len(valid))
+                heartbeats = valid
+                if heartbeats:
+                    write_progress(heartbeats)
+        except IntegrityError:
+            logger.exception('Dropped %s watch progress heartbeats that could not be written', len(heartbeats))
+            return 0
+        except DatabaseError:
+            logger.exception('Could not write %s watch progress heartbeats; retrying', len(heartbeats))
+            self._requeue(heartbeats)
+            return 0
+        return len(heartbeats)
+
+    def _requeue(self, heartbeats):
+        with self.lock:
+            for heartbeat in heartbeats:
+                key = (heartbeat.user_id, heartbeat.movie_id)
+                if key not in self.pending:
+                    self.pending[key] = heartbeat
+
+    def _run(self):
+        while True:
+            self.wake.wait(settings.WATCH_PROGRESS_FLUSH_SECONDS)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the thread alive for the next flush
+                logger.exception('Could not flush watch progress')
+            finally:
+                close_old_connections()
+
+
+buffer = ProgressBuffer()
+
+
+def continue_watching(user_id):
+    """[(movie_id, position, duration)] of the user's unfinished movies, most recent first."""
+    key = continue_watching_key(user_id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(
+            WatchProgress.objects.filter(user_id=user_id, finished=False)
+            .order_by('-updated_at')
+            .values_list('movie_id', 'position_seconds', 'duration_seconds')[:settings.CONTINUE_WATCHING_LIMIT]
+        )
+        cache.set(key, rows, settings.CONTINUE_WATCHING_CACHE_SECONDS)
+    return rows
@@ -0,0 +1,148 @@
+"""
+User ratings and the aggregates they keep on Movie.
+
+rate() and unrate() change a UserRating and, in the same transaction,
+adjust the movie's user_rating_count and user_rating_sum by the difference
+with F() expressions and recompute user_rating from the new values in the
+same UPDATE. Reads never aggregate over ratings. Changes to an existing
+rating are compare-and-set on its score, because select_for_update() is a
+no-op on SQLite; a write that loses a race reads the rating again.
+
+user_rating is a Bayesian average: USER_RATING_PRIOR_VOTES imaginary votes
+of USER_RATING_PRIOR_MEAN are added to the real ones, so a movie with one
+10 doesn't outrank one with hundreds of 9s. reconcile() recomputes all of
+it from the ratings table, for drift or a changed prior.
+"""
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Sum, Value, When
+from django.dispatch import receiver
+from django.utils import timezone
+from movies.catalog_dump import catalog_replaced
+from movies.models import Movie
+
+from .models import UserRating
+
+MIN_SCORE = 1
+MAX_SCORE = 10
+RECONCILE_BATCH_SIZE = 1000
+# Tries at a rating write that loses races with concurrent writes
+WRITE_ATTEMPTS = 5
+
+
+class ConcurrentRatingChange(DatabaseError):
+    """The rating changed under every attempt to write it."""
+
+
+def bayesian_average(total, count):
+    """Works on numbers and on expressions alike."""
+    votes = settings.USER_RATING_PRIOR_VOTES
+    return (votes * settings.USER_RATING_PRIOR_MEAN + total) / (votes + count)
+
+
+def _adjust(movie_id, count_delta, sum_delta):
+    # Right-hand sides read the row's values from before this UPDATE
+    new_count = F('user_rating_count') + count_delta
+    new_sum = F('user_rating_sum') + sum_delta
+    Movie.objects.filter(pk=movie_id).update(
+        user_rating_count=new_count,
+        user_rating_sum=new_sum,
+        # Unrated movies sort last, below any rated one
+        user_rating=Case(
+            When(user_rating_count__gt=-count_delta, then=ExpressionWrapper(
+                bayesian_average(Value(0.0) + new_sum, new_count), output_field=FloatField()
+            )),
+            default=Value(0.0),
+        ),
+    )
+
+
+def rate(user, movie_id, score):
+    """Set a user's rating of a movie. Returns (UserRating, created)."""
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                rating = UserRating.objects.select_for_update().filter(user=user, movie_id=movie_id).first()
+                if rating is None:
+                    rating = UserRating.objects.create(user=user, movie_id=movie_id, score=score)
+                    _adjust(movie_id, 1, score)
+                    return rating, True
+                previous, rating.score = rating.score, score
+                if previous == score:
+                    return rating, False
+                if _write_if_unchanged(rating, previous, score=score, updated_at=timezone.now()):
+                    _adjust(movie_id, 0, score - previous)
+                    return rating, False
+        except IntegrityError:
+            # A concurrent request created the rating first; update it instead
+            if attempt == WRITE_ATTEMPTS - 1:
+                raise
+    raise ConcurrentRatingChange(f'Rating of movie {movie_id} kept changing under user {user.pk}')
+
+
+def unrate(user, movie_id):
+    """Remove a user's rating of a movie. Returns whether there was one."""
+    for _ in range(WRITE_ATTEMPTS):
+        with transaction.atomic():
+            rating = UserRating.objects.select_for_update().filter(user=user, movie_id=movie_id).first()
+            if rating is None:
+                return False
+            deleted, _ = UserRating.objects.filter(pk=rating.pk, score=rating.score).delete()
+            if deleted:
+                _adjust(movie_id, -1, -rating.score)
+                return True
+    raise ConcurrentRatingChange(f'Rating of movie {movie_id} kept changing under user {user.pk}')
+
+
+def _write_if_unchanged(rating, previous, **values):
+    """
+    Write values to the rating unless its score is no longer previous.
+    select_for_update() is a no-op on SQLite, so the score read may be stale
+    by the time of the write; applying its difference then would drift the
+    aggregates. The conditional UPDATE makes the write a compare-and-set.
+    """
+    return UserRating.objects.filter(pk=rating.pk, score=previous).update(**values) == 1
+
+
+def _stored_aggregates(rated_ids):
+    """
+    Rows of movies holding rating aggregates or having ratings, as two
+    passes so no query binds more ids than SQLite allows.
+    """
+    columns = ('id', 'user_rating_count', 'user_rating_sum', 'user_rating')
+    yield from Movie.objects.filter(user_rating_count__gt=0).values_list(*columns).iterator()
+    rated_ids = sorted(rated_ids)
+    for start in range(0, len(rated_ids), RECONCILE_BATCH_SIZE):
+        batch = rated_ids[start:start + RECONCILE_BATCH_SIZE]
+        yield from Movie.objects.filter(id__in=batch, user_rating_count=0).values_list(*columns)
+
+
+def reconcile(dry_run=False):
+    """
+    Recompute every movie's rating aggregates from UserRating in one grouped
+    query and rewrite the ones that drifted. Returns how many were wrong.
+    """
+    actual = {
+        movie_id: (count, total)
+        for movie_id, count, total in UserRating.objects.values_list('movie_id')
+        .annotate(count=Count('id'), total=Sum('score')).order_by()
+    }
+    drifted = []
+    for movie_id, count, total, average in _stored_aggregates(actual):
+        real_count, real_total = actual.get(movie_id, (0, 0))
+        real_average = bayesian_average(real_total, real_count) if real_count else 0.0
+        if (count, total) != (real_count, real_total) or abs(average - real_average) > 1e-9:
+            drifted.append(Movie(
+                id=movie_id, user_rating_count=real_count, user_rating_sum=real_total, user_rating=real_average,
+            ))
+    if not dry_run:
+        Movie.objects.bulk_update(
+            drifted, ['user_rating_count', 'user_rating_sum', 'user_rating'], batch_size=RECONCILE_BATCH_SIZE
+        )
+    return len(drifted)
+
+
+@receiver(catalog_replaced, dispatch_uid='users.ratings.catalog_replaced')
+def _reconcile_replaced_catalog(sender, **kwargs):
+    # A loaded dump carries the aggregates of the database it was taken from
+    reconcile()
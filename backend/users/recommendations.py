@@ -0,0 +1,320 @@
+"""
+Batch "because you watched" recommendations from watch history.
+
+compute_recommendations() reads every user's history (watch progress and
+watchlist) as {movie_id: weight}, then scores catalog movies for the users
+whose history changed since theirs were last computed (HistoryChange,
+stamped by the writers), RECOMMENDATION_BATCH_SIZE users
+at a time with NumPy:
+
+- Co-occurrence: an item-item matrix of movies watched by the same users,
+  cosine-normalized and built from dense user chunks with one matrix
+  product each. A batch's scores are its history matrix times this one.
+- Affinity: each movie's cast, directors and industry as sparse features
+  weighted by rarity (IDF). A user's profile sums the features of the
+  movies they watched, and every movie is scored against the batch's
+  profiles at once.
+
+Both scores are scaled to 0-1 per user and mixed, movies the user already
+watched or saved are dropped, and the top RECOMMENDATIONS_PER_USER are
+stored on Recommendation together with the watched movie each one is
+closest to, so the API reads one row per request.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.db.models import DateTimeField, Exists, ExpressionWrapper, OuterRef
+from django.dispatch import receiver
+from django.utils import timezone
+from movies.catalog_dump import catalog_replaced
+from movies.models import SUMMARY_SEPARATOR, Movie
+
+from .models import HistoryChange, Recommendation, WatchlistEntry, WatchProgress
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+WATCHLIST_WEIGHT = 0.5
+# Shorter plays are sampling, not watching
+MIN_WATCH_SECONDS = 120
+# Movies in the co-occurrence matrix: the most watched ones seen by 2+ users
+MAX_COOCCURRENCE_MOVIES = 5000
+USER_CHUNK = 1024
+# Feature weights before IDF
+CAST_WEIGHT = 1.0
+DIRECTOR_WEIGHT = 1.5
+INDUSTRY_WEIGHT = 0.5
+# How much affinity counts next to co-occurrence, and popularity as a tiebreak
+AFFINITY_SHARE = 0.6
+POPULARITY_SHARE = 0.05
+# A write stamped just before a user's run started may commit after the run
+# read the history, so changes this close before computed_at still count
+CHANGE_MARGIN = timedelta(minutes=1)
+
+
+def load_history():
+    """{user_id: {movie_id: weight}} for every user with a watchlist or watch progress."""
+    history = defaultdict(dict)
+    for user_id, movie_id in WatchlistEntry.objects.values_list('user_id', 'movie_id').iterator():
+        history[user_id][movie_id] = WATCHLIST_WEIGHT
+    progress = WatchProgress.objects.values_list(
+        'user_id', 'movie_id', 'position_seconds', 'duration_seconds', 'finished'
+    )
+    for user_id, movie_id, position, duration, finished in progress.iterator():
+        if finished:
+            weight = 1.0
+        elif position < MIN_WATCH_SECONDS:
+            continue
+        elif duration:
+            weight = 0.5 + 0.5 * min(1.0, position / duration)
+        else:
+            weight = 0.75
+        history[user_id][movie_id] = max(history[user_id].get(movie_id, 0), weight)
+    return history
+
+
+def changed_users(history):
+    """
+    Users whose history was written since their own recommendations were
+    computed, including ones left with none, and users with history who have
+    never been scored. Comparing per user means a run that stops part way
+    leaves the rest of its users for the next one.
+    """
+    recomputed = Recommendation.objects.filter(
+        user_id=OuterRef('user_id'),
+        computed_at__gt=ExpressionWrapper(OuterRef('changed_at') + CHANGE_MARGIN, output_field=DateTimeField()),
+    )
+    users = set(HistoryChange.objects.filter(~Exists(recomputed)).values_list('user_id', flat=True))
+    users |= set(history) - set(Recommendation.objects.values_list('user_id', flat=True))
+    return users
+
+
+class CoOccurrence:
+    """Cosine similarity between movies, by the users who watched both."""
+
+    def __init__(self, history):
+        counts = Counter(movie_id for movies in history.values() for movie_id in movies)
+        movie_ids = [movie_id for movie_id, n in counts.most_common(MAX_COOCCURRENCE_MOVIES) if n >= 2]
+        self.position = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.movie_ids = np.array(movie_ids, dtype=np.int64)
+
+        matrix = np.zeros((len(movie_ids), len(movie_ids)), dtype=np.float32)
+        histories = list(history.values())
+        for start in range(0, len(histories), USER_CHUNK):
+            vectors = self.vectors(histories[start:start + USER_CHUNK])
+            matrix += vectors.T @ vectors
+        norms = np.sqrt(np.diag(matrix)).copy()
+        norms[norms == 0] = 1
+        matrix /= norms[:, None]
+        matrix /= norms[None, :]
+        np.fill_diagonal(matrix, 0)
+        self.matrix = matrix
+
+    def vectors(self, histories):
+        """Dense (users x movies) weights of the matrix's movies."""
+        vectors = np.zeros((len(histories), len(self.movie_ids)), dtype=np.float32)
+        for row, movies in enumerate(histories):
+            for movie_id, weight in movies.items():
+                column = self.position.get(movie_id)
+                if column is not None:
+                    vectors[row, column] = weight
+        return vectors
+
+    def block(self, rows, columns):
+        """(rows x columns) similarities, 0 for movies outside the matrix."""
+        i = np.array([self.position.get(movie_id, -1) for movie_id in rows])
+        j = np.array([self.position.get(movie_id, -1) for movie_id in columns])
+        block = np.zeros((len(rows), len(columns)), dtype=np.float32)
+        if len(self.movie_ids):
+            block[np.ix_(i >= 0, j >= 0)] = self.matrix[np.ix_(i[i >= 0], j[j >= 0])]
+        return block
+
+
+class MovieFeatures:
+    """The catalog's cast, director and industry features as a CSR matrix with IDF weights."""
+
+    def __init__(self):
+        vocabulary = {}
+        movie_ids, popularity, indptr, indices, weights = [], [], [0], [], []
+        rows = Movie.objects.order_by('id').values_list(
+            'id', 'popularity', 'industry_id', 'top_cast_ids', 'director_names'
+        )
+        for movie_id, movie_popularity, industry_id, cast_ids, director_names in rows.iterator():
+            features = {('cast', person_id): CAST_WEIGHT for person_id in cast_ids or []}
+            for name in filter(None, director_names.split(SUMMARY_SEPARATOR)):
+                features['director', name] = DIRECTOR_WEIGHT
+            if industry_id is not None:
+                features['industry', industry_id] = INDUSTRY_WEIGHT
+            for feature, weight in features.items():
+                indices.append(vocabulary.setdefault(feature, len(vocabulary)))
+                weights.append(weight)
+            movie_ids.append(movie_id)
+            popularity.append(movie_popularity)
+            indptr.append(len(indices))
+
+        self.movie_ids = np.array(movie_ids, dtype=np.int64)
+        self.row = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        # Row of every entry, so entries can be grouped by movie
+        self.entry_rows = np.repeat(np.arange(len(movie_ids)), np.diff(self.indptr))
+        document_frequency = np.bincount(self.indices, minlength=len(vocabulary))
+        idf = np.log((1 + len(movie_ids)) / (1 + document_frequency))
+        self.weights = np.array(weights, dtype=np.float32) * idf[self.indices].astype(np.float32)
+        self.vocabulary_size = len(vocabulary)
+        log_popularity = np.log1p(np.maximum(np.array(popularity, dtype=np.float32), 0))
+        self.popularity = log_popularity / (log_popularity.max() or 1)
+
+    def features_of(self, movie_id):
+        row = self.row.get(movie_id)
+        if row is None:
+            return {}
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return dict(zip(self.indices[start:end].tolist(), self.weights[start:end].tolist()))
+
+    def scores(self, histories):
+        """(users x movies) affinity of each history's feature profile with every movie."""
+        profiles = []
+        for movies in histories:
+            profile = Counter()
+            for movie_id, weight in movies.items():
+                for feature, feature_weight in self.features_of(movie_id).items():
+                    profile[feature] += weight * feature_weight
+            profiles.append(profile)
+
+        # Only the features in this batch's profiles can score
+        used = sorted({feature for profile in profiles for feature in profile})
+        scores = np.zeros((len(histories), len(self.movie_ids)), dtype=np.float32)
+        if not used:
+            return scores
+        column = np.full(self.vocabulary_size, -1, dtype=np.int64)
+        column[used] = np.arange(len(used))
+        matrix = np.zeros((len(histories), len(used)), dtype=np.float32)
+        for row, profile in enumerate(profiles):
+            for feature, value in profile.items():
+                matrix[row, column[feature]] = value
+
+        entries = column[self.indices] >= 0
+        rows = self.entry_rows[entries]
+        contributions = matrix[:, column[self.indices[entries]]] * self.weights[entries]
+        # Entries are sorted by movie, so each movie's sum is one reduceat segment
+        scored_rows, starts = np.unique(rows, return_index=True)
+        scores[:, scored_rows] = np.add.reduceat(contributions, starts, axis=1)
+        return scores
+
+
+def _scaled(scores):
+    """Scale each user's row to 0-1."""
+    top = scores.max(axis=1, keepdims=True)
+    top[top == 0] = 1
+    return scores / top
+
+
+def recommend_batch(histories, cooccurrence, features, count):
+    """[[movie_id, because_movie_id], ...] for each history, best first."""
+    scores = AFFINITY_SHARE * _scaled(features.scores(histories))
+    if len(cooccurrence.movie_ids):
+        collaborative = cooccurrence.vectors(histories) @ cooccurrence.matrix
+        # Place the matrix's movies at their catalog rows (movies since deleted are skipped)
+        rows = np.array([features.row.get(movie_id, -1) for movie_id in cooccurrence.movie_ids.tolist()])
+        known = rows >= 0
+        scores[:, rows[known]] += _scaled(collaborative)[:, known]
+    scores += POPULARITY_SHARE * features.popularity
+
+    for row, movies in enumerate(histories):
+        scores[row, [features.row[movie_id] for movie_id in movies if movie_id in features.row]] = -np.inf
+    count = min(count, scores.shape[1] - 1)
+    tops = np.argpartition(-scores, count, axis=1)[:, :count]
+
+    results = []
+    for row, movies in enumerate(histories):
+        user_scores, top = scores[row], tops[row]
+        top = top[np.argsort(-user_scores[top])]
+        # Users who watched nearly everything have fewer candidates than count
+        top = top[np.isfinite(user_scores[top])]
+        candidates = features.movie_ids[top].tolist()
+        results.append([list(pair) for pair in zip(candidates, explain(movies, candidates, cooccurrence, features))])
+    return results
+
+
+def explain(movies, candidates, cooccurrence, features):
+    """For each candidate, the watched movie closest to it, or None."""
+    watched = [movie_id for movie_id in movies if movie_id in features.row]
+    if not watched:
+        return [None] * len(candidates)
+    watched_features = [features.features_of(movie_id) for movie_id in watched]
+    column = {}
+    for feature in (feature for movie in watched_features for feature in movie):
+        column.setdefault(feature, len(column))
+    has_feature = np.zeros((len(watched), len(column)), dtype=np.float32)
+    for row, movie in enumerate(watched_features):
+        has_feature[row, [column[feature] for feature in movie]] = 1
+    candidate_weights = np.zeros((len(candidates), len(column)), dtype=np.float32)
+    for row, movie_id in enumerate(candidates):
+        for feature, weight in features.features_of(movie_id).items():
+            if feature in column:
+                candidate_weights[row, column[feature]] = weight
+
+    # (watched x candidates) closeness: co-occurrence plus shared feature weight
+    shared = has_feature @ candidate_weights.T
+    weights = np.array([movies[movie_id] for movie_id in watched], dtype=np.float32)
+    scores = weights[:, None] * (cooccurrence.block(watched, candidates) + AFFINITY_SHARE * np.tanh(shared))
+    best = scores.argmax(axis=0)
+    return [watched[i] if scores[i, j] > 0 else None for j, i in enumerate(best.tolist())]
+
+
+def compute_recommendations(all_users=False, progress=None):
+    """
+    Recompute the stored recommendations of users whose history changed, or
+    of every user with history. progress(done, total) is called per batch.
+    Returns how many users were updated.
+    """
+    if np is None:
+        raise RuntimeError('Recommendations require NumPy.')
+    started = timezone.now()
+    history = load_history()
+    changed = set(history) if all_users else changed_users(history)
+    # Users who removed all of their history have nothing left to recommend from
+    emptied = set(Recommendation.objects.values_list('user_id', flat=True)) if all_users else changed
+    Recommendation.objects.filter(user_id__in=emptied - set(history)).delete()
+    users = sorted(changed & set(history))
+    if not users:
+        return 0
+
+    cooccurrence = CoOccurrence(history)
+    features = MovieFeatures()
+    batch_size = settings.RECOMMENDATION_BATCH_SIZE
+    for start in range(0, len(users), batch_size):
+        batch = users[start:start + batch_size]
+        results = recommend_batch(
+            [history[user_id] for user_id in batch], cooccurrence, features, settings.RECOMMENDATIONS_PER_USER
+        )
+        Recommendation.objects.bulk_create(
+            [
+                Recommendation(user_id=user_id, items=items, computed_at=started)
+                for user_id, items in zip(batch, results)
+            ],
+            update_conflicts=True, unique_fields=['user'], update_fields=['items', 'computed_at'],
+        )
+        if progress:
+            progress(start + len(batch), len(users))
+    logger.info('Computed recommendations for %s users', len(users))
+    return len(users)
+
+
+@receiver(catalog_replaced, dispatch_uid='users.recommendations.catalog_replaced')
+def _remap_replaced_catalog(sender, movie_ids, **kwargs):
+    """Move stored recommendations to the new catalog's movie ids, dropping movies it lacks."""
+    recommendations = list(Recommendation.objects.all())
+    for recommendation in recommendations:
+        recommendation.items = [
+            [movie_ids[movie_id], movie_ids.get(because)]
+            for movie_id, because in recommendation.items if movie_ids.get(movie_id)
+        ]
+    Recommendation.objects.bulk_update(recommendations, ['items'], batch_size=settings.RECOMMENDATION_BATCH_SIZE)
@@ -0,0 +1,37 @@
+from rest_framework import serializers
+from movies.serializers import MovieSummarySerializer
+from .models import UserRating, WatchlistEntry
+from .progress import MAX_SECONDS, MAX_SEQUENCE
+from .ratings import MAX_SCORE, MIN_SCORE
+
+
+class WatchlistEntrySerializer(serializers.ModelSerializer):
+    movie = MovieSummarySerializer(read_only=True)
+
+    class Meta:
+        model = WatchlistEntry
+        fields = ['movie', 'added_at']
+
+
+class MovieRefSerializer(serializers.Serializer):
+    tmdb_id = serializers.IntegerField(min_value=1, max_value=2 ** 31 - 1)
+
+
+class HeartbeatSerializer(MovieRefSerializer):
+    # Bounded by the WatchProgress columns, so a heartbeat can't fail its batch
+    position = serializers.IntegerField(min_value=0, max_value=MAX_SECONDS)
+    duration = serializers.IntegerField(min_value=0, max_value=MAX_SECONDS, required=False, default=0)
+    # Increases with every heartbeat of a playback; older or repeated ones are ignored
+    sequence = serializers.IntegerField(min_value=0, max_value=MAX_SEQUENCE)
+
+
+class RatingInputSerializer(MovieRefSerializer):
+    score = serializers.IntegerField(min_value=MIN_SCORE, max_value=MAX_SCORE)
+
+
+class UserRatingSerializer(serializers.ModelSerializer):
+    movie = MovieSummarySerializer(read_only=True)
+
+    class Meta:
+        model = UserRating
+        fields = ['movie', 'score', 'updated_at']
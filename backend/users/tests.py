@@ -1,3 +1,220 @@
-from django.test import TestCase
+from datetime import timedelta
+from pathlib import Path
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from movies.catalog_dump import dump_catalog, load_dump
+from movies.models import Movie
+
+from . import progress, ratings, recommendations
+from .models import HistoryChange, Recommendation, UserRating, WatchlistEntry, WatchProgress
+from .progress import Heartbeat, ProgressBuffer
 
 # Create your tests here.
+
+# The flush thread's loop, before the tests below replace it
+flush_loop = ProgressBuffer._run
+
+
+class ProgressBufferMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('viewer', password='secret')
+        self.movie = Movie.objects.create(tmdb_id=101, title='Drishyam')
+        # Flush by hand, without the background thread
+        patcher = mock.patch.object(ProgressBuffer, '_run')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.buffer = ProgressBuffer()
+
+    def heartbeat(self, position, sequence, movie_id=None, user_id=None):
+        return Heartbeat(
+            user_id=user_id or self.user.pk, movie_id=movie_id or self.movie.pk, position=position,
+            duration=7200, sequence=sequence, received_at=timezone.now(),
+        )
+
+
+class WatchProgressTests(ProgressBufferMixin, TestCase):
+    def test_heartbeats_are_coalesced_per_movie(self):
+        self.assertTrue(self.buffer.add(self.heartbeat(10, 1)))
+        self.assertTrue(self.buffer.add(self.heartbeat(20, 3)))
+        # Older and repeated heartbeats lose to the buffered one
+        self.assertFalse(self.buffer.add(self.heartbeat(15, 2)))
+        self.assertFalse(self.buffer.add(self.heartbeat(20, 3)))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(WatchProgress.objects.get().position_seconds, 20)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_rows_only_move_forward(self):
+        progress.write_progress([self.heartbeat(100, 5)])
+        # A late flush from another process carrying an older heartbeat
+        progress.write_progress([self.heartbeat(50, 4)])
+        row = WatchProgress.objects.get()
+        self.assertEqual((row.position_seconds, row.sequence), (100, 5))
+        progress.write_progress([self.heartbeat(7000, 6)])
+        row.refresh_from_db()
+        self.assertEqual((row.position_seconds, row.finished), (7000, True))
+
+    def test_database_errors_requeue_the_batch(self):
+        self.buffer.add(self.heartbeat(10, 1))
+        with mock.patch.object(progress, 'write_progress', side_effect=progress.DatabaseError('locked')), \
+                self.assertLogs('users.progress', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(self.buffer.flush(), 1)
+
+    def test_flush_thread_survives_unexpected_errors(self):
+        buffer = ProgressBuffer()
+        calls = []
+
+        def flush():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OverflowError('Python int too large to convert to SQLite INTEGER')
+            raise SystemExit
+
+        buffer.flush = flush
+        buffer.wake.set()
+        with self.settings(WATCH_PROGRESS_FLUSH_SECONDS=0), \
+                self.assertLogs('users.progress', 'ERROR'), self.assertRaises(SystemExit):
+            flush_loop(buffer)
+        self.assertEqual(len(calls), 2)
+
+    def test_out_of_range_heartbeats_are_rejected(self):
+        self.client.force_login(self.user)
+        for field, value in (('sequence', 2 ** 63), ('position', 2 ** 31), ('tmdb_id', 2 ** 31)):
+            data = {'tmdb_id': 101, 'position': 10, 'sequence': 1, field: value}
+            response = self.client.post('/api/me/progress/', data, content_type='application/json')
+            self.assertEqual(response.status_code, 400, field)
+
+    def test_continue_watching_is_refreshed_by_a_flush(self):
+        self.assertEqual(progress.continue_watching(self.user.pk), [])
+        self.buffer.add(self.heartbeat(600, 1))
+        self.buffer.flush()
+        self.assertEqual(progress.continue_watching(self.user.pk), [(self.movie.pk, 600, 7200)])
+        self.buffer.add(Heartbeat(
+            user_id=self.user.pk, movie_id=self.movie.pk, position=7100, duration=7200, sequence=2,
+            received_at=timezone.now() + timedelta(seconds=1),
+        ))
+        self.buffer.flush()
+        self.assertEqual(progress.continue_watching(self.user.pk), [])
+
+
+
+class RecommendationChangeTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('viewer', password='secret')
+        self.movie = Movie.objects.create(tmdb_id=101, title='Drishyam')
+        Recommendation.objects.create(
+            user=self.user, items=[[self.movie.pk, None]], computed_at=timezone.now() - timedelta(hours=1)
+        )
+
+    def test_late_flushes_count_as_changes(self):
+        # A heartbeat that arrived before the last run, flushed after it
+        progress.write_progress([Heartbeat(
+            user_id=self.user.pk, movie_id=self.movie.pk, position=600, duration=7200, sequence=1,
+            received_at=timezone.now() - timedelta(hours=2),
+        )])
+        history = recommendations.load_history()
+        self.assertEqual(recommendations.changed_users(history), {self.user.pk})
+
+    def test_users_left_by_a_failed_run_are_picked_up(self):
+        other = get_user_model().objects.create_user('other', password='secret')
+        for user in (self.user, other):
+            WatchlistEntry.objects.create(user=user, movie=self.movie)
+        HistoryChange.objects.all().delete()
+        HistoryChange.mark([self.user.pk, other.pk])
+        # A run that stopped after its first batch: only other was rescored
+        Recommendation.objects.create(user=other, items=[], computed_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(recommendations.changed_users(recommendations.load_history()), {self.user.pk})
+
+    def test_removing_the_last_watchlist_entry_clears_recommendations(self):
+        self.client.force_login(self.user)
+        self.client.post('/api/me/watchlist/', {'tmdb_id': 101}, content_type='application/json')
+        HistoryChange.objects.update(changed_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(recommendations.changed_users(recommendations.load_history()), set())
+
+        self.assertEqual(self.client.delete('/api/me/watchlist/101/').status_code, 204)
+        self.assertEqual(recommendations.changed_users(recommendations.load_history()), {self.user.pk})
+        recommendations.compute_recommendations()
+        self.assertFalse(Recommendation.objects.exists())
+
+class UserRatingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('viewer', password='secret')
+        self.movie = Movie.objects.create(tmdb_id=101, title='Drishyam')
+
+    def aggregates(self, movie):
+        movie = Movie.objects.get(pk=movie.pk)
+        return movie.user_rating_count, movie.user_rating_sum
+
+    def test_a_rating_changed_under_a_write_is_read_again(self):
+        ratings.rate(self.user, self.movie.pk, 5)
+        write = ratings._write_if_unchanged
+
+        def racing(rating, previous, **values):
+            if previous == 5:
+                # What a concurrent rate(..., 9) commits after this one read the 5
+                UserRating.objects.filter(pk=rating.pk).update(score=9)
+                ratings._adjust(self.movie.pk, 0, 4)
+            return write(rating, previous, **values)
+
+        with mock.patch.object(ratings, '_write_if_unchanged', side_effect=racing):
+            ratings.rate(self.user, self.movie.pk, 8)
+        self.assertEqual(self.aggregates(self.movie), (1, 8))
+        self.assertEqual(ratings.reconcile(dry_run=True), 0)
+
+    def test_reconcile_binds_ids_in_batches(self):
+        movies = [Movie.objects.create(tmdb_id=200 + i, title=f'Movie {i}') for i in range(5)]
+        for movie in movies:
+            ratings.rate(self.user, movie.pk, 7)
+        # Drift both ways: rated movies storing nothing, an unrated one storing a count
+        Movie.objects.update(user_rating_count=0, user_rating_sum=0, user_rating=0)
+        Movie.objects.filter(pk=self.movie.pk).update(user_rating_count=2, user_rating_sum=12)
+        with mock.patch.object(ratings, 'RECONCILE_BATCH_SIZE', 2):
+            self.assertEqual(ratings.reconcile(), 6)
+        self.assertEqual([self.aggregates(movie) for movie in movies], [(1, 7)] * 5)
+        self.assertEqual(self.aggregates(self.movie), (0, 0))
+
+
+class WatchProgressFlushTests(ProgressBufferMixin, TransactionTestCase):
+    """Foreign keys are checked when the flush commits, as outside tests."""
+
+    def test_heartbeats_of_deleted_movies_are_dropped_not_retried(self):
+        deleted = Movie.objects.create(tmdb_id=102, title='Gone')
+        self.buffer.add(self.heartbeat(10, 1))
+        self.buffer.add(self.heartbeat(10, 1, movie_id=deleted.pk))
+        deleted.delete()
+        with self.assertLogs('users.progress', 'WARNING'):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(WatchProgress.objects.values_list('movie_id', flat=True)), [self.movie.pk])
+        self.assertEqual(self.buffer.pending, {})
+
+
+class CatalogReplaceTests(TransactionTestCase):
+    """Foreign keys are checked when the load commits."""
+
+    def test_replacing_the_catalog_moves_users_rows_by_tmdb_id(self):
+        Movie.objects.create(pk=1, tmdb_id=102, title='Drishyam 2')
+        path = Path(tempfile.mkdtemp()) / 'catalog.ndjson.gz'
+        self.addCleanup(path.unlink)
+        dump_catalog(path)
+        Movie.objects.all().delete()
+
+        user = get_user_model().objects.create_user('viewer', password='secret')
+        gone = Movie.objects.create(pk=1, tmdb_id=101, title='Drishyam')
+        kept = Movie.objects.create(pk=2, tmdb_id=102, title='Drishyam 2')
+        for movie in (gone, kept):
+            WatchlistEntry.objects.create(user=user, movie=movie)
+            ratings.rate(user, movie.pk, 8)
+        Recommendation.objects.create(user=user, items=[[1, 2], [2, None]], computed_at=timezone.now())
+
+        load_dump(path, replace=True)
+        # Drishyam 2 is movie 1 in the dump; Drishyam isn't in it
+        self.assertEqual(list(WatchlistEntry.objects.values_list('movie_id', flat=True)), [1])
+        self.assertEqual(list(UserRating.objects.values_list('movie_id', flat=True)), [1])
+        self.assertEqual(Movie.objects.get(pk=1).user_rating_count, 1)
+        self.assertEqual(Recommendation.objects.get().items, [[1, None]])
@@ -0,0 +1,15 @@
+from django.urls import path
+from .views import (
+    ContinueWatchingAPIView, RatingAPIView, RatingsAPIView, RecommendationsAPIView, WatchlistAPIView,
+    WatchlistEntryAPIView, WatchProgressAPIView,
+)
+
+urlpatterns = [
+    path('watchlist/', WatchlistAPIView.as_view(), name='watchlist'),
+    path('watchlist/<int:tmdb_id>/', WatchlistEntryAPIView.as_view(), name='watchlist-entry'),
+    path('ratings/', RatingsAPIView.as_view(), name='ratings'),
+    path('ratings/<int:tmdb_id>/', RatingAPIView.as_view(), name='rating'),
+    path('progress/', WatchProgressAPIView.as_view(), name='watch-progress'),
+    path('continue-watching/', ContinueWatchingAPIView.as_view(), name='continue-watching'),
+    path('recommendations/', RecommendationsAPIView.as_view(), name='recommendations'),
+]
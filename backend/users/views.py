@@ -1,3 +1,153 @@
-from django.shortcuts import render
+from django.http import Http404
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from movies.models import Movie
+from movies.serializers import MovieSummarySerializer
+from .models import HistoryChange, Recommendation, UserRating, WatchlistEntry
+from .progress import Heartbeat, buffer, continue_watching, movie_id_for
+from .ratings import rate, unrate
+from .serializers import (
+    HeartbeatSerializer, MovieRefSerializer, RatingInputSerializer, UserRatingSerializer, WatchlistEntrySerializer
+)
 
 # Create your views here.
+
+def catalog_movie_id(tmdb_id):
+    movie_id = movie_id_for(tmdb_id)
+    if movie_id is None:
+        raise Http404
+    return movie_id
+
+class WatchlistAPIView(generics.ListAPIView):
+    """The user's watchlist, newest first; POST {"tmdb_id"} adds a movie."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = WatchlistEntrySerializer
+
+    def get_queryset(self):
+        return WatchlistEntry.objects.filter(user=self.request.user).select_related(
+            'movie__industry'
+        ).order_by('-added_at')
+
+    def post(self, request):
+        serializer = MovieRefSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        entry, created = WatchlistEntry.objects.get_or_create(
+            user=request.user, movie_id=catalog_movie_id(serializer.validated_data['tmdb_id'])
+        )
+        if created:
+            HistoryChange.mark([request.user.pk])
+        return Response(
+            WatchlistEntrySerializer(entry).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+class WatchlistEntryAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, tmdb_id):
+        deleted, _ = WatchlistEntry.objects.filter(user=request.user, movie__tmdb_id=tmdb_id).delete()
+        if deleted:
+            HistoryChange.mark([request.user.pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class RatingsAPIView(generics.ListAPIView):
+    """The user's ratings, most recent first; POST {"tmdb_id", "score"} rates a movie 1-10."""
+    permission_classes = [IsAuthenticated]
+    serializer_class = UserRatingSerializer
+
+    def get_queryset(self):
+        return UserRating.objects.filter(user=self.request.user).select_related(
+            'movie__industry'
+        ).order_by('-updated_at')
+
+    def post(self, request):
+        serializer = RatingInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        movie_id = catalog_movie_id(serializer.validated_data['tmdb_id'])
+        rating, created = rate(request.user, movie_id, serializer.validated_data['score'])
+        rating = UserRating.objects.select_related('movie__industry').get(pk=rating.pk)
+        return Response(
+            UserRatingSerializer(rating).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+class RatingAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, tmdb_id):
+        unrate(request.user, catalog_movie_id(tmdb_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class WatchProgressAPIView(APIView):
+    """
+    Player heartbeats. They are buffered and written in batches, so the
+    response only acknowledges receipt.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = HeartbeatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        buffer.add(Heartbeat(
+            user_id=request.user.pk,
+            movie_id=catalog_movie_id(data['tmdb_id']),
+            position=data['position'],
+            duration=data['duration'],
+            sequence=data['sequence'],
+            received_at=timezone.now(),
+        ))
+        return Response({'sequence': data['sequence']}, status=status.HTTP_202_ACCEPTED)
+
+class ContinueWatchingAPIView(APIView):
+    """The user's unfinished movies with their position, most recently watched first."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        rows = continue_watching(request.user.pk)
+        movies = Movie.objects.select_related('industry').in_bulk([movie_id for movie_id, _, _ in rows])
+        return Response([
+            {
+                'movie': MovieSummarySerializer(movies[movie_id]).data,
+                'position': position,
+                'duration': duration,
+            }
+            for movie_id, position, duration in rows
+            if movie_id in movies
+        ])
+
+class RecommendationsAPIView(APIView):
+    """
+    The user's precomputed recommendations, best first, and the same movies
+    grouped into "because you watched" rails.
+    """
+    permission_classes = [IsAuthenticated]
+    rail_count = 5
+    rail_size = 10
+
+    def get(self, request):
+        recommendation = Recommendation.objects.filter(pk=request.user.pk).first()
+        if recommendation is None:
+            return Response({'computed_at': None, 'movies': [], 'rails': []})
+        movie_ids = {movie_id for pair in recommendation.items for movie_id in pair if movie_id}
+        movies = {
+            pk: MovieSummarySerializer(movie).data
+            for pk, movie in Movie.objects.select_related('industry').in_bulk(movie_ids).items()
+        }
+        rails = {}
+        for movie_id, because in recommendation.items:
+            if movie_id in movies and because in movies:
+                rails.setdefault(because, [])
+                if len(rails[because]) < self.rail_size:
+                    rails[because].append(movies[movie_id])
+        return Response({
+            'computed_at': recommendation.computed_at,
+            'movies': [movies[movie_id] for movie_id, _ in recommendation.items if movie_id in movies],
+            'rails': [
+                {'because': movies[because], 'movies': rail}
+                for because, rail in list(rails.items())[:self.rail_count]
+            ],
+        })